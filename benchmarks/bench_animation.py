@@ -0,0 +1,241 @@
+"""Check the frame pacing of the animation scheduler.
+
+Runs headless on Qt's offscreen platform and exits with status 1 if any
+check fails:
+
+- pacing: with an opacity pulse running, the median tick interval is
+  within --tolerance of the refresh interval. A bare precise timer aimed at
+  the same frame grid is run first, to measure what this machine's timers
+  allow right now; 95% of the scheduler's ticks must land within
+  --jitter-ms more than that timer's of their frame, and it may miss at
+  most 2% of frames more than the timer did;
+- rest: a gap bloom stops the scheduler's timer within two frames of
+  settling, and no tick happens while everything is at rest;
+- click: a left click reported by the overlay's mouse listener (a
+  FakeMouseButtonListener) widens the drawn gap, the bloom's ticks are
+  paced to the frame, and the overlay is back at its gap and at rest within
+  two frames of the bloom's end; other buttons don't bloom;
+- repaint: each animation frame of a full-screen overlay repaints only
+  the crosshair, not the screen;
+- idle: a static overlay uses no more CPU time than an empty event loop.
+
+    python benchmarks/bench_animation.py
+    python benchmarks/bench_animation.py --seconds 5 --jitter-ms 1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QEventLoop, QTimer, Qt
+from PyQt5.QtWidgets import QApplication
+
+from crosshair_animation import CrosshairAnimator
+from crosshair_config import DEFAULT_PRESETS
+from crosshair_hotkeys import FakeHotkeyBackend, FakeMouseButtonListener
+from crosshair_metrics import percentile
+from crosshair_script import ScreenOverlay
+
+def run_event_loop(seconds):
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec_()
+
+def cpu_time_idle(seconds):
+    start = time.process_time()
+    run_event_loop(seconds)
+    return time.process_time() - start
+
+class RecordingOverlay(ScreenOverlay):
+    """A full-screen overlay that records the area of every repaint"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.painted = []
+
+    def paintEvent(self, event):
+        self.painted.append(event.rect())
+        super().paintEvent(event)
+
+def timer_baseline(seconds, interval):
+    """Return (sorted distances from the frame, missed fraction) of a bare timer aimed at a frame grid"""
+    timer = QTimer()
+    timer.setSingleShot(True)
+    timer.setTimerType(Qt.PreciseTimer)
+    anchor = time.perf_counter()
+    offsets = []
+    state = {'slot': 0, 'missed': 0}
+
+    def tick():
+        # The same grid and catch-up rule as AnimationScheduler.tick, with no work in between
+        now = time.perf_counter()
+        slot = max(state['slot'] + 1, int(round((now - anchor) / interval)))
+        state['missed'] += slot - state['slot'] - 1
+        state['slot'] = slot
+        offsets.append(abs(now - anchor - slot * interval))
+        wait = anchor + (slot + 1) * interval - time.perf_counter()
+        timer.start(max(0, int(round(wait * 1000))))
+    timer.timeout.connect(tick)
+    timer.start(int(round(interval * 1000)))
+    run_event_loop(seconds)
+    timer.stop()
+    return sorted(offsets), state['missed'] / max(len(offsets), 1)
+
+def check_pacing(seconds, tolerance, jitter_ms):
+    animator = CrosshairAnimator(pulse_rate_hz=2.0)
+    scheduler = animator.scheduler
+    baseline, baseline_missed = timer_baseline(seconds, scheduler.frame_interval())
+    baseline_p95 = percentile(baseline, 0.95)
+    animator.start()
+    run_event_loop(seconds)
+    animator.stop()
+    interval = scheduler.interval
+    intervals = sorted(scheduler.tick_intervals.samples())
+    median = percentile(intervals, 0.5)
+    offsets = sorted(abs(offset) for offset in scheduler.tick_offsets.samples())
+    p95 = percentile(offsets, 0.95)
+    missed = scheduler.missed_frames / max(scheduler.tick_count, 1)
+    print(f"pacing: {scheduler.tick_count} ticks at {interval * 1e3:.2f} ms, median {median * 1e3:.2f} ms, "
+          f"p95 offset from the frame {p95 * 1e3:.2f} ms, {scheduler.missed_frames} missed; "
+          f"a bare timer: p95 offset {baseline_p95 * 1e3:.2f} ms, {baseline_missed:.1%} missed")
+    failures = []
+    if abs(median - interval) > tolerance * interval:
+        failures.append(f"median tick interval {median * 1e3:.2f} ms is off the frame interval")
+    if p95 > baseline_p95 + jitter_ms / 1000:
+        failures.append(f"95th percentile tick offset {p95 * 1e3:.2f} ms exceeds the bare timer's "
+                        f"{baseline_p95 * 1e3:.2f} ms by more than {jitter_ms} ms")
+    if missed > baseline_missed + 0.02:
+        failures.append(f"{missed:.1%} of frames missed, {baseline_missed:.1%} by the bare timer")
+    return failures
+
+def check_rest():
+    animator = CrosshairAnimator(bloom_pixels=8, bloom_duration=0.2)
+    scheduler = animator.scheduler
+    animator.start()
+    failures = []
+    if scheduler.active:
+        failures.append("the scheduler runs with nothing to animate")
+    animator.press()
+    start = time.perf_counter()
+    while scheduler.active and time.perf_counter() - start < 2:
+        QApplication.processEvents(QEventLoop.WaitForMoreEvents)
+    settled = time.perf_counter() - start
+    ticks = scheduler.tick_count
+    run_event_loop(0.5)
+    print(f"rest: bloom settled and the timer stopped after {settled * 1e3:.1f} ms, {ticks} ticks, "
+          f"{scheduler.frame_count} frames drawn; {scheduler.tick_count - ticks} ticks at rest")
+    if settled > animator.bloom.duration + 2 * scheduler.interval + 0.01:
+        failures.append(f"the timer kept running {settled * 1e3:.1f} ms after a {animator.bloom.duration * 1e3:.0f} ms bloom")
+    if scheduler.tick_count != ticks:
+        failures.append("the scheduler ticked while at rest")
+    if animator.bloom.value != 0:
+        failures.append("the bloom did not return to rest")
+    return failures
+
+def check_click(tolerance):
+    # The overlay reads and writes its settings in the working directory
+    os.chdir(tempfile.mkdtemp())
+    from crosshair_script import CrosshairOverlay
+    animator = CrosshairAnimator(bloom_pixels=8, bloom_duration=0.2)
+    scheduler = animator.scheduler
+    listener = FakeMouseButtonListener()
+    overlay = CrosshairOverlay(animator=animator, hotkeys=FakeHotkeyBackend([]), mouse_listener=listener)
+    overlay.show()
+    run_event_loop(0.2)
+    failures = []
+    gap = overlay.config.crosshair_gap
+    listener.press('right')
+    run_event_loop(0.1)
+    if scheduler.active or overlay.renderer.config.crosshair_gap != gap:
+        failures.append("a right click bloomed the gap")
+
+    ticks = scheduler.tick_count
+    widest = gap
+    listener.press('left')
+    start = time.perf_counter()
+    while scheduler.active and time.perf_counter() - start < 2:
+        QApplication.processEvents(QEventLoop.WaitForMoreEvents)
+        widest = max(widest, overlay.renderer.config.crosshair_gap)
+    settled = time.perf_counter() - start
+    bloom_ticks = scheduler.tick_count - ticks
+    # The first tick of a run has no interval before it
+    intervals = sorted(scheduler.tick_intervals.samples()[-(bloom_ticks - 1):]) if bloom_ticks > 1 else []
+    median = percentile(intervals, 0.5)
+    run_event_loop(0.3)
+    print(f"click: gap {gap} -> {widest} px, {bloom_ticks} ticks with a median interval of {median * 1e3:.2f} ms, "
+          f"at rest after {settled * 1e3:.1f} ms, {scheduler.tick_count - ticks - bloom_ticks} ticks at rest")
+    if widest <= gap:
+        failures.append("a left click through the mouse listener didn't widen the gap")
+    if not intervals or abs(median - scheduler.interval) > tolerance * scheduler.interval:
+        failures.append(f"bloom ticks were {median * 1e3:.2f} ms apart, not one frame")
+    if settled > animator.bloom.duration + 2 * scheduler.interval + 0.01:
+        failures.append(f"the overlay kept animating {settled * 1e3:.1f} ms after a click")
+    if scheduler.tick_count != ticks + bloom_ticks:
+        failures.append("the scheduler ticked after the bloom settled")
+    if overlay.renderer.config.crosshair_gap != gap:
+        failures.append(f"the gap stayed at {overlay.renderer.config.crosshair_gap} px after the bloom")
+    overlay.close()
+    return failures
+
+def check_repaint():
+    animator = CrosshairAnimator(bloom_pixels=8, bloom_duration=0.2, pulse_rate_hz=2.0)
+    overlay = RecordingOverlay(DEFAULT_PRESETS['Default Green'], bounded=False, animator=animator)
+    overlay.setup_window()
+    run_event_loop(0.2)
+    overlay.painted = []
+    animator.start()
+    animator.press()
+    run_event_loop(0.5)
+    animator.stop()
+    screen_area = overlay.width() * overlay.height()
+    largest = max((rect.width() * rect.height() for rect in overlay.painted), default=0)
+    print(f"repaint: {len(overlay.painted)} repaints, largest {largest} px of a {screen_area} px screen")
+    overlay.close()
+    failures = []
+    if not overlay.painted:
+        failures.append("no animation frames were painted")
+    if largest > screen_area // 100:
+        failures.append(f"an animation frame repainted {largest} px")
+    return failures
+
+def check_idle(seconds):
+    baseline = cpu_time_idle(seconds)
+    overlay = ScreenOverlay(DEFAULT_PRESETS['Default Green'])
+    overlay.setup_window()
+    run_event_loop(0.2)
+    static = cpu_time_idle(seconds)
+    overlay.close()
+    print(f"idle: {static * 1e3:.1f} ms CPU with a static overlay, {baseline * 1e3:.1f} ms with none, "
+          f"over {seconds:.1f} s")
+    if static > baseline + 0.01 * seconds:
+        return [f"a static overlay used {static * 1e3:.1f} ms CPU in {seconds:.1f} s"]
+    return []
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--seconds', type=float, default=2.0, help="how long the pacing run lasts (default 2)")
+    parser.add_argument('--tolerance', type=float, default=0.05,
+                        help="allowed median tick interval error, as a fraction of a frame (default 0.05)")
+    parser.add_argument('--jitter-ms', type=float, default=2.0,
+                        help="allowed 95th percentile distance of a tick from its frame beyond a bare "
+                             "timer's, in ms (default 2)")
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    failures = check_pacing(args.seconds, args.tolerance, args.jitter_ms)
+    failures += check_rest()
+    failures += check_click(args.tolerance)
+    failures += check_repaint()
+    failures += check_idle(1.0)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
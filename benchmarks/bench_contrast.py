@@ -0,0 +1,190 @@
+"""Check the adaptive contrast choices and the background sampler's CPU budget.
+
+Runs headless on Qt's offscreen platform with SyntheticScreenSource in
+place of the screen, on a clock the script steps itself. It checks:
+
+- choices: light and dark backgrounds, measured with luminance_stats,
+  pick the expected color in 'swap' and 'contrast' modes;
+- hysteresis: a different choice is only used once it holds for
+  SETTLE_SAMPLES samples, and a background flickering every sample never
+  changes the crosshair;
+- budget: samples over --budget-ms shrink the grid, then slow the rate, and
+  cheap samples win both back; the sampler thread, run for --seconds on a
+  checkerboard, keeps its median sample within the budget;
+- adapt: repeated calls with the same config and choice return the same
+  recolored config, and the time per call against recoloring every frame.
+
+The run exits with status 1 if any check fails.
+
+    python benchmarks/bench_contrast.py
+    python benchmarks/bench_contrast.py --budget-ms 0.25 --seconds 2
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QApplication
+
+from crosshair_config import DEFAULT_CONFIG, CrosshairConfig
+from crosshair_contrast import (MAX_GRID, MIN_GRID, SETTLE_SAMPLES, BackgroundSampler, ContrastController,
+                                SyntheticScreenSource, luminance_stats)
+
+DARK = QColor(20, 20, 20)
+LIGHT = QColor(235, 235, 235)
+REGION = QRect(0, 0, 48, 48)
+
+class SteppedClock:
+    """A clock that only moves when told, so the synthetic source shows a chosen frame"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def config(color, outline=(0, 0, 0)):
+    return CrosshairConfig.from_dict(dict(DEFAULT_CONFIG, color=dict(zip('rgba', color + (255,))),
+                                          outline_color=dict(zip('rgba', outline + (255,)))))
+
+def sample(controller, source, clock, frame):
+    """Show frame on the synthetic source and feed one measured sample to the controller"""
+    clock.now = frame * source.period
+    mean, deviation = luminance_stats(source.grab(REGION), MAX_GRID, 0.25)
+    controller.background_sampled(mean, deviation)
+    return mean
+
+def settle(controller, source, clock, frame):
+    for _ in range(SETTLE_SAMPLES):
+        sample(controller, source, clock, frame)
+    return controller.choice
+
+def check_choices(failures):
+    clock = SteppedClock()
+    source = SyntheticScreenSource([DARK, LIGHT], clock=clock)
+    cases = [
+        # mode, main color, outline color, expected on dark, expected on light
+        ('swap', (255, 255, 255), (0, 0, 0), 'main', 'swap'),
+        ('swap', (0, 0, 0), (255, 255, 255), 'swap', 'main'),
+        ('contrast', (90, 90, 90), (0, 0, 0), 'white', 'main'),
+        ('contrast', (200, 200, 200), (0, 0, 0), 'main', 'black'),
+    ]
+    for mode, color, outline, on_dark, on_light in cases:
+        controller = ContrastController(mode, source)
+        controller.adapt(config(color, outline))
+        for frame, expected in ((0, on_dark), (1, on_light), (0, on_dark)):
+            choice = settle(controller, source, clock, frame)
+            if choice != expected:
+                background = 'dark' if frame == 0 else 'light'
+                failures.append(f"{mode} with main {color} on {background}: chose {choice}, expected {expected}")
+        print(f"{mode:8s} main {color}: dark -> {on_dark}, light -> {on_light}")
+
+def check_hysteresis(failures):
+    clock = SteppedClock()
+    source = SyntheticScreenSource([DARK, LIGHT], clock=clock)
+    controller = ContrastController('contrast', source)
+    controller.adapt(config((200, 200, 200)))
+    settle(controller, source, clock, 0)
+    changes = []
+    controller.changed.connect(lambda: changes.append(controller.choice))
+    for _ in range(SETTLE_SAMPLES - 1):
+        sample(controller, source, clock, 1)
+    if controller.choice != 'main' or changes:
+        failures.append(f"hysteresis: switched to {controller.choice} after {SETTLE_SAMPLES - 1} light samples")
+    for i in range(20):
+        sample(controller, source, clock, i % 2)
+    if changes:
+        failures.append(f"hysteresis: a background flickering every sample changed the choice {len(changes)} times")
+    settle(controller, source, clock, 1)
+    if controller.choice != 'black' or changes != ['black']:
+        failures.append(f"hysteresis: {SETTLE_SAMPLES} light samples in a row chose {controller.choice}")
+    print(f"hysteresis: held through 20 flickering samples, switched after {SETTLE_SAMPLES} steady ones")
+
+def check_budget_steps(failures, budget_ms):
+    sampler = BackgroundSampler(SyntheticScreenSource(), rate_hz=10.0, budget_ms=budget_ms)
+    over = budget_ms * 2 / 1000
+    cheap = budget_ms / 8 / 1000
+    grids = []
+    for _ in range(4):
+        sampler.record(over)
+        grids.append(sampler.grid)
+    if grids[:2] != [MAX_GRID // 2, MAX_GRID // 4] or sampler.grid != MIN_GRID:
+        failures.append(f"budget: grids {grids} over budget, expected halving to {MIN_GRID}")
+    if sampler.interval <= sampler.base_interval:
+        failures.append("budget: the rate didn't drop once the grid was at its minimum")
+    for _ in range(16):
+        sampler.record(cheap)
+    if sampler.interval != sampler.base_interval or sampler.grid != MAX_GRID:
+        failures.append(f"budget: cheap samples left the grid at {sampler.grid} and the rate at "
+                        f"{1 / sampler.interval:.1f} Hz")
+    print(f"budget steps: grids {grids} over budget, back to {sampler.grid} and "
+          f"{1 / sampler.interval:.0f} Hz when cheap")
+
+def check_sampler_thread(failures, budget_ms, seconds):
+    source = SyntheticScreenSource([SyntheticScreenSource.checkerboard, DARK, LIGHT], period=0.05)
+    sampler = BackgroundSampler(source, rate_hz=100.0, budget_ms=budget_ms)
+    sampler.set_region(QRect(0, 0, 120, 120), 0.25)
+    sampler.start()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        QApplication.processEvents()
+        time.sleep(0.01)
+    sampler.stop()
+    stats = sampler.stats()
+    print(f"sampler thread: {stats}")
+    if stats['samples'] == 0:
+        failures.append("sampler thread: took no samples")
+    elif stats['p50_ms'] > budget_ms:
+        failures.append(f"sampler thread: median sample {stats['p50_ms']} ms over the {budget_ms} ms budget")
+
+def check_adapt(failures, calls):
+    clock = SteppedClock()
+    source = SyntheticScreenSource([DARK, LIGHT], clock=clock)
+    controller = ContrastController('contrast', source)
+    user = config((90, 90, 90))
+    controller.adapt(user)
+    settle(controller, source, clock, 0)
+    first = controller.adapt(user)
+    if controller.adapt(user) is not first:
+        failures.append("adapt: the same config and choice recolored the config again")
+    if first.color[:3] != (255, 255, 255):
+        failures.append(f"adapt: drew {first.color} for a white choice")
+    start = time.perf_counter()
+    for _ in range(calls):
+        controller.adapt(user)
+    cached = (time.perf_counter() - start) / calls
+    start = time.perf_counter()
+    for _ in range(calls):
+        ContrastController.recolor(user, controller.choice)
+    uncached = (time.perf_counter() - start) / calls
+    print(f"adapt: {cached * 1e6:.2f} us per frame, recoloring every frame {uncached * 1e6:.2f} us")
+    settle(controller, source, clock, 1)
+    if controller.adapt(user) is not user:
+        failures.append("adapt: a config that stands out wasn't drawn as it is")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--budget-ms', type=float, default=0.5, help="CPU budget per sample in ms (default 0.5)")
+    parser.add_argument('--seconds', type=float, default=1.0, help="how long to run the sampler thread (default 1)")
+    parser.add_argument('--calls', type=int, default=20000, help="adapt calls to time (default 20000)")
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    failures = []
+    check_choices(failures)
+    check_hysteresis(failures)
+    check_budget_steps(failures, args.budget_ms)
+    check_sampler_thread(failures, args.budget_ms, args.seconds)
+    check_adapt(failures, args.calls)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
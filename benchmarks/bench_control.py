@@ -0,0 +1,164 @@
+"""Measure the throughput of the overlay's local control channel.
+
+Runs headless on Qt's offscreen platform. The overlay and its control
+server run on the main thread. A client on another thread measures:
+
+- round trip: one get command per request, waiting for each reply;
+- pipelined: --commands single-command requests written before reading
+  the replies;
+- batched: set commands sent --batch to a request;
+- --send: a new process running `crosshair_script.py --send ping`, which
+  is what a second invocation costs.
+
+The run exits with status 1 if:
+
+- a reply is missing, out of order or not ok;
+- the crosshair doesn't end up with the last setting sent;
+- the 99th percentile round trip exceeds --max-ms.
+
+    python benchmarks/bench_control.py
+    python benchmarks/bench_control.py --commands 20000 --batch 200
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt5.QtCore import QEventLoop, QThread
+from PyQt5.QtWidgets import QApplication
+
+from crosshair_control import ControlClient, ControlServer
+from crosshair_metrics import percentile
+
+SERVER_NAME = f"CrosshairOverlayBench{os.getpid()}"
+
+class BenchClient(QThread):
+    """Drives the control server from another thread with blocking sockets"""
+
+    def __init__(self, commands, batch, spawns):
+        super().__init__()
+        self.commands = commands
+        self.batch = batch
+        self.spawns = spawns
+        self.round_trips = []
+        self.rates = {}
+        self.spawn_times = []
+        self.failures = []
+        self.last_gap = None
+
+    def check(self, label, replies, expected):
+        if len(replies) != expected:
+            self.failures.append(f"{label}: {len(replies)} of {expected} replies")
+        bad = [reply for reply in replies if not reply.get('ok')]
+        if bad:
+            self.failures.append(f"{label}: {len(bad)} failed, e.g. {bad[0].get('error')}")
+
+    def run(self):
+        try:
+            client = ControlClient(SERVER_NAME)
+        except ConnectionError as e:
+            self.failures.append(str(e))
+            return
+        try:
+            self.measure(client)
+        except (ConnectionError, ValueError) as e:
+            self.failures.append(f"the connection failed: {e}")
+        client.close()
+        for _ in range(self.spawns):
+            start = time.perf_counter()
+            process = subprocess.run([sys.executable, os.path.join(ROOT, 'crosshair_script.py'),
+                                      '--control-name', SERVER_NAME, '--send', 'ping'],
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            self.spawn_times.append(time.perf_counter() - start)
+            if process.returncode != 0:
+                self.failures.append(f"--send exited with {process.returncode}: {process.stdout[-200:]!r}")
+
+    def measure(self, client):
+        rounds = min(self.commands, 2000)
+        replies = []
+        start = time.perf_counter()
+        for _ in range(rounds):
+            sent = time.perf_counter()
+            replies.append(client.send({'cmd': 'get'}))
+            self.round_trips.append(time.perf_counter() - sent)
+        self.rates['round trip'] = rounds / (time.perf_counter() - start)
+        self.check('round trip', replies, rounds)
+
+        start = time.perf_counter()
+        for i in range(self.commands):
+            client.write({'cmd': 'ping', 'id': i})
+        client.socket.flush()
+        replies = [client.read() for _ in range(self.commands)]
+        self.rates['pipelined'] = self.commands / (time.perf_counter() - start)
+        self.check('pipelined', replies, self.commands)
+        if [reply.get('id') for reply in replies] != list(range(self.commands)):
+            self.failures.append("pipelined: replies came back out of order")
+
+        batches = max(self.commands // self.batch, 1)
+        results = []
+        start = time.perf_counter()
+        for i in range(batches):
+            commands = [{'cmd': 'set', 'key': 'crosshair_gap', 'value': (i * self.batch + j) % 16}
+                        for j in range(self.batch)]
+            results.extend(client.send(commands))
+        self.rates['batched'] = batches * self.batch / (time.perf_counter() - start)
+        self.check('batched', results, batches * self.batch)
+        self.last_gap = (batches * self.batch - 1) % 16
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--commands', type=int, default=5000, help="commands per pipelined and batched run")
+    parser.add_argument('--batch', type=int, default=100, help="commands per batched request (default 100)")
+    parser.add_argument('--spawns', type=int, default=3, help="--send processes to time (default 3)")
+    parser.add_argument('--max-ms', type=float, default=20.0,
+                        help="allowed 99th percentile round trip in ms (default 20)")
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+    # The overlay reads and writes its settings in the working directory
+    os.chdir(tempfile.mkdtemp())
+
+    from crosshair_script import CrosshairOverlay
+
+    overlay = CrosshairOverlay()
+    overlay.show()
+    control = ControlServer(name=SERVER_NAME)
+    if not overlay.setup_control_server(control):
+        sys.exit(1)
+    client = BenchClient(args.commands, args.batch, args.spawns)
+    loop = QEventLoop()
+    client.finished.connect(loop.quit)
+    client.start()
+    loop.exec_()
+    failures = client.failures
+    if client.last_gap is not None and overlay.config.crosshair_gap != client.last_gap:
+        failures.append(f"the gap is {overlay.config.crosshair_gap}, not the {client.last_gap} sent last")
+    overlay.close()
+
+    if client.round_trips:
+        values = sorted(client.round_trips)
+        p99 = percentile(values, 0.99)
+        print(f"round trip: n={len(values)} p50={percentile(values, 0.5) * 1e3:.3f}ms "
+              f"p99={p99 * 1e3:.3f}ms max={values[-1] * 1e3:.3f}ms")
+        if p99 * 1000 > args.max_ms:
+            failures.append(f"p99 round trip {p99 * 1e3:.1f} ms exceeds {args.max_ms} ms")
+    for label, rate in client.rates.items():
+        print(f"{label:10s}: {rate:,.0f} commands/s")
+    if client.spawn_times:
+        print(f"--send process: median {sorted(client.spawn_times)[len(client.spawn_times) // 2] * 1e3:.0f} ms "
+              f"over {len(client.spawn_times)} runs")
+    print(f"control server: {control.stats()}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
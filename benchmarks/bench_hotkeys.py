@@ -0,0 +1,120 @@
+"""Measure hotkey-to-paint latency through the fake hotkey backend.
+
+Runs headless on Qt's offscreen platform. The overlay gets a
+FakeHotkeyBackend with two bindings; each round presses the crosshair
+hotkey twice (hide, show) and the menu hotkey twice (show, hide), and the
+overlay's PaintMetrics records the time from each key press to the paint
+that shows its result. The run exits with status 1 if:
+
+- a binding triggers the wrong action, or a taken key doesn't fall back;
+- a press that shows a window is never painted;
+- the 99th percentile latency exceeds --max-ms.
+
+    python benchmarks/bench_hotkeys.py
+    python benchmarks/bench_hotkeys.py --rounds 200 --max-ms 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+
+from crosshair_hotkeys import FakeHotkeyBackend, HotkeyBinding, default_bindings
+from crosshair_metrics import PaintMetrics, percentile
+
+BINDINGS = ('F2=menu', 'Ctrl+Shift+H=crosshair')
+
+def check_bindings():
+    failures = []
+    backend = FakeHotkeyBackend([HotkeyBinding.parse(spec) for spec in BINDINGS])
+    received = []
+    backend.activated.connect(lambda action, timestamp: received.append((action, timestamp)))
+    backend.start()
+    before = time.perf_counter()
+    for keys, action in (('F2', 'menu'), ('ctrl+shift+h', 'crosshair'), ('Shift+H', None), ('F3', None)):
+        if backend.press(keys) != action:
+            failures.append(f"{keys} triggered {backend.press(keys)!r}, not {action!r}")
+    if [action for action, _ in received] != ['menu', 'crosshair']:
+        failures.append(f"activated sent {received}")
+    if not all(before <= timestamp <= time.perf_counter() for _, timestamp in received):
+        failures.append("hotkey timestamps are outside the time of the presses")
+
+    bindings, fallbacks = default_bindings()
+    backend = FakeHotkeyBackend(bindings, fallbacks, taken=('F2', 'Ctrl+F2'))
+    backend.start()
+    registered = [str(binding) for binding in backend.registered]
+    if registered != ['F3']:
+        failures.append(f"with F2 and Ctrl+F2 taken the default binding became {registered}, not F3")
+    return failures
+
+def wait_for_paint(metrics, timeout=2.0):
+    start = time.perf_counter()
+    while metrics.pending_hotkey is not None and time.perf_counter() - start < timeout:
+        QApplication.processEvents()
+    return metrics.pending_hotkey is None
+
+def measure_latency(rounds):
+    # The overlay reads and writes its settings in the working directory
+    os.chdir(tempfile.mkdtemp())
+    from crosshair_script import CrosshairOverlay
+
+    metrics = PaintMetrics()
+    backend = FakeHotkeyBackend([HotkeyBinding.parse(spec) for spec in BINDINGS])
+    overlay = CrosshairOverlay(metrics=metrics, hotkeys=backend)
+    overlay.show()
+    QApplication.processEvents()
+    failures = []
+    latencies = {'crosshair': [], 'menu': []}
+    for _ in range(rounds):
+        for keys, action in (('Ctrl+Shift+H', 'crosshair'), ('F2', 'menu')):
+            # The first press hides, the second shows (menu: shows, then hides)
+            for _ in range(2):
+                before = len(metrics.hotkey_to_paint.samples())
+                backend.press(keys)
+                if metrics.pending_hotkey is None:
+                    continue
+                if not wait_for_paint(metrics):
+                    failures.append(f"the {action} hotkey was never painted")
+                    metrics.pending_hotkey = None
+                    continue
+                latencies[action].extend(metrics.hotkey_to_paint.samples()[before:])
+    overlay.close()
+    for action, samples in latencies.items():
+        if len(samples) != rounds:
+            failures.append(f"{len(samples)} of {rounds} {action} hotkeys were painted")
+    return latencies, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rounds', type=int, default=50, help="presses of each hotkey that show a window")
+    parser.add_argument('--max-ms', type=float, default=50.0,
+                        help="allowed 99th percentile hotkey to paint latency in ms (default 50)")
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+
+    failures = check_bindings()
+    latencies, latency_failures = measure_latency(args.rounds)
+    failures += latency_failures
+    for action, samples in latencies.items():
+        values = sorted(samples)
+        if not values:
+            continue
+        p99 = percentile(values, 0.99)
+        print(f"{action:9s} hotkey to paint: n={len(values)} p50={percentile(values, 0.5) * 1e3:.3f}ms "
+              f"p99={p99 * 1e3:.3f}ms max={values[-1] * 1e3:.3f}ms")
+        if p99 * 1000 > args.max_ms:
+            failures.append(f"{action} hotkey p99 latency {p99 * 1e3:.1f} ms exceeds {args.max_ms} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Check that the modules the overlay defers stay off its startup path.
+
+Imports crosshair_script and parses a command line in a fresh interpreter
+under -X importtime, as every start does, then imports each module in
+DEFERRED_MODULES. Prints the import time report and exits with status 1 if
+startup already loaded a deferred module, a deferred module couldn't be
+imported, or startup took longer than --max-ms.
+
+    python benchmarks/bench_imports.py
+    python benchmarks/bench_imports.py --max-ms 300
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crosshair_metrics import DEFERRED_MODULES, import_time_report, time_imports
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--max-ms', type=float, default=500.0,
+                        help="allowed import time of crosshair_script and its command line in ms (default 500)")
+    args = parser.parse_args()
+    failures = []
+    rows, early, stderr = time_imports()
+    if rows is None:
+        print(f"FAIL: could not time the imports (-X importtime needs Python 3.7+)\n{stderr}")
+        sys.exit(1)
+    for name in early:
+        failures.append(f"{name} is in DEFERRED_MODULES but a plain start loads it")
+    imported = {name for _, _, _, name in rows}
+    for name in DEFERRED_MODULES:
+        if name not in early and name not in imported:
+            failures.append(f"{name} is in DEFERRED_MODULES but could not be imported")
+    startup = sum(cumulative for level, _, cumulative, name in rows
+                  if level == 0 and name not in DEFERRED_MODULES)
+    print(import_time_report(), end='')
+    print(f"startup imports, interpreter included: {startup / 1000:.1f} ms")
+    if startup / 1000 > args.max_ms:
+        failures.append(f"startup imports took {startup / 1000:.0f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Compare color palette lookups against the linear scans they replace.
+
+For each count in --colors (10 and 10,000 by default) this times name
+lookups by hex, nearest color lookups and a hex edit in HexColorWidget. It
+also reads a GIMP palette with malformed lines. The run exits with status 1
+if:
+
+- a lookup disagrees with the linear scan it replaces;
+- the GIMP palette's good lines aren't all read, or a malformed line isn't
+  skipped;
+- a nearest color lookup takes longer than --max-nearest-us.
+
+    python benchmarks/bench_palette.py
+    python benchmarks/bench_palette.py --colors 10 100000 --queries 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+
+from crosshair_palette import DEFAULT_COLORS, ColorPalette, hex_to_rgb, read_palette_file, rgb_to_hex
+
+def make_colors(count):
+    """Return the default colors plus random named colors, count in total"""
+    rng = random.Random(count)
+    colors = list(DEFAULT_COLORS.items())
+    for i in range(count - len(colors)):
+        colors.append((f"Color {i}", rgb_to_hex(rng.randrange(256), rng.randrange(256), rng.randrange(256))))
+    return colors
+
+def linear_name(colors, hex_text):
+    """The lookup HexColorWidget did on every keystroke before the index existed"""
+    for name, preset_hex in colors:
+        if preset_hex.upper() == hex_text.upper():
+            return name
+    return None
+
+def linear_nearest(colors, rgb):
+    best = None
+    for name, hex_color in colors:
+        r, g, b = hex_to_rgb(hex_color)
+        distance = (r - rgb[0]) ** 2 + (g - rgb[1]) ** 2 + (b - rgb[2]) ** 2
+        if best is None or distance < best[0]:
+            best = (distance, name)
+    return best[1]
+
+def distance(hex_color, rgb):
+    r, g, b = hex_to_rgb(hex_color)
+    return (r - rgb[0]) ** 2 + (g - rgb[1]) ** 2 + (b - rgb[2]) ** 2
+
+def check_lookups(colors, palette, queries, failures):
+    """Compare the index and the k-d tree with linear scans for random colors"""
+    rng = random.Random(len(colors))
+    hex_values = [hex_color for _, hex_color in rng.sample(colors, min(queries // 2, len(colors)))]
+    hex_values += [rgb_to_hex(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+                   for _ in range(queries - len(hex_values))]
+    for hex_color in hex_values:
+        if palette.name_for_hex(hex_color) != linear_name(colors, hex_color):
+            failures.append(f"{len(colors)} colors: name_for_hex({hex_color}) disagrees with the scan")
+            break
+    for hex_color in hex_values:
+        rgb = hex_to_rgb(hex_color)
+        # Ties may pick either name, so compare distances
+        _, nearest = palette.nearest(rgb)
+        if distance(nearest, rgb) != distance(palette.hex_for_name(linear_nearest(colors, rgb)), rgb):
+            failures.append(f"{len(colors)} colors: nearest({hex_color}) isn't the closest color")
+            break
+
+GPL_PALETTE = """GIMP Palette
+Name: Bench
+Columns: 4
+# comment
+255 0 0 Red
+0 128 255
+300 0 0 Too red
+12 x 7 Not a number
+-1 0 0 Negative
+1 2
+0 0 0 Black
+"""
+
+def check_gpl(failures):
+    filename = os.path.join(tempfile.mkdtemp(), 'bench.gpl')
+    with open(filename, 'w') as f:
+        f.write(GPL_PALETTE)
+    try:
+        colors = read_palette_file(filename)
+    except ValueError as e:
+        failures.append(f"GIMP palette with malformed lines: {e}")
+        return
+    expected = [('Red', '#FF0000'), ('#0080FF', '#0080FF'), ('Black', '#000000')]
+    if colors != expected:
+        failures.append(f"GIMP palette with malformed lines: read {colors}, expected {expected}")
+
+def time_per_call(function, number):
+    return min(timeit.repeat(function, number=number, repeat=3)) / number
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--colors', type=int, nargs='+', default=[10, 10000],
+                        help="palette sizes to run (default 10 10000)")
+    parser.add_argument('--queries', type=int, default=200,
+                        help="random colors checked against the linear scans (default 200)")
+    parser.add_argument('--max-nearest-us', type=float, default=200.0,
+                        help="allowed nearest color lookup in microseconds (default 200)")
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    from crosshair_script import HexColorWidget
+
+    failures = []
+    check_gpl(failures)
+    for count in args.colors:
+        colors = make_colors(count)
+        palette = ColorPalette(colors)
+        # Worst case for the scan: a color that isn't in the palette
+        hex_text = '#123457'
+        rgb = hex_to_rgb(hex_text)
+        palette.nearest(rgb)
+        scan = time_per_call(lambda: linear_name(colors, hex_text), 200)
+        index = time_per_call(lambda: palette.name_for_hex(hex_text), 200)
+        near_scan = time_per_call(lambda: linear_nearest(colors, rgb), 20)
+        near_tree = time_per_call(lambda: palette.nearest(rgb), 200)
+        print(f"{count:6d} colors: name scan {scan * 1e6:9.1f} us  index {index * 1e6:6.2f} us   "
+              f"nearest scan {near_scan * 1e6:9.1f} us  k-d tree {near_tree * 1e6:6.1f} us")
+        if near_tree * 1e6 > args.max_nearest_us:
+            failures.append(f"{count} colors: a nearest color lookup took {near_tree * 1e6:.1f} us")
+        check_lookups(colors, palette, args.queries, failures)
+
+        widget = HexColorWidget({'r': 0, 'g': 255, 'b': 0, 'a': 255}, "Color", palette)
+        hex_values = [rgb_to_hex(i % 256, (i * 7) % 256, (i * 13) % 256) for i in range(200)]
+        keystroke = time_per_call(lambda: [widget.hex_input.setText(value) for value in hex_values], 1)
+        print(f"{count:6d} colors: HexColorWidget hex edit {keystroke / len(hex_values) * 1e6:9.1f} us")
+        widget.deleteLater()
+    app.processEvents()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
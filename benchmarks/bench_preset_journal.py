@@ -0,0 +1,174 @@
+"""Measure journaled preset edits against rewriting the preset file, and check crash recovery.
+
+Reports the time of --edits single-preset saves in a library of
+--presets presets, journaled and with the whole file rewritten each time.
+Then simulates crashes and checks what the next start loads:
+
+- between writing a new snapshot and resetting the journal, with a
+  journal of "delete C" then "rename A -> C", which must not be replayed
+  over the new snapshot; once for a snapshot the store wrote, once for a
+  preset file that existed before there was a journal, and once for a
+  journal from before journals had a base record;
+- in the middle of a journal append, which must drop only the torn line;
+- a journal from before journals had a base record, which is replayed.
+
+It also queues a snapshot, a journal append and a newer snapshot on a
+busy persistence worker, and checks the append isn't written after the
+newer snapshot has emptied the journal.
+
+The run exits with status 1 if any of them loads the wrong presets.
+
+    python benchmarks/bench_preset_journal.py
+    python benchmarks/bench_preset_journal.py --presets 10000 --edits 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crosshair_storage
+from crosshair_config import DEFAULT_PRESETS
+from crosshair_storage import JournaledPresetStore, PersistenceWorker, atomic_write_json
+
+class Crash(Exception):
+    """Stands in for the process dying"""
+
+def config(gap):
+    return dict(DEFAULT_PRESETS['Default Green'], crosshair_gap=gap)
+
+def library(count):
+    return {f"Preset {i}": config(i % 16) for i in range(count)}
+
+def time_edits(directory, presets, edits):
+    """Return (seconds journaled, seconds rewriting) for edits saves"""
+    store = JournaledPresetStore(os.path.join(directory, 'journaled.json'), compact_threshold=edits + 1)
+    store.write_snapshot(presets)
+    start = time.perf_counter()
+    for i in range(edits):
+        store.put(f"Edit {i}", config(i % 16))
+    journaled = time.perf_counter() - start
+    filename = os.path.join(directory, 'rewritten.json')
+    presets = dict(presets)
+    start = time.perf_counter()
+    for i in range(edits):
+        presets[f"Edit {i}"] = config(i % 16)
+        atomic_write_json(filename, presets)
+    return journaled, time.perf_counter() - start
+
+def crash_during_compaction(directory, failures, start='snapshot'):
+    """Journal "delete C" and "rename A -> C", then die while folding them into a new snapshot
+
+    start is how the preset file came to be: 'snapshot' written by the store,
+    'file' already there before any journal, or 'legacy' with a journal
+    written before journals had a base record.
+    """
+    filename = os.path.join(directory, f'compaction-{start}.json')
+    if start == 'snapshot':
+        store = JournaledPresetStore(filename)
+        store.write_snapshot({'A': config(1), 'C': config(2)})
+    else:
+        atomic_write_json(filename, {'A': config(1), 'C': config(2)})
+        if start == 'legacy':
+            with open(filename + '.journal', 'w') as f:
+                f.write('{"op":"delete","name":"C"}\n')
+        store = JournaledPresetStore(filename)
+        store.load()
+    if start != 'legacy':
+        store.delete('C')
+    store.rename('A', 'C')
+    presets = store.load()
+    if presets != {'C': config(1)}:
+        failures.append(f"journal replay ({start}): loaded {sorted(presets)}, expected only C")
+
+    # Die right after the new snapshot is renamed into place
+    def write_then_crash(*args, **kwargs):
+        atomic_write_json(*args, **kwargs)
+        raise Crash()
+    crosshair_storage.atomic_write_json = write_then_crash
+    try:
+        store.write_snapshot(presets)
+    except Crash:
+        pass
+    finally:
+        crosshair_storage.atomic_write_json = atomic_write_json
+    loaded = JournaledPresetStore(filename).load()
+    if loaded != {'C': config(1)}:
+        failures.append(f"crash between snapshot and journal reset ({start}): loaded {dict(loaded)}, "
+                        f"expected C with A's config")
+    # The stale journal was reset, so edits after the restart are kept
+    store = JournaledPresetStore(filename)
+    store.load()
+    store.put('D', config(3))
+    if set(JournaledPresetStore(filename).load()) != {'C', 'D'}:
+        failures.append("an edit after recovering from the crash was lost")
+
+def queued_out_of_order(directory, failures):
+    """Snapshot, append, snapshot on a worker that is busy while all three are queued"""
+    filename = os.path.join(directory, 'queued.json')
+    worker = PersistenceWorker()
+    worker.start()
+    store = JournaledPresetStore(filename, worker=worker)
+    release = threading.Event()
+    worker.submit('busy', lambda: release.wait(5), merge=False)
+    store.write_snapshot({'A': config(1)})
+    store.delete('A')
+    store.write_snapshot({'A': config(2)})
+    release.set()
+    worker.flush(5)
+    worker.stop()
+    store = JournaledPresetStore(filename)
+    loaded = store.load()
+    if loaded != {'A': config(2)} or store.journal_records:
+        failures.append(f"snapshot, append, snapshot on the worker: loaded {dict(loaded)} with "
+                        f"{store.journal_records} journal records, expected A from the last snapshot")
+
+def crash_during_append(directory, failures):
+    filename = os.path.join(directory, 'append.json')
+    store = JournaledPresetStore(filename)
+    store.write_snapshot({'A': config(1)})
+    store.put('B', config(2))
+    with open(store.journal_filename, 'a') as f:
+        f.write('{"op":"put","name":"Torn","con')
+    loaded = JournaledPresetStore(filename).load()
+    if set(loaded) != {'A', 'B'}:
+        failures.append(f"torn append: loaded {sorted(loaded)}, expected A and B")
+
+def journal_without_base(directory, failures):
+    filename = os.path.join(directory, 'legacy.json')
+    atomic_write_json(filename, {'A': config(1)})
+    with open(filename + '.journal', 'w') as f:
+        f.write('{"op":"rename","old":"A","new":"B"}\n')
+    loaded = JournaledPresetStore(filename).load()
+    if set(loaded) != {'B'}:
+        failures.append(f"journal without a base record: loaded {sorted(loaded)}, expected B")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--presets', type=int, default=1000, help="presets in the library (default 1000)")
+    parser.add_argument('--edits', type=int, default=100, help="single-preset saves to time (default 100)")
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+    failures = []
+
+    journaled, rewritten = time_edits(directory, library(args.presets), args.edits)
+    print(f"{args.edits} saves with {args.presets} presets: journaled {journaled * 1e3 / args.edits:.2f} ms each, "
+          f"rewriting the file {rewritten * 1e3 / args.edits:.2f} ms each")
+
+    for start in ('snapshot', 'file', 'legacy'):
+        crash_during_compaction(directory, failures, start)
+    queued_out_of_order(directory, failures)
+    crash_during_append(directory, failures)
+    journal_without_base(directory, failures)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Measure the settings menu's preset list with a large preset library.
+
+Runs headless on Qt's offscreen platform, in a temporary directory with
+the default presets plus --presets random ones. Reports:
+
+- open: building and showing the settings menu, first with an empty
+  thumbnail atlas and then again once it has tiles, and opening the
+  preset dropdown;
+- save, rename and delete: the menu's buttons, with the dialogs answered;
+- custom: a settings change that makes the list show "Custom";
+- search: each keystroke of a search typed into the preset search box;
+- rebuild: clearing and refilling a plain combo box with every name, which
+  the menu did after each of these before the list had a model.
+
+The run exits with status 1 if the list and the library disagree, the
+wrong preset is selected after an edit, a search shows the wrong rows, or
+opening the menu or saving a preset takes longer than --max-open-ms or
+--max-save-ms.
+
+    python benchmarks/bench_preset_list.py
+    python benchmarks/bench_preset_list.py --presets 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication, QComboBox
+
+from crosshair_config import DEFAULT_PRESETS, PRESETS_FILENAME
+from crosshair_metrics import percentile
+
+SEARCH = "preset 12"
+
+def write_presets(count):
+    rng = random.Random(count)
+    presets = dict(DEFAULT_PRESETS)
+    for i in range(count):
+        presets[f"Preset {i}"] = dict(DEFAULT_PRESETS['Default Green'],
+                                      color={'r': rng.randrange(256), 'g': rng.randrange(256),
+                                             'b': rng.randrange(256), 'a': 255},
+                                      crosshair_length=rng.randint(2, 40),
+                                      crosshair_gap=rng.randint(0, 15),
+                                      line_thickness=rng.randint(1, 6))
+    with open(PRESETS_FILENAME, 'w') as f:
+        json.dump(presets, f)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    QApplication.processEvents()
+    return time.perf_counter() - start
+
+def summary(label, samples):
+    values = sorted(samples)
+    return (f"{label:8s} n={len(values):3d} p50={percentile(values, 0.5) * 1e3:8.3f}ms "
+            f"p99={percentile(values, 0.99) * 1e3:8.3f}ms")
+
+def open_menu(overlay):
+    menu = overlay.ensure_menu()
+    menu.show()
+    return menu
+
+def close_menu(overlay):
+    overlay.menu.hide()
+    overlay.menu.deleteLater()
+    overlay.menu = None
+    QApplication.processEvents()
+
+def check_list(menu, failures, label):
+    names = menu.preset_model.names
+    # A renamed preset keeps its row, though the library now lists it last
+    if len(names) != len(menu.preset_manager.presets) or set(names) != set(menu.preset_manager.presets):
+        failures.append(f"{label}: the list doesn't hold the library's presets")
+    if menu.preset_combo.currentText() != menu.current_preset_name:
+        failures.append(f"{label}: '{menu.preset_combo.currentText()}' is selected, "
+                        f"not '{menu.current_preset_name}'")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--presets', type=int, default=10000, help="random presets to add (default 10000)")
+    parser.add_argument('--rounds', type=int, default=20, help="saves, renames and deletes to time (default 20)")
+    parser.add_argument('--max-open-ms', type=float, default=500.0,
+                        help="allowed time to open the menu with an empty atlas in ms (default 500)")
+    parser.add_argument('--max-save-ms', type=float, default=20.0,
+                        help="allowed median time to save a preset in ms (default 20)")
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+    os.chdir(tempfile.mkdtemp())
+    write_presets(args.presets)
+
+    import crosshair_script
+    from crosshair_script import CrosshairOverlay
+
+    overlay = CrosshairOverlay()
+    failures = []
+    total = len(overlay.preset_manager.presets)
+
+    cold = timed(open_menu, overlay)
+    menu = overlay.menu
+    check_list(menu, failures, "open")
+    drawn = menu.thumbnails.stats()['rendered'] if menu.thumbnails is not None else 0
+    print(f"open:    {cold * 1e3:7.1f} ms with an empty atlas ({total} presets, {drawn} thumbnails drawn)")
+    if cold * 1000 > args.max_open_ms:
+        failures.append(f"opening the menu took {cold * 1e3:.0f} ms")
+    close_menu(overlay)
+    warm = timed(open_menu, overlay)
+    menu = overlay.menu
+    popup = timed(menu.preset_combo.showPopup)
+    menu.preset_combo.hidePopup()
+    print(f"reopen:  {warm * 1e3:7.1f} ms, dropdown {popup * 1e3:.1f} ms")
+
+    # Answer the menu's dialogs without showing them
+    answers = iter(f"Saved {i}" for i in range(args.rounds * 2))
+    crosshair_script.QInputDialog.getText = staticmethod(lambda *a, **k: (next(answers), True))
+    crosshair_script.QMessageBox.question = staticmethod(lambda *a, **k: crosshair_script.QMessageBox.Yes)
+    samples = {'save': [], 'rename': [], 'delete': [], 'custom': []}
+    for i in range(args.rounds):
+        # A config no preset has, so the list shows "Custom" first
+        menu.config['crosshair_length'] = 41 + i
+        samples['custom'].append(timed(menu.update_preset_combo_for_current_settings))
+        if menu.preset_combo.currentText() != "Custom":
+            failures.append(f"custom: '{menu.preset_combo.currentText()}' is selected, not 'Custom'")
+        samples['save'].append(timed(menu.save_current_as_preset))
+        check_list(menu, failures, "save")
+        samples['rename'].append(timed(menu.rename_current_preset))
+        check_list(menu, failures, "rename")
+        if i % 2:
+            deleted = menu.current_preset_name
+            samples['delete'].append(timed(menu.delete_current_preset))
+            check_list(menu, failures, "delete")
+            if menu.preset_manager.has_preset(deleted) or menu.preset_model.row(deleted) is not None:
+                failures.append(f"delete: '{deleted}' is still there")
+    for label, values in samples.items():
+        print(summary(label, values))
+    save = percentile(sorted(samples['save']), 0.5)
+    if save * 1000 > args.max_save_ms:
+        failures.append(f"saving a preset took {save * 1e3:.1f} ms")
+
+    keystrokes = []
+    for length in range(1, len(SEARCH) + 1):
+        keystrokes.append(timed(menu.preset_search.setText, SEARCH[:length]))
+    expected = sum(1 for name in menu.preset_manager.presets if SEARCH in name.casefold())
+    shown = [menu.preset_filter.index(row, 0).data() for row in range(menu.preset_filter.rowCount())]
+    matches = [name for name in shown if SEARCH in name.casefold()]
+    if len(matches) != expected or menu.current_preset_name not in shown:
+        failures.append(f"search: {len(matches)} matches shown of {expected}, "
+                        f"current preset {'shown' if menu.current_preset_name in shown else 'hidden'}")
+    print(summary('search', keystrokes) + f"  ({expected} matches for '{SEARCH}')")
+    menu.preset_search.returnPressed.emit()
+    QApplication.processEvents()
+    if matches and menu.current_preset_name != matches[0]:
+        failures.append(f"search: Enter picked '{menu.current_preset_name}', not '{matches[0]}'")
+    menu.preset_search.clear()
+
+    combo = QComboBox()
+    names = list(menu.preset_manager.presets)
+    def rebuild():
+        combo.clear()
+        for name in names:
+            combo.addItem(name)
+        combo.setCurrentText(names[-1])
+    rebuilds = [timed(rebuild) for _ in range(3)]
+    print(summary('rebuild', rebuilds) + "  (per save, delete and preset switch before)")
+    close_menu(overlay)
+    overlay.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
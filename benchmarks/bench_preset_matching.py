@@ -0,0 +1,87 @@
+"""Compare preset matching by linear scan against the config hash index.
+
+For each count in --presets (10 and 10,000 by default) this times
+--iterations lookups of a config no preset has, the worst case for the scan.
+The run exits with status 1 if the index and the scan find different
+presets for a sample of stored configs, or if a config dict with keys the schema
+doesn't have and the CrosshairConfig made from it find different presets.
+Run from the repository root:
+
+    python benchmarks/bench_preset_matching.py
+    python benchmarks/bench_preset_matching.py --presets 100 100000 --iterations 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crosshair_script import CrosshairConfig, CrosshairPresetManager, DEFAULT_CONFIG
+
+def make_manager(count):
+    """Return a preset manager holding count presets, backed by a scratch file"""
+    directory = tempfile.mkdtemp()
+    manager = CrosshairPresetManager(os.path.join(directory, 'crosshair_presets.json'))
+    presets = dict(manager.presets)
+    for i in range(count - len(presets)):
+        config = dict(DEFAULT_CONFIG)
+        config['color'] = {'r': i % 256, 'g': (i // 256) % 256, 'b': 7, 'a': 255}
+        config['crosshair_length'] = 2 + i % 48
+        presets[f"Bench {i}"] = config
+    manager.save_presets(presets)
+    return manager
+
+def linear_scan(manager, config):
+    """The matching loop CrosshairMenu used before the index existed"""
+    # get_preset returns a fresh copy, so compare against the stored dicts as the old loop did
+    for name, preset in manager.presets.items():
+        if preset == config:
+            return name
+    return None
+
+def check_extra_keys(manager, failures):
+    """A dict with keys outside the schema must find the preset its fields match"""
+    config = dict(DEFAULT_CONFIG, note="from an older version",
+                  color=dict(DEFAULT_CONFIG['color'], name="green"))
+    expected = manager.find_preset(CrosshairConfig.from_dict(config))
+    found = manager.find_preset(config)
+    if expected is None or found != expected:
+        failures.append(f"a config with extra keys matched {found!r}, its CrosshairConfig {expected!r}")
+
+def check_index(manager, failures, samples=200):
+    """The index must find the same preset as the scan for stored configs, up to samples of them evenly spaced"""
+    names = list(manager.presets)
+    for name in names[::max(1, len(names) // samples)]:
+        config = manager.presets[name]
+        if manager.find_preset(config) != linear_scan(manager, config):
+            failures.append(f"{len(manager.presets)} presets: the index and the scan disagree on '{name}'")
+            break
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--presets', type=int, nargs='+', default=[10, 10000],
+                        help="preset counts to run (default 10 10000)")
+    parser.add_argument('--iterations', type=int, default=200,
+                        help="lookups per timing, best of three (default 200)")
+    args = parser.parse_args()
+    failures = []
+    for count in args.presets:
+        manager = make_manager(count)
+        # Worst case for the scan: the config matches nothing
+        config = dict(DEFAULT_CONFIG, crosshair_length=99)
+        number = args.iterations
+        scan = min(timeit.repeat(lambda: linear_scan(manager, config), number=number, repeat=3)) / number
+        index = min(timeit.repeat(lambda: manager.find_preset(config), number=number, repeat=3)) / number
+        print(f"{count:6d} presets: linear scan {scan * 1e6:10.1f} us   hash index {index * 1e6:6.1f} us")
+        check_index(manager, failures)
+        check_extra_keys(manager, failures)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Measure streaming preset pack import and export, and share code size and speed.
+
+Writes a JSON Lines preset pack of --presets random configs, with some
+duplicate configs and invalid records mixed in, then reports:
+
+- import: the streaming import into an empty preset library against the
+  one-blob JSON import, with the peak memory each one allocates;
+- read: the peak memory of reading the pack without keeping it, which
+  must not grow with the pack;
+- export: writing the pack with full configs and with share codes;
+- share codes: average size against compact JSON, and batch encode and
+  decode rates.
+
+The run exits with status 1 if the import counts are wrong, a config
+doesn't survive export and import or a share code round trip, or reading
+the pack peaks above --max-read-kb.
+
+    python benchmarks/bench_preset_pack.py
+    python benchmarks/bench_preset_pack.py --presets 100000
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crosshair_config import CrosshairConfig, decode_share_codes, encode_share_codes, read_preset_pack
+from crosshair_script import CrosshairPresetManager
+from crosshair_storage import atomic_write_json, atomic_write_json_lines
+
+def random_config(rng):
+    return CrosshairConfig.from_dict({
+        'color': dict(zip('rgba', (rng.randrange(256) for _ in range(4)))),
+        'outline_color': dict(zip('rgba', (rng.randrange(256) for _ in range(4)))),
+        'line_thickness': rng.randint(1, 8),
+        'crosshair_length': rng.randint(0, 200),
+        'crosshair_gap': rng.randint(0, 40),
+        'outline_enabled': rng.random() < 0.5,
+        'outline_thickness': rng.randint(0, 4),
+        'crosshair_style': rng.choice(('cross', 'dot')),
+        'dot_size': rng.randint(1, 300),
+    })
+
+def make_pack(filename, count, rng):
+    """Write a pack of count records; returns (unique configs by name, duplicate count, invalid count)"""
+    unique = {}
+    seen = set()
+    records = [{'format': 'crosshair-presets', 'version': 1}]
+    duplicates = invalid = 0
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.1 and unique:
+            # Another name for a config already in the pack
+            records.append({'name': f"Copy {i}", 'config': rng.choice(list(unique.values())).to_dict()})
+            duplicates += 1
+        elif roll < 0.11:
+            records.append({'name': f"Broken {i}", 'config': {'line_thickness': 0}})
+            invalid += 1
+        else:
+            config = random_config(rng)
+            if config in seen:
+                continue
+            seen.add(config)
+            unique[f"Preset {i}"] = config
+            records.append({'name': f"Preset {i}", 'config': config.to_dict()})
+    atomic_write_json_lines(filename, records)
+    return unique, duplicates, invalid
+
+def fresh_manager(directory):
+    os.makedirs(directory)
+    os.chdir(directory)
+    return CrosshairPresetManager()
+
+def measure(root, label, method, filename):
+    """Import filename into two empty libraries, timing one and tracing the memory of the other
+
+    Returns (counts, seconds, peak bytes allocated, the timed manager).
+    """
+    manager = fresh_manager(os.path.join(root, label))
+    # Invalid records are reported as they are skipped; the counts are checked instead
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        counts = getattr(manager, method)(filename)
+        elapsed = time.perf_counter() - start
+        traced = fresh_manager(os.path.join(root, label + '-traced'))
+        tracemalloc.start()
+        getattr(traced, method)(filename)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return counts, elapsed, peak, manager
+
+def traced_read(filename):
+    """Read a pack without keeping it; returns (records, seconds, peak bytes allocated)"""
+    start = time.perf_counter()
+    count = sum(1 for _ in read_preset_pack(filename))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    for _ in read_preset_pack(filename):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--presets', type=int, default=10000, help="records in the pack (default 10000)")
+    parser.add_argument('--max-read-kb', type=float, default=256.0,
+                        help="allowed peak memory of reading the pack in KiB (default 256)")
+    args = parser.parse_args()
+    rng = random.Random(args.presets)
+    root = tempfile.mkdtemp()
+    pack = os.path.join(root, 'pack.jsonl')
+    unique, duplicates, invalid = make_pack(pack, args.presets, rng)
+    failures = []
+    print(f"pack: {args.presets} records, {len(unique)} unique, {duplicates} duplicates, {invalid} invalid, "
+          f"{os.path.getsize(pack) / 1024:.0f} KiB")
+
+    counts, elapsed, peak, manager = measure(root, 'streaming', 'import_preset_pack', pack)
+    print(f"streaming import: {elapsed * 1e3:.0f} ms, {len(unique) / elapsed:,.0f} presets/s, "
+          f"peak {peak / 1024:.0f} KiB, {counts['batches']} batches")
+    expected = {'added': len(unique), 'duplicates': duplicates, 'invalid': invalid}
+    if counts is None or any(counts[key] != value for key, value in expected.items()):
+        failures.append(f"import counted {counts}, expected {expected}")
+    if any(CrosshairConfig.from_dict(manager.presets.get(name, {})) != config
+           for name, config in unique.items()):
+        failures.append("an imported preset differs from the pack")
+
+    blob = os.path.join(root, 'pack.json')
+    atomic_write_json(blob, {name: config.to_dict() for name, config in unique.items()})
+    _, elapsed, peak, _ = measure(root, 'blob', 'import_presets', blob)
+    print(f"one-blob import:  {elapsed * 1e3:.0f} ms, {len(unique) / elapsed:,.0f} presets/s, "
+          f"peak {peak / 1024:.0f} KiB")
+
+    _, elapsed, peak = traced_read(pack)
+    print(f"read pack:        {elapsed * 1e3:.0f} ms, peak {peak / 1024:.0f} KiB")
+    if peak > args.max_read_kb * 1024:
+        failures.append(f"reading the pack peaked at {peak / 1024:.0f} KiB")
+
+    # Export the imported library and read it back
+    for codes in (False, True):
+        exported = os.path.join(root, f"export-{codes}.jsonl")
+        start = time.perf_counter()
+        written = manager.export_preset_pack(exported, codes=codes)
+        elapsed = time.perf_counter() - start
+        print(f"export{' with codes' if codes else ''}: {written} presets in {elapsed * 1e3:.0f} ms, "
+              f"{os.path.getsize(exported) / 1024:.0f} KiB")
+        reread = {name: config for _, name, config, error in read_preset_pack(exported) if error is None}
+        if reread != {name: CrosshairConfig.from_dict(config) for name, config in manager.presets.items()}:
+            failures.append(f"export{' with codes' if codes else ''} doesn't read back the same presets")
+
+    configs = list(unique.values())
+    start = time.perf_counter()
+    codes = encode_share_codes(configs)
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded = decode_share_codes(codes)
+    decode_time = time.perf_counter() - start
+    texts = [json.dumps(config.to_dict(), separators=(',', ':')) for config in configs]
+    start = time.perf_counter()
+    for text in texts:
+        CrosshairConfig.from_dict(json.loads(text))
+    json_time = time.perf_counter() - start
+    code_size = sum(map(len, codes)) / len(codes)
+    json_size = sum(map(len, texts)) / len(texts)
+    print(f"share codes: {code_size:.1f} chars against {json_size:.1f} for compact JSON "
+          f"({json_size / code_size:.1f}x smaller); encode {len(codes) / encode_time:,.0f}/s, "
+          f"decode {len(codes) / decode_time:,.0f}/s, JSON decode {len(codes) / json_time:,.0f}/s")
+    if decoded != configs:
+        failures.append("a share code didn't decode to its config")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
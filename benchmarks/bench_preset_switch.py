@@ -0,0 +1,146 @@
+"""Measure preset switching by hotkey against switching in the settings menu.
+
+Runs headless on Qt's offscreen platform, in a temporary directory with
+the default presets plus --presets random ones. For each path it reports
+p50/p99 of:
+
+- menu: CrosshairMenu.preset_changed, as when a preset is picked in the
+  dropdown, up to the overlay's next paint;
+- cold: a next_preset hotkey with an empty render cache;
+- warm: a next_preset hotkey once the favourites have been warmed, from
+  the key press to the overlay's paint (PaintMetrics' hotkey to paint).
+
+The run exits with status 1 if:
+
+- a switch was never painted, or a warm switch had to rasterize a sprite;
+- the 99th percentile warm hotkey to paint latency exceeds --max-ms, one
+  frame at 60 Hz by default, so a switch mid-match costs at most a frame;
+- the median warm switch is no faster than picking the preset in the menu.
+
+    python benchmarks/bench_preset_switch.py
+    python benchmarks/bench_preset_switch.py --presets 30 --rounds 300 --max-ms 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+
+from crosshair_config import DEFAULT_PRESETS, PRESETS_FILENAME
+from crosshair_hotkeys import FakeHotkeyBackend, HotkeyBinding
+from crosshair_metrics import PaintMetrics, percentile
+
+def write_presets(count):
+    rng = random.Random(count)
+    presets = {}
+    for i in range(count):
+        presets[f"Preset {i}"] = dict(DEFAULT_PRESETS['Default Green'],
+                                      color={'r': rng.randrange(256), 'g': rng.randrange(256),
+                                             'b': rng.randrange(256), 'a': 255},
+                                      crosshair_length=rng.randint(2, 40),
+                                      crosshair_gap=rng.randint(0, 15),
+                                      line_thickness=rng.randint(1, 6),
+                                      crosshair_style=rng.choice(('cross', 'dot')),
+                                      dot_size=rng.randint(2, 16))
+    with open(PRESETS_FILENAME, 'w') as f:
+        json.dump(presets, f)
+
+def wait_until(condition, timeout=2.0):
+    start = time.perf_counter()
+    while not condition() and time.perf_counter() - start < timeout:
+        QApplication.processEvents()
+    return condition()
+
+def summary(label, samples):
+    values = sorted(samples)
+    return (f"{label:5s} n={len(values):4d} p50={percentile(values, 0.5) * 1e3:7.3f}ms "
+            f"p99={percentile(values, 0.99) * 1e3:7.3f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--presets', type=int, default=20, help="random presets to add (default 20)")
+    parser.add_argument('--rounds', type=int, default=200, help="switches per path (default 200)")
+    parser.add_argument('--max-ms', type=float, default=16.7,
+                        help="allowed 99th percentile warm hotkey to paint latency in ms (default 16.7)")
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+    os.chdir(tempfile.mkdtemp())
+    write_presets(args.presets)
+
+    from crosshair_renderer import render_cache
+    from crosshair_script import CrosshairOverlay
+
+    metrics = PaintMetrics()
+    backend = FakeHotkeyBackend([HotkeyBinding.parse('F5=next_preset')])
+    overlay = CrosshairOverlay(metrics=metrics, hotkeys=backend)
+    overlay.show()
+    menu = overlay.ensure_menu()
+    QApplication.processEvents()
+    names = overlay.preset_cycler.favorites()
+    failures = []
+
+    # Picking presets in the menu dropdown
+    menu_times = []
+    for i in range(args.rounds):
+        paints = metrics.paint_count
+        start = time.perf_counter()
+        menu.preset_changed(names[(i + 1) % len(names)])
+        menu.dispatcher.flush()
+        if wait_until(lambda: metrics.paint_count > paints, 0.2):
+            menu_times.append(time.perf_counter() - start)
+
+    # Preset hotkeys, first with nothing cached, then with the favourites warmed
+    results = {}
+    for label in ('cold', 'warm'):
+        overlay.preset_cycler.stop()
+        render_cache.clear()
+        if label == 'warm':
+            overlay.warm_presets()
+            if overlay.preset_cycler.warmer is not None:
+                overlay.preset_cycler.warmer.wait()
+            QApplication.processEvents()
+        misses = overlay.preset_cycler.switch_misses
+        switches = len(metrics.hotkey_to_paint.samples())
+        for _ in range(args.rounds):
+            if label == 'cold':
+                render_cache.clear()
+            backend.press('F5')
+            if not wait_until(lambda: metrics.pending_hotkey is None):
+                failures.append(f"a {label} preset switch was never painted")
+                metrics.pending_hotkey = None
+        samples = metrics.hotkey_to_paint.samples()
+        results[label] = samples[switches:] if len(samples) > switches else samples[-args.rounds:]
+        if label == 'warm' and overlay.preset_cycler.switch_misses != misses:
+            failures.append(f"{overlay.preset_cycler.switch_misses - misses} warm switches rasterized a sprite")
+    overlay.close()
+
+    print(f"{len(names)} favourites, {args.rounds} switches per path")
+    print(summary('menu', menu_times))
+    for label, samples in results.items():
+        print(summary(label, samples))
+    print(f"preset switching: {overlay.preset_cycler.stats()}")
+    warm = sorted(results['warm'])
+    if len(menu_times) < args.rounds:
+        failures.append(f"{args.rounds - len(menu_times)} menu switches were never painted")
+    if warm:
+        p99 = percentile(warm, 0.99)
+        if p99 * 1000 > args.max_ms:
+            failures.append(f"warm switch p99 {p99 * 1e3:.3f} ms exceeds {args.max_ms} ms")
+        if menu_times and percentile(warm, 0.5) >= percentile(sorted(menu_times), 0.5):
+            failures.append("a warm hotkey switch is no faster than picking the preset in the menu")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Check the NumPy batch rasterizer against QPainter and time both.
+
+Every config from bench_render's sweep, plus random ones, is drawn by
+crosshair_raster.rasterize_batch and by CrosshairRenderer.render_image on
+the same canvas. The run exits with status 1 if any premultiplied channel
+differs by more than RASTER_TOLERANCE.
+
+    python benchmarks/bench_raster.py
+    python benchmarks/bench_raster.py --random 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QApplication
+
+from bench_render import bench_configs
+from crosshair_config import DEFAULT_PRESETS, CrosshairConfig
+from crosshair_raster import RASTER_TOLERANCE, canvas_size, rasterize_batch
+from crosshair_renderer import CrosshairRenderer
+
+def random_config(rng):
+    def color():
+        return {'r': rng.randrange(256), 'g': rng.randrange(256), 'b': rng.randrange(256),
+                'a': rng.choice((255, 255, rng.randrange(256)))}
+    return {
+        'color': color(), 'outline_color': color(),
+        'line_thickness': rng.randint(1, 10), 'crosshair_length': rng.randint(0, 50),
+        'crosshair_gap': rng.randint(0, 20), 'outline_enabled': rng.random() < 0.5,
+        'outline_thickness': rng.randint(0, 5), 'crosshair_style': rng.choice(('cross', 'dot')),
+        'dot_size': rng.randint(1, 20),
+    }
+
+def qpainter_pixels(renderer, side):
+    """Return the renderer's premultiplied output as an (H, W, 4) RGBA array"""
+    image = renderer.render_image(side, side).convertToFormat(QImage.Format_RGBA8888_Premultiplied)
+    data = image.constBits().asstring(image.sizeInBytes())
+    return np.frombuffer(data, dtype=np.uint8).reshape(side, image.bytesPerLine() // 4, 4)[:, :side]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--random', type=int, default=1000, help="random configs to add (default 1000)")
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    rng = random.Random(0)
+    configs = [CrosshairConfig.from_dict(config) for _, config in bench_configs(DEFAULT_PRESETS)]
+    configs += [CrosshairConfig.from_dict(random_config(rng)) for _ in range(args.random)]
+    side = canvas_size(configs)
+
+    start = time.perf_counter()
+    batch = rasterize_batch(configs, (side, side), premultiplied=True)
+    numpy_time = time.perf_counter() - start
+
+    renderer = CrosshairRenderer(configs[0])
+    expected = []
+    start = time.perf_counter()
+    for config in configs:
+        renderer.set_config(config)
+        expected.append(qpainter_pixels(renderer, side))
+    qt_time = time.perf_counter() - start
+
+    difference = np.abs(batch.astype(np.int16) - np.array(expected, dtype=np.int16))
+    worst = difference.reshape(len(configs), -1).max(axis=1)
+    print(f"{len(configs)} configs on a {side}x{side} canvas")
+    print(f"numpy batch {numpy_time * 1e3:8.1f} ms ({numpy_time / len(configs) * 1e6:7.1f} us per config)")
+    print(f"QPainter    {qt_time * 1e3:8.1f} ms ({qt_time / len(configs) * 1e6:7.1f} us per config)")
+    print(f"max channel difference {worst.max()} (tolerance {RASTER_TOLERANCE}); "
+          f"{np.count_nonzero(difference)} of {difference.size} channels differ")
+    if worst.max() > RASTER_TOLERANCE:
+        for index in np.argsort(worst)[::-1][:5]:
+            print(f"  {worst[index]:3d}  {configs[index].to_dict()}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
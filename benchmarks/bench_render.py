@@ -0,0 +1,185 @@
+"""Headless render benchmark for CrosshairOverlay and CrosshairPreview.
+
+Runs on Qt's offscreen platform, so it works on a Linux box with no GPU or
+display. Every case renders a widget into a QImage of the given surface
+size and records per-frame latency percentiles. The whole sweep is run
+--rounds times and each case keeps its fastest round, so a hiccup on a
+busy machine does not show up as a regression.
+
+    python benchmarks/bench_render.py --save-baseline baseline.json
+    python benchmarks/bench_render.py --baseline baseline.json --threshold 0.2
+
+With --baseline the run fails (exit status 1) when a case's median frame
+time is more than --threshold slower than the baseline, ignoring
+differences below --min-delta-us.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtWidgets import QApplication, QWidget
+
+SURFACE_SIZES = [(200, 400), (1280, 720), (1920, 1080), (3840, 2160)]
+QUICK_SURFACE_SIZES = [(200, 400), (1920, 1080)]
+
+# One parameter at a time is swept away from each preset
+SWEEP = {
+    'line_thickness': [1, 5, 10],
+    'crosshair_length': [2, 25, 50],
+    'crosshair_gap': [0, 10, 20],
+    'outline_thickness': [0, 1, 5],
+}
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def bench_configs(presets):
+    """Yield (name, config) for every preset, both styles and the parameter sweep"""
+    for preset_name, preset in presets.items():
+        for style in ('cross', 'dot'):
+            base = dict(preset, crosshair_style=style)
+            yield f"{preset_name}/{style}", base
+            for key, values in SWEEP.items():
+                for value in values:
+                    config = dict(base)
+                    if key == 'outline_thickness':
+                        config['outline_enabled'] = value > 0
+                        config['outline_thickness'] = max(value, 1)
+                    else:
+                        config[key] = value
+                    yield f"{preset_name}/{style}/{key}={value}", config
+
+def time_frames(widget, size, frames, flags):
+    """Render widget into a size-sized surface frames times; return (cold, sorted warm) in microseconds"""
+    width, height = size
+    image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    samples = []
+    for _ in range(frames + 1):
+        start = time.perf_counter()
+        # A translucent window's backing store is cleared before every paint
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        widget.render(painter, flags=flags)
+        painter.end()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples[0], sorted(samples[1:])
+
+def make_widgets(crosshair_script):
+    overlay = crosshair_script.CrosshairOverlay(bounded=False)
+    overlay.hide()
+    overlay.setWindowState(Qt.WindowNoState)
+    bounded_overlay = crosshair_script.CrosshairOverlay(bounded=True)
+    bounded_overlay.hide()
+    preview = crosshair_script.CrosshairPreview()
+    return overlay, bounded_overlay, preview
+
+def record(results, case, cold, warm):
+    """Keep the fastest round seen for case"""
+    stats = {
+        'cold_us': cold,
+        'p50_us': percentile(warm, 0.50),
+        'p90_us': percentile(warm, 0.90),
+        'p99_us': percentile(warm, 0.99),
+    }
+    previous = results.get(case)
+    if previous is None or stats['p50_us'] < previous['p50_us']:
+        results[case] = stats
+
+def run(args):
+    # The overlay reads and writes its settings in the working directory
+    os.chdir(tempfile.mkdtemp())
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    import crosshair_script
+
+    overlay, bounded_overlay, preview = make_widgets(crosshair_script)
+    sizes = QUICK_SURFACE_SIZES if args.quick else SURFACE_SIZES
+    results = {}
+    for _ in range(args.rounds):
+        for config_name, config in bench_configs(crosshair_script.DEFAULT_PRESETS):
+            for widget_name, widget, flags in (
+                    ('overlay', overlay, QWidget.DrawChildren),
+                    ('preview', preview, QWidget.DrawWindowBackground | QWidget.DrawChildren)):
+                widget.update_config(dict(config))
+                for size in sizes:
+                    widget.resize(*size)
+                    app.processEvents()
+                    cold, warm = time_frames(widget, size, args.frames, flags)
+                    record(results, f"{widget_name}@{size[0]}x{size[1]}/{config_name}", cold, warm)
+            # The bounded overlay's surface follows the crosshair, not the screen
+            bounded_overlay.update_config(dict(config))
+            app.processEvents()
+            size = (bounded_overlay.width(), bounded_overlay.height())
+            cold, warm = time_frames(bounded_overlay, size, args.frames, QWidget.DrawChildren)
+            record(results, f"overlay@bounded/{config_name}", cold, warm)
+    overlay.close()
+    bounded_overlay.close()
+    return results
+
+def summarize(results):
+    """Print p50/p90/p99 per widget and surface, taken over every config"""
+    groups = {}
+    for case, stats in results.items():
+        groups.setdefault(case.split('/', 1)[0], []).append(stats)
+    print(f"{'surface':24s} {'cases':>5s} {'p50 us':>9s} {'p90 us':>9s} {'p99 us':>9s} {'cold us':>9s}")
+    for group, stats in sorted(groups.items()):
+        row = [sorted(s[key] for s in stats) for key in ('p50_us', 'p90_us', 'p99_us', 'cold_us')]
+        print(f"{group:24s} {len(stats):5d} " + ' '.join(f"{percentile(v, 0.5):9.1f}" for v in row))
+
+def compare(results, baseline, threshold, min_delta_us):
+    """Return the cases that got slower than baseline by more than threshold"""
+    regressions = []
+    for case, stats in results.items():
+        old = baseline.get(case)
+        if old is None:
+            continue
+        delta = stats['p50_us'] - old['p50_us']
+        if delta > min_delta_us and stats['p50_us'] > old['p50_us'] * (1 + threshold):
+            regressions.append((case, old['p50_us'], stats['p50_us']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless crosshair render benchmark")
+    parser.add_argument('--frames', type=int, default=30, help="timed frames per case")
+    parser.add_argument('--rounds', type=int, default=2, help="times to run the whole sweep")
+    parser.add_argument('--quick', action='store_true', help="only benchmark two surface sizes")
+    parser.add_argument('--save-baseline', metavar='FILE', help="write the results to FILE as JSON")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against a saved baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown as a fraction of the baseline (default 0.25)")
+    parser.add_argument('--min-delta-us', type=float, default=20.0,
+                        help="ignore slowdowns smaller than this many microseconds (default 20)")
+    args = parser.parse_args()
+    for option in ('save_baseline', 'baseline'):
+        if getattr(args, option):
+            setattr(args, option, os.path.abspath(getattr(args, option)))
+
+    results = run(args)
+    summarize(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_us)
+        for case, old, new in regressions:
+            print(f"REGRESSION {case} p50: {old:.1f}us -> {new:.1f}us")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == '__main__':
+    main()
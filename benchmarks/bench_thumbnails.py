@@ -0,0 +1,149 @@
+"""Time the preset thumbnail atlas against drawing every thumbnail again.
+
+For each count in --presets (10 and 1,000 by default) this reports:
+- a cold build of the atlas;
+- reopening it, which is what happens each time the menu is first opened
+  in a new session;
+- refreshing after one preset changed;
+- drawing every thumbnail from scratch, which is what showing thumbnails
+  would cost without the atlas;
+- looking a thumbnail up in the atlas.
+
+The run exits with status 1 if reopening the atlas draws a tile or takes
+longer than --max-reopen-ms, one changed preset doesn't draw exactly one
+tile, a tile read back from the file differs from a freshly drawn
+thumbnail, a lookup takes longer than --max-lookup-us, or a tile isn't a
+view of the mapped file.
+
+    python benchmarks/bench_thumbnails.py
+    python benchmarks/bench_thumbnails.py --presets 10 1000 10000 --max-reopen-ms 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtGui import QIcon, QImage, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+from crosshair_config import DEFAULT_PRESETS, config_hash
+from crosshair_metrics import percentile
+from crosshair_thumbnails import THUMBNAIL_SIZE, ThumbnailAtlas, draw_thumbnail
+
+def make_presets(count):
+    rng = random.Random(count)
+    presets = dict(DEFAULT_PRESETS)
+    for i in range(count - len(presets)):
+        presets[f"Preset {i}"] = dict(DEFAULT_PRESETS['Default Green'],
+                                      color={'r': rng.randrange(256), 'g': rng.randrange(256),
+                                             'b': rng.randrange(256), 'a': 255},
+                                      crosshair_length=rng.randint(2, 50),
+                                      crosshair_gap=rng.randint(0, 20),
+                                      crosshair_style=rng.choice(('cross', 'dot')),
+                                      dot_size=rng.randint(2, 20))
+    return presets
+
+def load_icons(atlas, configs):
+    """What the menu does with the atlas: refresh it, then make one icon per config"""
+    atlas.refresh(configs)
+    return [QIcon(QPixmap.fromImage(atlas.image(key))) for key in configs]
+
+def redraw_icons(configs):
+    """Draw every thumbnail into its own image, as a menu without the atlas would"""
+    icons = []
+    for config in configs.values():
+        image = QImage(THUMBNAIL_SIZE, THUMBNAIL_SIZE, QImage.Format_ARGB32_Premultiplied)
+        draw_thumbnail(image, config)
+        icons.append(QIcon(QPixmap.fromImage(image)))
+    return icons
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1e3
+
+def check_tiles(atlas, configs):
+    """Return the config hashes whose tile differs from a freshly drawn thumbnail"""
+    fresh = QImage(THUMBNAIL_SIZE, THUMBNAIL_SIZE, QImage.Format_ARGB32_Premultiplied)
+    wrong = []
+    for key, config in configs.items():
+        draw_thumbnail(fresh, config)
+        if atlas.image(key) != fresh:
+            wrong.append(key)
+    return wrong
+
+def lookup_times(atlas, keys, rounds=5):
+    samples = []
+    for _ in range(rounds):
+        for key in keys:
+            start = time.perf_counter()
+            atlas.image(key)
+            samples.append(time.perf_counter() - start)
+    return sorted(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--presets', type=int, nargs='+', default=[10, 1000],
+                        help="preset counts to run (default 10 1000)")
+    parser.add_argument('--max-reopen-ms', type=float, default=100.0,
+                        help="allowed time to reopen the atlas and make every icon in ms (default 100)")
+    parser.add_argument('--max-lookup-us', type=float, default=50.0,
+                        help="allowed median thumbnail lookup in microseconds (default 50)")
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    os.chdir(tempfile.mkdtemp())
+    failures = []
+    for count in args.presets:
+        presets = make_presets(count)
+        configs = {config_hash(config): config for config in presets.values()}
+        filename = f"bench_{count}.atlas"
+
+        cold = timed(lambda: load_icons(ThumbnailAtlas(filename), configs))
+        reopened = ThumbnailAtlas(filename)
+        warm = timed(load_icons, reopened, configs)
+        if reopened.rendered:
+            failures.append(f"{count} presets: reopening the atlas drew {reopened.rendered} tiles")
+        if warm > args.max_reopen_ms:
+            failures.append(f"{count} presets: reopening the atlas took {warm:.1f} ms")
+        wrong = check_tiles(reopened, configs)
+        if wrong:
+            failures.append(f"{count} presets: {len(wrong)} tiles read back from the atlas differ from "
+                            f"a fresh thumbnail")
+        lookups = lookup_times(reopened, list(configs))
+        lookup = percentile(lookups, 0.5) * 1e6
+        if lookup > args.max_lookup_us:
+            failures.append(f"{count} presets: a thumbnail lookup took {lookup:.1f} us")
+
+        atlas = ThumbnailAtlas(filename)
+        changed = dict(configs)
+        key = next(iter(changed))
+        config = dict(changed.pop(key), crosshair_gap=99)
+        changed[config_hash(config)] = config
+        one = timed(load_icons, atlas, changed)
+        if atlas.rendered != 1:
+            failures.append(f"{count} presets: one changed preset drew {atlas.rendered} tiles")
+        if check_tiles(atlas, {config_hash(config): config}):
+            failures.append(f"{count} presets: the changed preset's tile differs from a fresh thumbnail")
+        redraw = timed(redraw_icons, configs)
+
+        image = atlas.image(key) or atlas.image(config_hash(config))
+        zero_copy = int(image.constBits()) != 0 and image.atlas_view.obj is atlas.map
+        if not zero_copy:
+            failures.append(f"{count} presets: a tile was copied out of the mapped file")
+        print(f"{count:5d} presets: cold {cold:7.1f} ms  reopen {warm:6.1f} ms  "
+              f"one changed {one:6.1f} ms ({atlas.rendered} drawn)  redraw all {redraw:7.1f} ms  "
+              f"lookup {lookup:5.1f} us  zero-copy {zero_copy}")
+    app.processEvents()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+if __name__ == '__main__':
+    main()
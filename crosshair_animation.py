@@ -0,0 +1,252 @@
+"""Frame-paced animations for the overlay
+
+One AnimationScheduler drives every running animation from a single timer
+that fires on a grid of display refresh intervals. The timer only runs
+while some animation is moving and is stopped as soon as they all come to
+rest, so a static crosshair costs nothing.
+"""
+import math
+import time
+
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QGuiApplication
+
+from crosshair_metrics import RingBuffer, percentile
+
+# Gap bloom defaults: pixels added to the gap on a click, and how long it takes to settle
+BLOOM_PIXELS = 6
+BLOOM_DURATION = 0.25
+# Opacity pulse defaults
+PULSE_RATE_HZ = 1.0
+PULSE_MIN_OPACITY = 0.35
+
+def ease_out_cubic(t):
+    return 1 - (1 - t) ** 3
+
+class Animation:
+    """A value that moves over time until it comes to rest
+
+    Subclasses implement value_at(now), returning (value, done). The value
+    is quantized by the subclass so that frames that would draw the same
+    thing don't count as changes.
+    """
+    rest = 0
+
+    def __init__(self):
+        self.value = self.rest
+        self.running = False
+
+    def value_at(self, now):
+        raise NotImplementedError
+
+    def step(self, now):
+        """Advance to now; returns True if the value changed"""
+        value, done = self.value_at(now)
+        changed = value != self.value
+        self.value = value
+        if done:
+            self.running = False
+        return changed
+
+class GapBloom(Animation):
+    """Widens the gap by up to pixels when triggered and eases it back to rest over duration seconds"""
+
+    def __init__(self, pixels=BLOOM_PIXELS, duration=BLOOM_DURATION):
+        super().__init__()
+        self.pixels = pixels
+        self.duration = duration
+        self.started = 0.0
+
+    def trigger(self, now):
+        self.started = now
+        self.running = True
+
+    def value_at(self, now):
+        t = min(max((now - self.started) / self.duration, 0.0), 1.0)
+        value = int(round(self.pixels * (1 - ease_out_cubic(t))))
+        # Done on the frame that first draws the rest value, so the frame that ends it is a change
+        return value, value == self.rest
+
+class OpacityPulse(Animation):
+    """Swings the opacity between minimum and 1, rate_hz times a second, until stopped"""
+    rest = 1.0
+
+    def __init__(self, rate_hz=PULSE_RATE_HZ, minimum=PULSE_MIN_OPACITY):
+        super().__init__()
+        self.rate_hz = rate_hz
+        self.minimum = minimum
+        self.started = 0.0
+
+    def start(self, now):
+        self.started = now
+        self.running = True
+
+    def stop(self):
+        self.running = False
+        self.value = self.rest
+
+    def value_at(self, now):
+        if not self.running:
+            return self.rest, True
+        phase = 0.5 + 0.5 * math.cos(2 * math.pi * self.rate_hz * (now - self.started))
+        # 8-bit steps, the most a premultiplied pixel can show
+        return round((self.minimum + (1 - self.minimum) * phase) * 255) / 255, False
+
+class AnimationScheduler(QObject):
+    """Steps running animations once per display frame and stops its timer when they are all at rest
+
+    Ticks are aimed at a grid of refresh intervals starting at the first
+    tick, so timer rounding doesn't accumulate into drift. A tick more than
+    half a frame late skips to the nearest grid point and counts the frames
+    it missed.
+    """
+    frame = pyqtSignal()
+
+    def __init__(self, screen=None, parent=None, capacity=1024):
+        super().__init__(parent)
+        # The screen whose refresh rate sets the pace, or None for the primary screen
+        self.screen = screen
+        self.animations = []
+        self.anchor = 0.0
+        self.interval = 1 / 60.0
+        self.slot = -1
+        self.last_tick = None
+        self.tick_count = 0
+        self.frame_count = 0
+        self.missed_frames = 0
+        self.run_count = 0
+        self.tick_intervals = RingBuffer(capacity)
+        # How far each tick landed from its grid point, late positive
+        self.tick_offsets = RingBuffer(capacity)
+        self.tick_durations = RingBuffer(capacity)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+
+    def frame_interval(self):
+        """Return the refresh interval of the screen in seconds"""
+        screen = self.screen or QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen else 0
+        return 1.0 / (refresh_rate if refresh_rate > 0 else 60.0)
+
+    def start(self, animation):
+        """Keep stepping animation until it comes to rest; the first step is on the next event loop pass"""
+        if animation not in self.animations:
+            self.animations.append(animation)
+        if not self.timer.isActive() and self.slot < 0:
+            self.anchor = time.perf_counter()
+            self.interval = self.frame_interval()
+            self.last_tick = None
+            self.run_count += 1
+            self.timer.start(0)
+
+    def stop(self):
+        self.animations = []
+        self.timer.stop()
+        self.slot = -1
+
+    @property
+    def active(self):
+        return self.timer.isActive()
+
+    def tick(self):
+        now = time.perf_counter()
+        slot = max(self.slot + 1, int(round((now - self.anchor) / self.interval)))
+        if self.slot >= 0:
+            self.missed_frames += slot - self.slot - 1
+        self.slot = slot
+        self.tick_offsets.append(now - self.anchor - slot * self.interval)
+        if self.last_tick is not None:
+            self.tick_intervals.append(now - self.last_tick)
+        self.last_tick = now
+        self.tick_count += 1
+
+        changed = False
+        for animation in self.animations:
+            if animation.step(now):
+                changed = True
+        self.animations = [animation for animation in self.animations if animation.running]
+        if changed:
+            self.frame_count += 1
+            self.frame.emit()
+        self.tick_durations.append(time.perf_counter() - now)
+
+        if self.animations:
+            wait = self.anchor + (slot + 1) * self.interval - time.perf_counter()
+            self.timer.start(max(0, int(round(wait * 1000))))
+        else:
+            # Everything is at rest; nothing runs until the next start()
+            self.slot = -1
+
+    def stats(self):
+        intervals = sorted(self.tick_intervals.samples())
+        durations = sorted(self.tick_durations.samples())
+        offsets = sorted(abs(offset) for offset in self.tick_offsets.samples())
+        return {
+            'running': self.active,
+            'frame interval ms': round(self.interval * 1000, 3),
+            'runs': self.run_count,
+            'ticks': self.tick_count,
+            'frames drawn': self.frame_count,
+            'frames missed': self.missed_frames,
+            'tick interval p50 ms': round(percentile(intervals, 0.5) * 1000, 3),
+            'tick interval p99 ms': round(percentile(intervals, 0.99) * 1000, 3),
+            'tick offset p99 ms': round(percentile(offsets, 0.99) * 1000, 3),
+            'tick cost p99 ms': round(percentile(durations, 0.99) * 1000, 3),
+        }
+
+class CrosshairAnimator(QObject):
+    """The animations an overlay draws with: gap bloom on clicks and a pulsing opacity
+
+    Either one is off when its pixels or rate is 0. changed is emitted on
+    every frame that draws something different.
+    """
+    changed = pyqtSignal()
+
+    def __init__(self, scheduler=None, bloom_pixels=0, bloom_duration=BLOOM_DURATION,
+                 pulse_rate_hz=0.0, pulse_min_opacity=PULSE_MIN_OPACITY, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler if scheduler is not None else AnimationScheduler(parent=self)
+        self.scheduler.frame.connect(self.changed)
+        self.bloom = GapBloom(bloom_pixels, bloom_duration) if bloom_pixels > 0 else None
+        self.pulse = OpacityPulse(pulse_rate_hz, pulse_min_opacity) if pulse_rate_hz > 0 else None
+
+    @property
+    def opacity(self):
+        return self.pulse.value if self.pulse is not None else 1.0
+
+    @property
+    def shape_at_rest(self):
+        """True unless an animation is changing the crosshair's size"""
+        return self.bloom is None or not self.bloom.running
+
+    def start(self):
+        if self.pulse is not None:
+            self.pulse.start(time.perf_counter())
+            self.scheduler.start(self.pulse)
+
+    def stop(self):
+        if self.pulse is not None:
+            self.pulse.stop()
+        self.scheduler.stop()
+
+    def press(self, *args):
+        """Bloom the gap, as on a mouse button press"""
+        if self.bloom is not None:
+            self.bloom.trigger(time.perf_counter())
+            self.scheduler.start(self.bloom)
+
+    def adapt(self, config):
+        """Return the config to draw this frame"""
+        if self.bloom is not None and self.bloom.value and config.crosshair_style == 'cross':
+            return config.replace(crosshair_gap=config.crosshair_gap + self.bloom.value)
+        return config
+
+    def stats(self):
+        stats = self.scheduler.stats()
+        if self.bloom is not None:
+            stats['gap bloom px'] = self.bloom.value
+        if self.pulse is not None:
+            stats['opacity'] = round(self.pulse.value, 3)
+        return stats
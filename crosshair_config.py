@@ -0,0 +1,587 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from functools import partial
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QPen
+
+from crosshair_storage import JournaledPresetStore, atomic_write_json, get_persistence_worker, read_json_lines
+
+SETTINGS_FILENAME = 'crosshair_settings.json'
+PRESETS_FILENAME = 'crosshair_presets.json'
+# Writers often touch a file several times in a row; wait this long for quiet before re-reading
+WATCH_DEBOUNCE_MS = 150
+
+# Default configuration
+DEFAULT_CONFIG = {
+    'color': {'r': 0, 'g': 255, 'b': 0, 'a': 255},  # Green
+    'outline_color': {'r': 0, 'g': 0, 'b': 0, 'a': 255},  # Black
+    'line_thickness': 2,
+    'crosshair_length': 8,
+    'crosshair_gap': 2,
+    'outline_enabled': True,
+    'outline_thickness': 1,
+    'crosshair_style': 'cross',  # 'cross' or 'dot'
+    'dot_size': 6
+}
+
+# Default crosshair presets
+DEFAULT_PRESETS = {
+    'Default Green': {
+        'color': {'r': 0, 'g': 255, 'b': 0, 'a': 255},
+        'outline_color': {'r': 0, 'g': 0, 'b': 0, 'a': 255},
+        'line_thickness': 2,
+        'crosshair_length': 8,
+        'crosshair_gap': 2,
+        'outline_enabled': True,
+        'outline_thickness': 1,
+        'crosshair_style': 'cross',
+        'dot_size': 6
+    },
+    'Red Dot': {
+        'color': {'r': 255, 'g': 0, 'b': 0, 'a': 255},
+        'outline_color': {'r': 0, 'g': 0, 'b': 0, 'a': 255},
+        'line_thickness': 2,
+        'crosshair_length': 0,
+        'crosshair_gap': 0,
+        'outline_enabled': True,
+        'outline_thickness': 1,
+        'crosshair_style': 'dot',
+        'dot_size': 8
+    },
+    'Blue Cross': {
+        'color': {'r': 0, 'g': 0, 'b': 255, 'a': 255},
+        'outline_color': {'r': 255, 'g': 255, 'b': 255, 'a': 255},
+        'line_thickness': 3,
+        'crosshair_length': 12,
+        'crosshair_gap': 4,
+        'outline_enabled': True,
+        'outline_thickness': 2,
+        'crosshair_style': 'cross',
+        'dot_size': 6
+    },
+    'White Minimal': {
+        'color': {'r': 255, 'g': 255, 'b': 255, 'a': 255},
+        'outline_color': {'r': 0, 'g': 0, 'b': 0, 'a': 255},
+        'line_thickness': 1,
+        'crosshair_length': 6,
+        'crosshair_gap': 1,
+        'outline_enabled': False,
+        'outline_thickness': 1,
+        'crosshair_style': 'cross',
+        'dot_size': 6
+    }
+}
+
+def validate_color(color, key):
+    if not isinstance(color, dict):
+        raise ValueError(f"{key} must be an object")
+    for channel in ('r', 'g', 'b', 'a'):
+        value = color.get(channel)
+        if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 255:
+            raise ValueError(f"{key}.{channel} must be an integer from 0 to 255")
+
+def validate_config(config):
+    """Raise ValueError unless config is a crosshair config the overlay can draw"""
+    if not isinstance(config, dict):
+        raise ValueError("config must be an object")
+    for key in ('color', 'outline_color'):
+        validate_color(config.get(key), key)
+    minimums = {'line_thickness': 1, 'crosshair_length': 0, 'crosshair_gap': 0, 'outline_thickness': 0}
+    if 'dot_size' in config:
+        minimums['dot_size'] = 1
+    for key, minimum in minimums.items():
+        value = config.get(key)
+        if not isinstance(value, int) or isinstance(value, bool) or value < minimum:
+            raise ValueError(f"{key} must be an integer of at least {minimum}")
+    if not isinstance(config.get('outline_enabled'), bool):
+        raise ValueError("outline_enabled must be true or false")
+    if config.get('crosshair_style', 'cross') not in ('cross', 'dot'):
+        raise ValueError("crosshair_style must be 'cross' or 'dot'")
+
+# Keys older configs may lack, and the values they are drawn with
+OPTIONAL_DEFAULTS = {'crosshair_style': 'cross', 'dot_size': 6}
+
+def config_hash(config):
+    """Return a canonical hash of a crosshair config, independent of key order
+
+    Only the fields CrosshairConfig keeps are hashed, so a dict with extra
+    keys hashes the same as the CrosshairConfig made from it.
+    """
+    if isinstance(config, CrosshairConfig):
+        return config.key
+    canonical = {name: config.get(name, OPTIONAL_DEFAULTS.get(name)) for name in CrosshairConfig.FIELDS}
+    for name in ('color', 'outline_color'):
+        color = canonical[name]
+        if isinstance(color, dict):
+            canonical[name] = {channel: color.get(channel) for channel in 'rgba'}
+    return _canonical_hash(canonical)
+
+def _canonical_hash(config):
+    canonical = json.dumps(config, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+def _line_pen(color, width):
+    pen = QPen(color, width)
+    pen.setCosmetic(True)
+    pen.setCapStyle(Qt.FlatCap)
+    pen.setJoinStyle(Qt.RoundJoin)
+    return pen
+
+class CrosshairConfig:
+    """Immutable, validated crosshair config
+
+    Colors are (r, g, b, a) tuples, so nothing nested is shared between
+    configs and a copy is just another reference. The QColor and QPen
+    objects the renderer needs and the config hash are built on first use
+    and kept on the instance. from_dict and to_dict convert to and from the
+    JSON shape stored in the settings and preset files.
+    """
+    FIELDS = ('color', 'outline_color', 'line_thickness', 'crosshair_length', 'crosshair_gap',
+              'outline_enabled', 'outline_thickness', 'crosshair_style', 'dot_size')
+    __slots__ = FIELDS + ('_key', '_qcolor', '_outline_qcolor', '_line_pen', '_outline_pen')
+
+    def __init__(self, color, outline_color, line_thickness, crosshair_length, crosshair_gap,
+                 outline_enabled, outline_thickness, crosshair_style='cross', dot_size=6):
+        values = (tuple(color), tuple(outline_color), line_thickness, crosshair_length, crosshair_gap,
+                  outline_enabled, outline_thickness, crosshair_style, dot_size)
+        for name, value in zip(self.FIELDS, values):
+            object.__setattr__(self, name, value)
+        for name in ('_key', '_qcolor', '_outline_qcolor', '_line_pen', '_outline_pen'):
+            object.__setattr__(self, name, None)
+
+    @classmethod
+    def from_dict(cls, config):
+        """Validate a JSON-shaped config and convert it; raises ValueError if it is invalid"""
+        validate_config(config)
+        color = config['color']
+        outline_color = config['outline_color']
+        return cls((color['r'], color['g'], color['b'], color['a']),
+                   (outline_color['r'], outline_color['g'], outline_color['b'], outline_color['a']),
+                   config['line_thickness'], config['crosshair_length'], config['crosshair_gap'],
+                   config['outline_enabled'], config['outline_thickness'],
+                   config.get('crosshair_style', 'cross'), config.get('dot_size', 6))
+
+    @classmethod
+    def coerce(cls, config):
+        """Return config as a CrosshairConfig, converting a JSON-shaped dict"""
+        return config if isinstance(config, cls) else cls.from_dict(config)
+
+    def to_dict(self):
+        """Return a new JSON-shaped dict, sharing nothing with this config"""
+        config = {name: getattr(self, name) for name in self.FIELDS}
+        for name in ('color', 'outline_color'):
+            config[name] = dict(zip('rgba', config[name]))
+        return config
+
+    def replace(self, **changes):
+        """Return a copy with some fields changed, given in the JSON shape"""
+        config = self.to_dict()
+        config.update(changes)
+        return self.from_dict(config)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"CrosshairConfig is immutable, use replace() to change {name}")
+
+    def __eq__(self, other):
+        if not isinstance(other, CrosshairConfig):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.FIELDS))
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"CrosshairConfig({fields})"
+
+    @property
+    def key(self):
+        """The config_hash of this config, the key of the render cache and the preset index"""
+        if self._key is None:
+            object.__setattr__(self, '_key', _canonical_hash(self.to_dict()))
+        return self._key
+
+    @property
+    def qcolor(self):
+        if self._qcolor is None:
+            object.__setattr__(self, '_qcolor', QColor(*self.color))
+        return self._qcolor
+
+    @property
+    def outline_qcolor(self):
+        if self._outline_qcolor is None:
+            object.__setattr__(self, '_outline_qcolor', QColor(*self.outline_color))
+        return self._outline_qcolor
+
+    @property
+    def line_pen(self):
+        """Cosmetic pen for the crosshair lines"""
+        if self._line_pen is None:
+            object.__setattr__(self, '_line_pen', _line_pen(self.qcolor, self.line_thickness))
+        return self._line_pen
+
+    @property
+    def outline_pen(self):
+        """Cosmetic pen for the outline drawn under the crosshair lines"""
+        if self._outline_pen is None:
+            width = self.line_thickness + self.outline_thickness * 2
+            object.__setattr__(self, '_outline_pen', _line_pen(self.outline_qcolor, width))
+        return self._outline_pen
+
+# Share codes: a config packed into a few bytes behind a prefix, e.g. CH-AQD_AP8AAAD_AQIIAgEGAw
+SHARE_CODE_PREFIX = 'CH-'
+SHARE_CODE_VERSION = 1
+# Stored as unsigned LEB128 varints after the colors and flags, in this order
+SHARE_CODE_SIZES = ('line_thickness', 'crosshair_length', 'crosshair_gap', 'outline_thickness', 'dot_size')
+_TO_URLSAFE = bytes.maketrans(b'+/', b'-_')
+_FROM_URLSAFE = bytes.maketrans(b'-_', b'+/')
+_BASE64_ALPHABET = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+def encode_share_code(config, binascii=None):
+    """Return a short text code for config that decode_share_code turns back into it
+
+    Version 1 is one version byte, the two RGBA colors, a flags byte
+    (outline enabled, dot style), the sizes as varints and a CRC-32 byte,
+    in unpadded URL-safe base64.
+    """
+    if binascii is None:
+        # Only needed when sharing, so keep it off the startup path
+        import binascii
+    config = CrosshairConfig.coerce(config)
+    data = bytearray((SHARE_CODE_VERSION,))
+    data += bytes(config.color)
+    data += bytes(config.outline_color)
+    data.append(int(config.outline_enabled) | (config.crosshair_style == 'dot') << 1)
+    for name in SHARE_CODE_SIZES:
+        value = getattr(config, name)
+        while value >= 0x80:
+            data.append(value & 0x7f | 0x80)
+            value >>= 7
+        data.append(value)
+    data.append(binascii.crc32(data) & 0xff)
+    text = binascii.b2a_base64(bytes(data)).rstrip(b'=\n').translate(_TO_URLSAFE)
+    return SHARE_CODE_PREFIX + text.decode('ascii')
+
+def decode_share_code(code, binascii=None):
+    """Return the CrosshairConfig a share code stands for; raises ValueError for a bad or mistyped code"""
+    if binascii is None:
+        import binascii
+    code = code.strip()
+    if not code.startswith(SHARE_CODE_PREFIX):
+        raise ValueError(f"a share code starts with {SHARE_CODE_PREFIX}")
+    text = code[len(SHARE_CODE_PREFIX):].encode('ascii', 'replace').translate(_FROM_URLSAFE)
+    try:
+        # a2b_base64 skips characters outside the alphabet, which would hide typos
+        if text.translate(None, _BASE64_ALPHABET):
+            raise binascii.Error()
+        data = binascii.a2b_base64(text + b'=' * (-len(text) % 4))
+    except binascii.Error:
+        raise ValueError("share code is not valid base64")
+    if not data:
+        raise ValueError("share code is empty")
+    if data[0] != SHARE_CODE_VERSION:
+        raise ValueError(f"unsupported share code version {data[0]}")
+    if len(data) < 16 or binascii.crc32(data[:-1]) & 0xff != data[-1]:
+        raise ValueError("share code is damaged or mistyped")
+    config = {
+        'color': dict(zip('rgba', data[1:5])),
+        'outline_color': dict(zip('rgba', data[5:9])),
+        'outline_enabled': bool(data[9] & 1),
+        'crosshair_style': 'dot' if data[9] & 2 else 'cross',
+    }
+    position = 10
+    for name in SHARE_CODE_SIZES:
+        value = shift = 0
+        while True:
+            if position >= len(data) - 1:
+                raise ValueError("share code is cut short")
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        config[name] = value
+    if position != len(data) - 1:
+        raise ValueError("share code has extra data")
+    return CrosshairConfig.from_dict(config)
+
+def encode_share_codes(configs):
+    """Return the share code of each config"""
+    import binascii
+    return [encode_share_code(config, binascii) for config in configs]
+
+def decode_share_codes(codes):
+    """Return the config of each share code; raises ValueError naming the first bad one"""
+    import binascii
+    configs = []
+    for index, code in enumerate(codes):
+        try:
+            configs.append(decode_share_code(code, binascii))
+        except ValueError as e:
+            raise ValueError(f"share code {index + 1}: {e}")
+    return configs
+
+# Preset packs are JSON Lines: an optional header, then one
+# {"name": ..., "config": {...}} or {"name": ..., "code": "CH-..."} per line
+PRESET_PACK_FORMAT = 'crosshair-presets'
+PRESET_PACK_VERSION = 1
+
+def preset_pack_records(presets, codes=False):
+    """Yield the header and records of a preset pack for a {name: config} dict, one at a time"""
+    yield {'format': PRESET_PACK_FORMAT, 'version': PRESET_PACK_VERSION}
+    if codes:
+        import binascii
+    for name, config in presets.items():
+        if codes:
+            yield {'name': name, 'code': encode_share_code(config, binascii)}
+        else:
+            yield {'name': name, 'config': CrosshairConfig.coerce(config).to_dict()}
+
+def read_preset_pack(filename):
+    """Yield (line number, name, CrosshairConfig, error) for each record of a preset pack, one line at a time
+
+    config is None and error says why for a record that can't be used.
+    Raises ValueError if the header names another format or a newer version.
+    """
+    import binascii
+    first = True
+    for line_number, record in read_json_lines(filename):
+        if first:
+            first = False
+            if isinstance(record, dict) and 'format' in record:
+                if record['format'] != PRESET_PACK_FORMAT:
+                    raise ValueError(f"{filename} is not a preset pack")
+                if not isinstance(record.get('version'), int) or record['version'] > PRESET_PACK_VERSION:
+                    raise ValueError(f"{filename} is a version {record.get('version')} preset pack, "
+                                     f"this version reads up to {PRESET_PACK_VERSION}")
+                continue
+        if not isinstance(record, dict):
+            yield line_number, None, None, "not a JSON object"
+            continue
+        name = record.get('name')
+        if not isinstance(name, str) or not name:
+            yield line_number, None, None, "no preset name"
+            continue
+        try:
+            if 'code' in record:
+                if not isinstance(record['code'], str):
+                    raise ValueError("code must be a string")
+                config = decode_share_code(record['code'], binascii)
+            else:
+                config = CrosshairConfig.from_dict(record.get('config'))
+        except ValueError as e:
+            yield line_number, name, None, str(e)
+            continue
+        yield line_number, name, config, None
+
+def file_signature(filenames):
+    """Return the (mtime, size) of each file, with None for a missing file"""
+    signature = []
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def changed_keys(old, new):
+    """Return the keys whose values differ between two dicts, including added and removed keys"""
+    keys = [key for key, value in new.items() if key not in old or old[key] != value]
+    keys.extend(key for key in old if key not in new)
+    return keys
+
+class CachedDocument:
+    """A document parsed from one or more files, re-read only when their mtime or size changes"""
+
+    def __init__(self, filenames, loader):
+        self.filenames = filenames
+        self.loader = loader
+        self.data = None
+        self.signature = None
+        self.pending_writes = 0
+
+    def is_stale(self):
+        # While our own writes are queued the file lags behind memory, so it is not re-read
+        return self.pending_writes == 0 and file_signature(self.filenames) != self.signature
+
+    def reload(self):
+        """Re-parse the files; returns (changed keys, previous values of those keys)"""
+        # Stat before reading so a write that lands mid-read is picked up next time
+        self.signature = file_signature(self.filenames)
+        data = self.loader()
+        if data is self.data:
+            # The loader kept the current data, e.g. because the file was invalid
+            return [], {}
+        if self.data is None or data is None:
+            previous = self.data or {}
+            self.data = data
+            return changed_keys(previous, data or {}), previous
+        keys = changed_keys(self.data, data)
+        previous = {key: self.data[key] for key in keys if key in self.data}
+        # Update in place so everyone holding the dict sees the new content
+        self.data.clear()
+        self.data.update(data)
+        return keys, previous
+
+class ConfigService(QObject):
+    """Owns the settings and preset files for the whole process and serves them from memory
+
+    Each file is parsed once and re-read only when its mtime or size
+    changes. Subscribers to settings_changed and presets_changed receive the
+    keys that changed and the values those keys had before; the current
+    values are in settings() and presets().
+
+    Writes go through submit(), which queues them on the persistence worker
+    and remembers the file signature afterwards, so the service does not
+    mistake its own writes for outside edits.
+    """
+    settings_changed = pyqtSignal(list, dict)
+    presets_changed = pyqtSignal(list, dict)
+
+    def __init__(self, settings_filename=SETTINGS_FILENAME, presets_filename=PRESETS_FILENAME,
+                 worker=None, parent=None):
+        super().__init__(parent)
+        self.settings_filename = settings_filename
+        self.presets_filename = presets_filename
+        self.worker = worker
+        self.preset_store = JournaledPresetStore(presets_filename, worker=self)
+        self.settings_document = CachedDocument((settings_filename,), self.read_settings)
+        self.presets_document = CachedDocument(
+            (presets_filename, self.preset_store.journal_filename), self.read_presets)
+        self.documents = {
+            settings_filename: self.settings_document,
+            presets_filename: self.presets_document,
+            self.preset_store.journal_filename: self.presets_document,
+        }
+        self.watcher = None
+        self.debounce_timer = None
+        if worker is not None:
+            worker.write_finished.connect(self.write_done)
+            worker.write_failed.connect(self.write_done)
+
+    def read_settings(self):
+        if not os.path.exists(self.settings_filename):
+            return None
+        try:
+            with open(self.settings_filename, 'r') as f:
+                settings = json.load(f)
+            validate_config(settings)
+            return settings
+        except Exception as e:
+            # Keep what we have; a half-written file is read again once its writer finishes
+            print(f"Error loading settings: {e}")
+            return self.settings_document.data
+
+    def read_presets(self):
+        """Return the default presets overlaid with the stored ones"""
+        presets = OrderedDict(DEFAULT_PRESETS)
+        try:
+            stored = self.preset_store.load()
+        except Exception as e:
+            print(f"Error loading presets: {e}")
+            return self.presets_document.data if self.presets_document.data is not None else presets
+        for name, config in stored.items():
+            try:
+                validate_config(config)
+            except ValueError as e:
+                print(f"Skipping invalid preset '{name}': {e}")
+                continue
+            presets[name] = config
+        return presets
+
+    def settings(self):
+        """Return the saved settings, or None if there are none"""
+        self.refresh_document(self.settings_document, self.settings_changed)
+        return self.settings_document.data
+
+    def presets(self):
+        """Return the presets dict; it is shared, so edits must be journaled through preset_store"""
+        self.refresh_document(self.presets_document, self.presets_changed)
+        return self.presets_document.data
+
+    def refresh(self):
+        """Re-read any file that changed on disk and notify the subscribers"""
+        self.refresh_document(self.settings_document, self.settings_changed)
+        self.refresh_document(self.presets_document, self.presets_changed)
+
+    def refresh_document(self, document, signal):
+        if document.signature is not None and not document.is_stale():
+            return
+        first_load = document.signature is None
+        keys, previous = document.reload()
+        if keys and not first_load:
+            signal.emit(keys, previous)
+
+    def watch(self, debounce_ms=WATCH_DEBOUNCE_MS):
+        """Re-read the files when they change on disk, once per burst of write events"""
+        if self.watcher is not None:
+            return
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(debounce_ms)
+        self.debounce_timer.timeout.connect(self.watched_files_settled)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.watched_file_changed)
+        self.watcher.directoryChanged.connect(self.watched_file_changed)
+        self.update_watched_paths()
+
+    def update_watched_paths(self):
+        # An atomic replace takes the watched file away and a missing file
+        # can't be watched, so the directories are watched too
+        filenames = [os.path.abspath(filename) for filename in self.documents]
+        paths = {os.path.dirname(filename) for filename in filenames}
+        paths.update(filename for filename in filenames if os.path.exists(filename))
+        watched = set(self.watcher.files()) | set(self.watcher.directories())
+        missing = sorted(paths - watched)
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def watched_file_changed(self, path):
+        # Restarting the timer folds a burst of events into one re-read
+        self.debounce_timer.start()
+
+    def watched_files_settled(self):
+        self.update_watched_paths()
+        self.refresh()
+
+    def save_settings(self, config):
+        """Update the in-memory settings and queue writing them to disk"""
+        config = dict(config)
+        if self.settings_document.data is None:
+            self.settings_document.data = config
+        else:
+            self.settings_document.data.clear()
+            self.settings_document.data.update(config)
+        self.submit(self.settings_filename, partial(atomic_write_json, self.settings_filename, config))
+
+    def submit(self, target, job, merge=True):
+        """Queue a write of one of the service's files; same signature as PersistenceWorker.submit"""
+        document = self.documents[target]
+        if self.worker is None:
+            job()
+            document.signature = file_signature(document.filenames)
+        elif self.worker.submit(target, job, merge):
+            document.pending_writes += 1
+
+    def write_done(self, target, error=None):
+        document = self.documents.get(target)
+        if document is None or document.pending_writes == 0:
+            return
+        document.pending_writes -= 1
+        if document.pending_writes == 0:
+            document.signature = file_signature(document.filenames)
+
+_config_service = None
+
+def get_config_service():
+    """Return the process-wide config service, creating it on first use"""
+    global _config_service
+    if _config_service is None:
+        _config_service = ConfigService(worker=get_persistence_worker())
+    return _config_service
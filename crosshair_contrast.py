@@ -0,0 +1,449 @@
+import sys
+import threading
+import time
+from collections import deque
+
+from PyQt5.QtCore import QObject, QRect, QThread, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QGuiApplication, QImage
+
+from crosshair_metrics import RingBuffer, percentile
+
+# CPU time of the calling thread where the platform has it
+thread_time = getattr(time, 'thread_time', time.perf_counter)
+
+CONTRAST_MODES = ('swap', 'contrast')
+# Below this WCAG contrast ratio against the background the main color counts as lost
+MIN_CONTRAST_RATIO = 3.0
+# Background pixels around the crosshair's own bounding box that are sampled
+SAMPLE_MARGIN = 12
+# The grab is averaged down to at most GRID x GRID cells before it is analyzed
+MAX_GRID = 16
+MIN_GRID = 4
+# A new color choice must be seen this many samples in a row before it is used
+SETTLE_SAMPLES = 2
+
+def _linear(channel):
+    channel /= 255.0
+    return channel / 12.92 if channel <= 0.04045 else ((channel + 0.055) / 1.055) ** 2.4
+
+LINEAR_SRGB = tuple(_linear(value) for value in range(256))
+
+def relative_luminance(r, g, b):
+    return 0.2126 * LINEAR_SRGB[r] + 0.7152 * LINEAR_SRGB[g] + 0.0722 * LINEAR_SRGB[b]
+
+def contrast_ratio(luminance, other):
+    """WCAG contrast ratio between two relative luminances"""
+    lighter, darker = max(luminance, other), min(luminance, other)
+    return (lighter + 0.05) / (darker + 0.05)
+
+def ring_cells(grid, inner_fraction):
+    """Return the cell indices of a grid x grid sample outside the centered inner box"""
+    low = grid * (1 - inner_fraction) / 2
+    high = grid - low
+    cells = []
+    for y in range(grid):
+        for x in range(grid):
+            if not (low <= x + 0.5 <= high and low <= y + 0.5 <= high):
+                cells.append(y * grid + x)
+    return cells
+
+def luminance_stats(image, grid, inner_fraction):
+    """Return (mean, standard deviation) of the luminance in the ring of a grabbed image"""
+    small = image.scaled(grid, grid, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    small = small.convertToFormat(QImage.Format_RGB32)
+    bits = small.constBits()
+    bits.setsize(small.byteCount())
+    data = bytes(bits)
+    stride = small.bytesPerLine()
+    values = []
+    for cell in ring_cells(grid, inner_fraction):
+        offset = (cell // grid) * stride + (cell % grid) * 4
+        # Format_RGB32 is stored as B, G, R, X on little endian machines
+        b, g, r = data[offset], data[offset + 1], data[offset + 2]
+        if sys.byteorder == 'big':
+            r, g, b = data[offset + 1], data[offset + 2], data[offset + 3]
+        values.append(relative_luminance(r, g, b))
+    if not values:
+        return 0.0, 0.0
+    mean = sum(values) / len(values)
+    variance = sum((value - mean) ** 2 for value in values) / len(values)
+    return mean, variance ** 0.5
+
+def device_rect(rect, screen):
+    """Map a rectangle in Qt's logical screen coordinates to the screen's device pixels
+
+    Qt keeps each screen's top left corner at its device position and scales
+    everything inside the screen by its device pixel ratio.
+    """
+    ratio = screen.devicePixelRatio()
+    origin = screen.geometry().topLeft()
+    return QRect(origin.x() + round((rect.x() - origin.x()) * ratio),
+                 origin.y() + round((rect.y() - origin.y()) * ratio),
+                 round(rect.width() * ratio), round(rect.height() * ratio))
+
+class ScreenSource:
+    """Supplies the pixels behind the crosshair
+
+    grab() returns a QImage of the given screen rectangle, or None. When
+    thread_safe is False the sampler calls it on the GUI thread and only
+    analyzes the result on its worker thread.
+    """
+    thread_safe = True
+    # Whether grab() takes device pixels rather than Qt's logical coordinates
+    device_pixels = False
+
+    def grab(self, rect):
+        raise NotImplementedError
+
+class QtScreenSource(ScreenSource):
+    """Grabs the primary screen through Qt; QPixmap work has to stay on the GUI thread"""
+    thread_safe = False
+
+    def grab(self, rect):
+        screen = QGuiApplication.screenAt(rect.center()) or QGuiApplication.primaryScreen()
+        if screen is None:
+            return None
+        return screen.grabWindow(0, rect.x(), rect.y(), rect.width(), rect.height()).toImage()
+
+class GdiScreenSource(ScreenSource):
+    """Grabs the screen with GDI on Windows; safe to call from the sampler thread
+
+    A plain SRCCOPY BitBlt leaves out layered windows, so the overlay itself
+    is not part of the sample.
+    """
+    SRCCOPY = 0x00CC0020
+    device_pixels = True
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.user32 = ctypes.windll.user32
+        self.gdi32 = ctypes.windll.gdi32
+        # Handles are pointer sized, so the default int return type would truncate them
+        for function in (self.user32.GetDC, self.gdi32.CreateCompatibleDC,
+                         self.gdi32.CreateCompatibleBitmap, self.gdi32.SelectObject):
+            function.restype = ctypes.c_void_p
+        self.user32.ReleaseDC.argtypes = (ctypes.c_void_p, ctypes.c_void_p)
+        self.gdi32.CreateCompatibleDC.argtypes = (ctypes.c_void_p,)
+        self.gdi32.CreateCompatibleBitmap.argtypes = (ctypes.c_void_p, ctypes.c_int, ctypes.c_int)
+        self.gdi32.SelectObject.argtypes = (ctypes.c_void_p, ctypes.c_void_p)
+        self.gdi32.BitBlt.argtypes = (ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                      ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                                      wintypes.DWORD)
+        self.gdi32.GetDIBits.argtypes = (ctypes.c_void_p, ctypes.c_void_p, wintypes.UINT, wintypes.UINT,
+                                         ctypes.c_void_p, ctypes.c_void_p, wintypes.UINT)
+        self.gdi32.DeleteObject.argtypes = (ctypes.c_void_p,)
+        self.gdi32.DeleteDC.argtypes = (ctypes.c_void_p,)
+
+        class BITMAPINFOHEADER(ctypes.Structure):
+            _fields_ = [('biSize', wintypes.DWORD), ('biWidth', wintypes.LONG),
+                        ('biHeight', wintypes.LONG), ('biPlanes', wintypes.WORD),
+                        ('biBitCount', wintypes.WORD), ('biCompression', wintypes.DWORD),
+                        ('biSizeImage', wintypes.DWORD), ('biXPelsPerMeter', wintypes.LONG),
+                        ('biYPelsPerMeter', wintypes.LONG), ('biClrUsed', wintypes.DWORD),
+                        ('biClrImportant', wintypes.DWORD)]
+        self.header_type = BITMAPINFOHEADER
+
+    def grab(self, rect):
+        ctypes = self.ctypes
+        width, height = rect.width(), rect.height()
+        screen_dc = self.user32.GetDC(None)
+        memory_dc = self.gdi32.CreateCompatibleDC(screen_dc)
+        bitmap = self.gdi32.CreateCompatibleBitmap(screen_dc, width, height)
+        previous = self.gdi32.SelectObject(memory_dc, bitmap)
+        try:
+            self.gdi32.BitBlt(memory_dc, 0, 0, width, height, screen_dc, rect.x(), rect.y(), self.SRCCOPY)
+            header = self.header_type()
+            header.biSize = ctypes.sizeof(header)
+            header.biWidth = width
+            header.biHeight = -height  # top-down rows
+            header.biPlanes = 1
+            header.biBitCount = 32
+            buffer = ctypes.create_string_buffer(width * height * 4)
+            if not self.gdi32.GetDIBits(memory_dc, bitmap, 0, height, buffer, ctypes.byref(header), 0):
+                return None
+            return QImage(buffer.raw, width, height, width * 4, QImage.Format_RGB32).copy()
+        finally:
+            self.gdi32.SelectObject(memory_dc, previous)
+            self.gdi32.DeleteObject(bitmap)
+            self.gdi32.DeleteDC(memory_dc)
+            self.user32.ReleaseDC(None, screen_dc)
+
+class SyntheticScreenSource(ScreenSource):
+    """Plays a fixed sequence of backgrounds, for trying the mode without a real screen
+
+    Each frame is a QColor (a flat background) or a callable taking
+    (width, height) and returning a QImage; frames change every period
+    seconds.
+    """
+
+    def __init__(self, frames=None, period=1.0, clock=time.monotonic):
+        if frames is None:
+            frames = [QColor(20, 20, 20), QColor(235, 235, 235), self.checkerboard]
+        self.frames = frames
+        self.period = period
+        self.clock = clock
+        self.started = clock()
+        # Generated frames are kept per size, so a grab doesn't pay for drawing them
+        self.images = {}
+
+    @staticmethod
+    def checkerboard(width, height, size=2):
+        """A noisy-looking black and white background"""
+        image = QImage(width, height, QImage.Format_RGB32)
+        for y in range(height):
+            for x in range(width):
+                image.setPixel(x, y, 0xFFFFFFFF if (x // size + y // size) % 2 else 0xFF000000)
+        return image
+
+    def frame_index(self):
+        return int((self.clock() - self.started) / self.period) % len(self.frames)
+
+    def grab(self, rect):
+        frame = self.frames[self.frame_index()]
+        if isinstance(frame, QColor):
+            image = QImage(rect.width(), rect.height(), QImage.Format_RGB32)
+            image.fill(frame)
+            return image
+        key = (id(frame), rect.width(), rect.height())
+        image = self.images.get(key)
+        if image is None:
+            image = self.images[key] = frame(rect.width(), rect.height())
+        return image
+
+def make_screen_source(name):
+    """Return the screen source for a --contrast-source value"""
+    if name == 'synthetic':
+        return SyntheticScreenSource()
+    if sys.platform == 'win32':
+        try:
+            return GdiScreenSource()
+        except Exception as e:
+            print(f"GDI screen capture unavailable, using Qt: {e}")
+    return QtScreenSource()
+
+class BackgroundSampler(QThread):
+    """Measures the background luminance around the crosshair at a fixed rate on its own thread
+
+    Every sample is held to budget_ms of CPU time. A sample that goes over
+    halves the analysis grid, down to MIN_GRID, and after that halves the
+    sampling rate; cheap samples win both back.
+    """
+    sampled = pyqtSignal(float, float)
+
+    def __init__(self, source, rate_hz=10.0, budget_ms=0.5, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.base_interval = 1.0 / rate_hz
+        self.interval = self.base_interval
+        self.budget = budget_ms / 1000.0
+        self.grid = MAX_GRID
+        self.lock = threading.Lock()
+        self.region = None
+        self.inner_fraction = 0.0
+        self.pending = deque(maxlen=1)
+        self.wakeup = threading.Event()
+        self.running = True
+        self.costs = RingBuffer(256)
+        self.samples = 0
+        self.over_budget = 0
+
+    def set_region(self, region, inner_fraction):
+        """Sample region (a QRect in screen pixels), ignoring the centered inner fraction"""
+        with self.lock:
+            self.region = QRect(region)
+            self.inner_fraction = inner_fraction
+
+    def submit(self, image, grab_cost):
+        """Hand over an image grabbed on the GUI thread, with the CPU time the grab took"""
+        self.pending.append((image, grab_cost))
+        self.wakeup.set()
+
+    def run(self):
+        while self.running:
+            start = thread_time()
+            if self.source.thread_safe:
+                with self.lock:
+                    region = self.region
+                image = self.source.grab(region) if region is not None else None
+                self.analyze(image, thread_time() - start)
+                self.wakeup.wait(self.interval)
+            else:
+                self.wakeup.wait(self.interval)
+                while self.pending:
+                    image, grab_cost = self.pending.popleft()
+                    self.analyze(image, grab_cost)
+            self.wakeup.clear()
+
+    def analyze(self, image, grab_cost):
+        if image is None or image.isNull():
+            return
+        start = thread_time()
+        with self.lock:
+            inner_fraction = self.inner_fraction
+        mean, deviation = luminance_stats(image, self.grid, inner_fraction)
+        cost = grab_cost + thread_time() - start
+        self.record(cost)
+        self.sampled.emit(mean, deviation)
+
+    def record(self, cost):
+        self.samples += 1
+        self.costs.append(cost)
+        if cost > self.budget:
+            self.over_budget += 1
+            if self.grid > MIN_GRID:
+                self.grid //= 2
+            else:
+                self.interval = min(self.interval * 2, 1.0)
+        elif cost < self.budget / 4:
+            if self.interval > self.base_interval:
+                self.interval = max(self.interval / 2, self.base_interval)
+            elif self.grid < MAX_GRID:
+                self.grid *= 2
+
+    def stats(self):
+        costs = sorted(self.costs.samples())
+        return {
+            'samples': self.samples,
+            'over budget': self.over_budget,
+            'grid': self.grid,
+            'rate_hz': round(1.0 / self.interval, 2),
+            'p50_ms': round(percentile(costs, 0.5) * 1000, 3),
+            'p99_ms': round(percentile(costs, 0.99) * 1000, 3),
+        }
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        self.wait()
+
+class ContrastController(QObject):
+    """Chooses the colors the crosshair is drawn with from the sampled background
+
+    In 'swap' mode the main and outline colors trade places when the outline
+    color stands out more. In 'contrast' mode the crosshair turns white or
+    black, whichever stands out more. Either way the configured colors are
+    kept while they reach MIN_CONTRAST_RATIO.
+    """
+    changed = pyqtSignal()
+
+    def __init__(self, mode, source, rate_hz=10.0, budget_ms=0.5, parent=None):
+        super().__init__(parent)
+        if mode not in CONTRAST_MODES:
+            raise ValueError(f"unknown contrast mode {mode!r}")
+        self.mode = mode
+        self.source = source
+        self.sampler = BackgroundSampler(source, rate_hz, budget_ms)
+        self.sampler.sampled.connect(self.background_sampled)
+        self.region = None
+        # The crosshair rect and screen the region was last set for; most sprite changes keep them
+        self.region_for = None
+        self.choice = 'main'
+        self.candidate = None
+        self.candidate_count = 0
+        self.config = None
+        self.luminance = None
+        self.grab_timer = None
+        # adapt() runs every frame, so the recolored config is kept until the config or choice changes
+        self.adapted_for = None
+        self.adapted = None
+
+    def start(self):
+        self.sampler.start()
+        if not self.source.thread_safe:
+            # This source has to grab on the GUI thread; the sampler still does the analysis
+            self.grab_timer = QTimer(self)
+            self.grab_timer.timeout.connect(self.grab_on_gui_thread)
+            self.grab_timer.start(int(self.sampler.interval * 1000))
+
+    def stop(self):
+        if self.grab_timer is not None:
+            self.grab_timer.stop()
+        self.sampler.stop()
+
+    def set_region(self, crosshair_rect, screen=None):
+        """Sample around the crosshair's bounding rectangle in screen coordinates
+
+        screen is the QScreen the crosshair is on; sources that grab device
+        pixels need it to map a scaled screen's logical coordinates.
+        """
+        if self.region_for == (crosshair_rect, screen):
+            return
+        self.region_for = (QRect(crosshair_rect), screen)
+        self.region = crosshair_rect.adjusted(-SAMPLE_MARGIN, -SAMPLE_MARGIN, SAMPLE_MARGIN, SAMPLE_MARGIN)
+        region = self.region
+        if self.source.device_pixels and screen is not None:
+            region = device_rect(region, screen)
+        self.sampler.set_region(region, crosshair_rect.width() / self.region.width())
+
+    def grab_on_gui_thread(self):
+        if self.region is None:
+            return
+        start = thread_time()
+        image = self.source.grab(self.region)
+        self.sampler.submit(image, thread_time() - start)
+        # Follow the sampler's budget-driven rate
+        interval = int(self.sampler.interval * 1000)
+        if interval != self.grab_timer.interval():
+            self.grab_timer.setInterval(interval)
+
+    def background_sampled(self, luminance, deviation):
+        self.luminance = luminance
+        if self.config is None:
+            return
+        choice = self.choose(self.config, luminance)
+        if choice == self.choice:
+            self.candidate = None
+            return
+        # Only switch once the new choice holds, so a flickering background doesn't flicker the crosshair
+        if choice != self.candidate:
+            self.candidate = choice
+            self.candidate_count = 0
+        self.candidate_count += 1
+        if self.candidate_count >= SETTLE_SAMPLES:
+            self.choice = choice
+            self.candidate = None
+            self.changed.emit()
+
+    def choose(self, config, background):
+        main = relative_luminance(*config.color[:3])
+        main_ratio = contrast_ratio(main, background)
+        if main_ratio >= MIN_CONTRAST_RATIO:
+            return 'main'
+        if self.mode == 'swap':
+            outline = relative_luminance(*config.outline_color[:3])
+            return 'swap' if contrast_ratio(outline, background) > main_ratio else 'main'
+        return 'white' if contrast_ratio(1.0, background) >= contrast_ratio(0.0, background) else 'black'
+
+    def adapt(self, config):
+        """Return the config to draw for the user's config and the current background"""
+        if config is not self.config and config != self.config:
+            self.config = config
+            if self.luminance is not None:
+                self.choice = self.choose(config, self.luminance)
+        if self.choice == 'main':
+            return config
+        # Tuples compare their items by identity first, so an unchanged config costs no field checks
+        if self.adapted_for != (config, self.choice):
+            self.adapted_for = (config, self.choice)
+            self.adapted = self.recolor(config, self.choice)
+        return self.adapted
+
+    @staticmethod
+    def recolor(config, choice):
+        if choice == 'swap':
+            return config.replace(color=dict(zip('rgba', config.outline_color)),
+                                  outline_color=dict(zip('rgba', config.color)))
+        main, outline = (255, 0) if choice == 'white' else (0, 255)
+        return config.replace(
+            color={'r': main, 'g': main, 'b': main, 'a': config.color[3]},
+            outline_color={'r': outline, 'g': outline, 'b': outline, 'a': config.outline_color[3]})
+
+    def stats(self):
+        stats = self.sampler.stats()
+        stats['mode'] = self.mode
+        stats['choice'] = self.choice
+        if self.luminance is not None:
+            stats['background luminance'] = round(self.luminance, 3)
+        return stats
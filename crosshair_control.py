@@ -0,0 +1,301 @@
+"""Local control channel for a running overlay
+
+The first instance listens on a QLocalServer (a Unix socket in the temp
+directory, or a named pipe on Windows) that only the same user can open.
+A second invocation with --send, or any other program, drives the live
+overlay through it instead of starting a new process.
+
+Protocol, version 1:
+
+- A client writes requests as UTF-8 lines ending in "\\n". A request is
+  one JSON object, a command, or a JSON array of commands, a batch.
+- A command is {"cmd": NAME, ...arguments}. An optional "id" is copied
+  to its result.
+- The server answers every request with one line: a result for a
+  command, or an array of results in the same order for a batch. A
+  result is {"ok": true, "result": VALUE} or {"ok": false, "error": TEXT}.
+- The commands of a batch run in order, in one pass of the overlay's
+  event loop, so the crosshair is painted once after the whole batch. A
+  failed command doesn't stop the ones after it.
+- Requests on one connection are answered in order; a client may write
+  several before reading the replies. A line longer than
+  MAX_REQUEST_BYTES closes the connection.
+
+Commands (see CONTROL_COMMANDS):
+
+    {"cmd": "ping"}                          -> {"version": 1, "pid": 1234}
+    {"cmd": "toggle"}                        -> {"visible": false}
+    {"cmd": "toggle", "visible": true}       -> {"visible": true}
+    {"cmd": "menu"}                          -> {"visible": true}
+    {"cmd": "get"}                           -> {"config": {...}, "preset": "Default Green"}
+    {"cmd": "set", "key": "crosshair_gap", "value": 4}
+    {"cmd": "set", "values": {"crosshair_gap": 4, "dot_size": 8}}
+                                             -> {"changed": true, "preset": null}
+    {"cmd": "preset", "name": "Red Dot"}     -> {"changed": true}
+    {"cmd": "metrics"}                       -> {"report": "...", "extra": {...}}
+    {"cmd": "quit"}                          -> {}
+
+Like the settings menu, set and preset change what is drawn but don't
+save it; the settings file is only written by the menu's Save button.
+"""
+import json
+import os
+import sys
+
+from PyQt5.QtCore import QObject, QCoreApplication, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+PROTOCOL_VERSION = 1
+CONTROL_SERVER_NAME = "CrosshairOverlayControl"
+MAX_REQUEST_BYTES = 1 << 20
+CONNECT_TIMEOUT_MS = 1000
+REPLY_TIMEOUT_MS = 5000
+
+CONTROL_COMMANDS = {
+    'ping': "check the overlay is running; returns the protocol version and process id",
+    'toggle': "hide or show the crosshair on every screen, or set it with \"visible\"",
+    'menu': "hide or show the settings menu, or set it with \"visible\"",
+    'get': "return the current settings and the preset they match",
+    'set': "change settings, given as \"key\" and \"value\" or as a \"values\" object",
+    'preset': "draw the preset called \"name\"",
+    'metrics': "return the paint metrics report (with --instrument) and subsystem counters",
+    'quit': "exit the overlay",
+}
+
+class ControlError(Exception):
+    """A command failed; the message is sent back to the client"""
+
+def result(command, value=None, error=None):
+    reply = {'ok': True, 'result': value} if error is None else {'ok': False, 'error': error}
+    if isinstance(command, dict) and 'id' in command:
+        reply['id'] = command['id']
+    return reply
+
+def parse_value(text):
+    """Read a command line value as JSON, or else as a string"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def parse_command(text):
+    """Turn a --send argument into a command
+
+    Either a JSON object, or a command name followed by its arguments:
+    'toggle', 'menu', 'preset Red Dot', 'set crosshair_gap=4 dot_size=8'.
+    Raises ValueError for anything else.
+    """
+    text = text.strip()
+    if text.startswith('{'):
+        command = json.loads(text)
+        if not isinstance(command, dict) or not isinstance(command.get('cmd'), str):
+            raise ValueError("a command must be a JSON object with a \"cmd\" string")
+        return command
+    name, _, rest = text.partition(' ')
+    rest = rest.strip()
+    if name not in CONTROL_COMMANDS:
+        raise ValueError(f"unknown command '{name}'")
+    if name == 'preset':
+        if not rest:
+            raise ValueError("preset needs a preset name")
+        return {'cmd': name, 'name': rest}
+    if name == 'set':
+        values = {}
+        for item in rest.split():
+            key, sep, value = item.partition('=')
+            if not sep:
+                raise ValueError(f"expected KEY=VALUE, got '{item}'")
+            values[key] = parse_value(value)
+        if not values:
+            raise ValueError("set needs at least one KEY=VALUE")
+        return {'cmd': name, 'values': values}
+    if name in ('toggle', 'menu') and rest:
+        if rest not in ('on', 'off'):
+            raise ValueError(f"{name} takes 'on' or 'off', not '{rest}'")
+        return {'cmd': name, 'visible': rest == 'on'}
+    if rest:
+        raise ValueError(f"{name} takes no arguments")
+    return {'cmd': name}
+
+class ControlServer(QObject):
+    """Runs commands sent by local clients through handlers, a dict of command name -> callable(command)
+
+    A handler returns a JSON-serializable result, or raises ControlError
+    or ValueError to send an error back. ping and quit are built in; quit
+    only emits quit_requested.
+    """
+    quit_requested = pyqtSignal()
+
+    def __init__(self, handlers=None, name=CONTROL_SERVER_NAME, parent=None):
+        super().__init__(parent)
+        self.handlers = {'ping': self.ping, 'quit': self.quit}
+        self.handlers.update(handlers or {})
+        self.name = name
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.accept)
+        self.buffers = {}
+        self.request_count = 0
+        self.command_count = 0
+        self.error_count = 0
+
+    def listen(self):
+        """Start serving; returns False if the name is taken or can't be used"""
+        # Only one overlay runs at a time, so a socket file left here belongs to one that crashed
+        QLocalServer.removeServer(self.name)
+        if not self.server.listen(self.name):
+            print(f"Control server failed to listen on '{self.name}': {self.server.errorString()}")
+            return False
+        return True
+
+    def close(self):
+        self.server.close()
+        for socket in list(self.buffers):
+            socket.abort()
+        self.buffers = {}
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = b''
+            socket.readyRead.connect(lambda socket=socket: self.read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.drop(socket))
+
+    def drop(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
+
+    def read(self, socket):
+        if socket not in self.buffers:
+            return
+        data = self.buffers[socket] + bytes(socket.readAll())
+        lines = data.split(b'\n')
+        self.buffers[socket] = lines.pop()
+        if len(self.buffers[socket]) > MAX_REQUEST_BYTES:
+            print("Control server: request too long, closing the connection")
+            self.buffers.pop(socket, None)
+            socket.abort()
+            return
+        replies = [self.handle_request(line) for line in lines if line.strip()]
+        if replies:
+            socket.write(b''.join(json.dumps(reply, default=str).encode('utf-8') + b'\n'
+                                  for reply in replies))
+            socket.flush()
+
+    def handle_request(self, line):
+        """Return the reply to one request line"""
+        self.request_count += 1
+        try:
+            request = json.loads(line.decode('utf-8'))
+        except ValueError as e:
+            self.error_count += 1
+            return result(None, error=f"invalid JSON: {e}")
+        if isinstance(request, list):
+            return [self.run(command) for command in request]
+        return self.run(request)
+
+    def run(self, command):
+        self.command_count += 1
+        if not isinstance(command, dict):
+            self.error_count += 1
+            return result(None, error="a command must be a JSON object")
+        handler = self.handlers.get(command.get('cmd'))
+        if handler is None:
+            self.error_count += 1
+            return result(command, error=f"unknown command {command.get('cmd')!r}")
+        try:
+            return result(command, handler(command))
+        except (ControlError, ValueError, KeyError, TypeError) as e:
+            self.error_count += 1
+            return result(command, error=str(e))
+        except Exception as e:
+            self.error_count += 1
+            print(f"Control command {command.get('cmd')!r} failed: {e}")
+            return result(command, error=f"{type(e).__name__}: {e}")
+
+    def ping(self, command):
+        return {'version': PROTOCOL_VERSION, 'pid': os.getpid()}
+
+    def quit(self, command):
+        self.quit_requested.emit()
+        return {}
+
+    def stats(self):
+        return {
+            'listening': self.server.isListening(),
+            'clients': len(self.buffers),
+            'requests': self.request_count,
+            'commands': self.command_count,
+            'errors': self.error_count,
+        }
+
+class ControlClient:
+    """A blocking connection to a running overlay's control server"""
+
+    def __init__(self, name=CONTROL_SERVER_NAME, timeout_ms=CONNECT_TIMEOUT_MS):
+        self.socket = QLocalSocket()
+        self.socket.connectToServer(name)
+        if not self.socket.waitForConnected(timeout_ms):
+            raise ConnectionError(f"no overlay is listening on '{name}': {self.socket.errorString()}")
+        self.buffer = b''
+
+    def write(self, request):
+        """Send a command or a list of commands without waiting for the reply"""
+        self.socket.write(json.dumps(request).encode('utf-8') + b'\n')
+
+    def read(self, timeout_ms=REPLY_TIMEOUT_MS):
+        """Wait for the next reply"""
+        while b'\n' not in self.buffer:
+            if not self.socket.waitForReadyRead(timeout_ms):
+                raise ConnectionError(f"no reply from the overlay: {self.socket.errorString()}")
+            self.buffer += bytes(self.socket.readAll())
+        line, _, self.buffer = self.buffer.partition(b'\n')
+        return json.loads(line.decode('utf-8'))
+
+    def send(self, request, timeout_ms=REPLY_TIMEOUT_MS):
+        self.write(request)
+        self.socket.flush()
+        return self.read(timeout_ms)
+
+    def close(self):
+        self.socket.disconnectFromServer()
+
+def show_running_menu(name=CONTROL_SERVER_NAME):
+    """Open the settings menu of the overlay that is already running; returns False if none answers"""
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    try:
+        client = ControlClient(name)
+        reply = client.send({'cmd': 'menu', 'visible': True})
+        client.close()
+    except (ConnectionError, ValueError):
+        return False
+    return bool(reply.get('ok'))
+
+def send_commands(texts, name=CONTROL_SERVER_NAME):
+    """Send --send arguments to the running overlay as one batch and print the results; returns an exit status"""
+    try:
+        commands = [parse_command(text) for text in texts]
+    except ValueError as e:
+        print(f"Invalid command: {e}")
+        return 2
+    # Local sockets need an application object, though not an event loop
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    try:
+        client = ControlClient(name)
+        replies = client.send(commands)
+        client.close()
+    except ConnectionError as e:
+        print(f"Could not reach the overlay: {e}")
+        return 1
+    status = 0
+    for command, reply in zip(commands, replies):
+        if reply.get('ok'):
+            value = reply.get('result')
+            if isinstance(value, dict) and isinstance(value.get('report'), str):
+                print(value['report'])
+            else:
+                print(f"{command['cmd']}: {json.dumps(value)}")
+        else:
+            print(f"{command['cmd']} failed: {reply.get('error')}")
+            status = 1
+    return status
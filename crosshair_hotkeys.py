@@ -0,0 +1,589 @@
+"""Global hotkeys behind one interface, with a backend per platform
+
+A HotkeyBackend claims a set of HotkeyBindings and emits activated with
+the binding's action and the time.perf_counter() time of the key press,
+so the overlay can measure how long a hotkey takes to reach the screen.
+
+- WindowsHotkeyBackend: RegisterHotKey on the listener thread.
+- X11HotkeyBackend: passive key grabs on the root window (python-xlib).
+- EvdevHotkeyBackend: reads keyboards under /dev/input (python-evdev);
+  works under Wayland but needs read access to the devices.
+- FakeHotkeyBackend: in-process, press() stands in for the user.
+
+Mouse button listeners, for the gap bloom, come in the same flavours:
+MouseButtonListener (a low-level hook on Windows), EvdevMouseButtonListener
+(the mice under /dev/input, under X11 or Wayland) and FakeMouseButtonListener.
+make_mouse_listener picks the one for this platform.
+"""
+import ctypes
+import os
+import select
+import sys
+import time
+from collections import namedtuple
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+WM_QUIT = 0x0012
+WM_HOTKEY = 0x0312
+WM_USER = 0x0400
+
+# Modifier names in display order
+MODIFIERS = ('ctrl', 'shift', 'alt', 'win')
+MODIFIER_ALIASES = {'control': 'ctrl', 'super': 'win', 'meta': 'win', 'cmd': 'win'}
+
+# Key name -> (Windows virtual key, X11 keysym name, evdev key name)
+SPECIAL_KEYS = {
+    'SPACE': (0x20, 'space', 'KEY_SPACE'),
+    'TAB': (0x09, 'Tab', 'KEY_TAB'),
+    'ESCAPE': (0x1B, 'Escape', 'KEY_ESC'),
+    'INSERT': (0x2D, 'Insert', 'KEY_INSERT'),
+    'DELETE': (0x2E, 'Delete', 'KEY_DELETE'),
+    'HOME': (0x24, 'Home', 'KEY_HOME'),
+    'END': (0x23, 'End', 'KEY_END'),
+    'PAGEUP': (0x21, 'Prior', 'KEY_PAGEUP'),
+    'PAGEDOWN': (0x22, 'Next', 'KEY_PAGEDOWN'),
+    'PAUSE': (0x13, 'Pause', 'KEY_PAUSE'),
+}
+KEY_ALIASES = {'ESC': 'ESCAPE', 'DEL': 'DELETE', 'INS': 'INSERT', 'PGUP': 'PAGEUP', 'PGDN': 'PAGEDOWN'}
+KEY_DISPLAY_NAMES = {'PAGEUP': 'PageUp', 'PAGEDOWN': 'PageDown'}
+
+def key_codes(key):
+    """Return (Windows virtual key, X11 keysym name, evdev key name) for a normalized key name"""
+    if key in SPECIAL_KEYS:
+        return SPECIAL_KEYS[key]
+    if key[0] == 'F' and key[1:].isdigit():
+        number = int(key[1:])
+        return 0x70 + number - 1, key, f'KEY_{key}'
+    return ord(key), key.lower(), f'KEY_{key}'
+
+def normalize_key(name):
+    key = KEY_ALIASES.get(name.upper(), name.upper())
+    if key in SPECIAL_KEYS:
+        return key
+    if key[:1] == 'F' and key[1:].isdigit() and 1 <= int(key[1:]) <= 24:
+        return key
+    if len(key) == 1 and ('A' <= key <= 'Z' or '0' <= key <= '9'):
+        return key
+    raise ValueError(f"unknown key '{name}'")
+
+class HotkeyBinding(namedtuple('HotkeyBinding', ['modifiers', 'key', 'action'])):
+    """A key, the frozenset of modifiers held with it, and the action it triggers"""
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, spec, action=None):
+        """Parse 'Ctrl+Shift+C=action'; action is the default when spec names none"""
+        keys, _, named_action = spec.partition('=')
+        action = named_action.strip() or action
+        if not action:
+            raise ValueError(f"hotkey '{spec}' has no action")
+        parts = [part.strip() for part in keys.split('+')]
+        if not all(parts):
+            raise ValueError(f"hotkey '{spec}' has an empty key")
+        modifiers = set()
+        for part in parts[:-1]:
+            modifier = MODIFIER_ALIASES.get(part.lower(), part.lower())
+            if modifier not in MODIFIERS:
+                raise ValueError(f"unknown modifier '{part}'")
+            modifiers.add(modifier)
+        return cls(frozenset(modifiers), normalize_key(parts[-1]), action)
+
+    @property
+    def chord(self):
+        """The keys without the action, for matching presses against bindings"""
+        return (self.modifiers, self.key)
+
+    def __str__(self):
+        names = [modifier.capitalize() for modifier in MODIFIERS if modifier in self.modifiers]
+        key = KEY_DISPLAY_NAMES.get(self.key, self.key if self.key not in SPECIAL_KEYS else self.key.capitalize())
+        return '+'.join(names + [key])
+
+DEFAULT_BINDINGS = ('F2=menu',)
+# Keys tried in turn for a default binding another program already holds
+DEFAULT_FALLBACKS = {'F2=menu': ('Ctrl+F2', 'F3', 'Ctrl+Shift+C', 'F11')}
+
+def default_bindings():
+    """Return the default bindings and their fallbacks"""
+    bindings = [HotkeyBinding.parse(spec) for spec in DEFAULT_BINDINGS]
+    fallbacks = {}
+    for spec, binding in zip(DEFAULT_BINDINGS, bindings):
+        fallbacks[binding] = tuple(HotkeyBinding.parse(key, binding.action)
+                                   for key in DEFAULT_FALLBACKS.get(spec, ()))
+    return bindings, fallbacks
+
+class HotkeyBackend(QThread):
+    """Claims global key bindings and reports their presses
+
+    activated carries the binding's action and the time.perf_counter()
+    time of the key press. Subclasses implement grab() for one binding and
+    run() to wait for presses, calling register() first so grabs belong to
+    the listener thread.
+    """
+    activated = pyqtSignal(str, float)
+    name = None
+
+    def __init__(self, bindings, fallbacks=None):
+        super().__init__()
+        self.bindings = list(bindings)
+        # Bindings to try in turn when a binding can't be claimed
+        self.fallbacks = fallbacks or {}
+        self.registered = []
+
+    def register(self):
+        """Claim every binding, or the first of its fallbacks that is free; returns the claimed bindings"""
+        self.registered = []
+        for binding in self.bindings:
+            for candidate in (binding,) + tuple(self.fallbacks.get(binding, ())):
+                try:
+                    grabbed = self.grab(candidate)
+                except Exception as e:
+                    print(f"Error registering {candidate}: {e}")
+                    grabbed = False
+                if grabbed:
+                    self.registered.append(candidate)
+                    print(f"Registered {candidate} for '{candidate.action}' ({self.name} hotkeys)")
+                    break
+            else:
+                print(f"Warning: Could not register {binding} for '{binding.action}'")
+        return self.registered
+
+    def grab(self, binding):
+        """Claim one binding; returns False if it is taken or can't be expressed on this platform"""
+        raise NotImplementedError
+
+    def fire(self, binding, timestamp=None):
+        self.activated.emit(binding.action, timestamp if timestamp is not None else time.perf_counter())
+
+class WindowsHotkeyBackend(HotkeyBackend):
+    """RegisterHotKey on the listener thread, which sleeps in GetMessage between presses"""
+    name = 'windows'
+
+    MODIFIER_FLAGS = {'alt': 0x1, 'ctrl': 0x2, 'shift': 0x4, 'win': 0x8}
+    MOD_NOREPEAT = 0x4000
+
+    def __init__(self, bindings, fallbacks=None):
+        self.user32 = ctypes.windll.user32
+        self.kernel32 = ctypes.windll.kernel32
+        super().__init__(bindings, fallbacks)
+        self.thread_id = None
+        self.stopping = False
+        self.ids = {}
+
+    def grab(self, binding):
+        flags = self.MOD_NOREPEAT
+        for modifier in binding.modifiers:
+            flags |= self.MODIFIER_FLAGS[modifier]
+        hotkey_id = len(self.ids) + 1
+        if not self.user32.RegisterHotKey(None, hotkey_id, flags, key_codes(binding.key)[0]):
+            return False
+        self.ids[hotkey_id] = binding
+        return True
+
+    def run(self):
+        """Register the hotkeys and dispatch WM_HOTKEY until stop() posts WM_QUIT"""
+        try:
+            from ctypes import wintypes
+            msg = wintypes.MSG()
+            # WM_HOTKEY goes to the queue of the thread that registered the hotkey,
+            # so register here, once the queue exists
+            self.thread_id = message_queue_thread_id(self.user32, self.kernel32, msg)
+            if self.stopping:
+                return
+            self.register()
+            while self.user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                if msg.message == WM_HOTKEY:
+                    binding = self.ids.get(msg.wParam)
+                    if binding is not None:
+                        self.fire(binding)
+        except Exception as e:
+            print(f"Error in hotkey listener: {e}")
+        finally:
+            for hotkey_id in self.ids:
+                self.user32.UnregisterHotKey(None, hotkey_id)
+            self.ids = {}
+
+    def stop(self):
+        """Unregister the hotkeys and end the listener thread"""
+        self.stopping = True
+        if self.thread_id is not None:
+            self.user32.PostThreadMessageW(self.thread_id, WM_QUIT, 0, 0)
+        self.wait(1000)
+
+class X11HotkeyBackend(HotkeyBackend):
+    """Passive grabs on the X root window, so presses reach us whichever window has focus"""
+    name = 'x11'
+
+    def __init__(self, bindings, fallbacks=None):
+        from Xlib import X, XK, display, error
+        self.X, self.XK, self.error = X, XK, error
+        super().__init__(bindings, fallbacks)
+        self.display = display.Display()
+        self.root = self.display.screen().root
+        self.modifier_masks = {'shift': X.ShiftMask, 'ctrl': X.ControlMask, 'alt': X.Mod1Mask, 'win': X.Mod4Mask}
+        # Caps Lock and Num Lock must not stop a hotkey from working
+        self.lock_masks = (0, X.LockMask, X.Mod2Mask, X.LockMask | X.Mod2Mask)
+        self.relevant_mask = X.ShiftMask | X.ControlMask | X.Mod1Mask | X.Mod4Mask
+        self.grabs = {}
+        self.wake_read, self.wake_write = os.pipe()
+
+    def grab(self, binding):
+        keycode = self.display.keysym_to_keycode(self.XK.string_to_keysym(key_codes(binding.key)[1]))
+        if not keycode:
+            return False
+        mask = 0
+        for modifier in binding.modifiers:
+            mask |= self.modifier_masks[modifier]
+        catch = self.error.CatchError(self.error.BadAccess)
+        for lock_mask in self.lock_masks:
+            self.root.grab_key(keycode, mask | lock_mask, True, self.X.GrabModeAsync, self.X.GrabModeAsync,
+                               onerror=catch)
+        self.display.sync()
+        if catch.get_error():
+            # Another client holds this key
+            for lock_mask in self.lock_masks:
+                self.root.ungrab_key(keycode, mask | lock_mask)
+            return False
+        self.grabs[(keycode, mask)] = binding
+        return True
+
+    def run(self):
+        try:
+            self.register()
+            self.display.flush()
+            last_release = None
+            while True:
+                readable, _, _ = select.select([self.display.fileno(), self.wake_read], [], [])
+                if self.wake_read in readable:
+                    break
+                while self.display.pending_events():
+                    event = self.display.next_event()
+                    if event.type == self.X.KeyRelease:
+                        last_release = (event.detail, event.time)
+                    elif event.type == self.X.KeyPress:
+                        # Auto-repeat arrives as a release and a press with the same time
+                        if (event.detail, event.time) == last_release:
+                            continue
+                        binding = self.grabs.get((event.detail, event.state & self.relevant_mask))
+                        if binding is not None:
+                            self.fire(binding)
+        except Exception as e:
+            print(f"Error in hotkey listener: {e}")
+        finally:
+            for keycode, mask in self.grabs:
+                for lock_mask in self.lock_masks:
+                    self.root.ungrab_key(keycode, mask | lock_mask)
+            self.grabs = {}
+            self.display.close()
+
+    def stop(self):
+        os.write(self.wake_write, b'\0')
+        self.wait(1000)
+
+class EvdevHotkeyBackend(HotkeyBackend):
+    """Reads key events straight from the keyboards under /dev/input, without grabbing them"""
+    name = 'evdev'
+
+    MODIFIER_KEYS = {
+        'KEY_LEFTCTRL': 'ctrl', 'KEY_RIGHTCTRL': 'ctrl',
+        'KEY_LEFTSHIFT': 'shift', 'KEY_RIGHTSHIFT': 'shift',
+        'KEY_LEFTALT': 'alt', 'KEY_RIGHTALT': 'alt',
+        'KEY_LEFTMETA': 'win', 'KEY_RIGHTMETA': 'win',
+    }
+
+    def __init__(self, bindings, fallbacks=None):
+        import evdev
+        self.ecodes = evdev.ecodes
+        super().__init__(bindings, fallbacks)
+        self.devices = []
+        for path in evdev.list_devices():
+            device = evdev.InputDevice(path)
+            keys = device.capabilities().get(evdev.ecodes.EV_KEY, [])
+            # Keyboards, not mice or power buttons
+            if evdev.ecodes.KEY_A in keys:
+                self.devices.append(device)
+            else:
+                device.close()
+        if not self.devices:
+            raise OSError("no readable keyboard under /dev/input (is this user in the 'input' group?)")
+        self.modifier_codes = {self.ecodes.ecodes[name]: modifier for name, modifier in self.MODIFIER_KEYS.items()}
+        self.chords = {}
+        self.wake_read, self.wake_write = os.pipe()
+
+    def grab(self, binding):
+        code = self.ecodes.ecodes.get(key_codes(binding.key)[2])
+        if code is None:
+            return False
+        self.chords[(binding.modifiers, code)] = binding
+        return True
+
+    def run(self):
+        try:
+            self.register()
+            held = {}
+            devices = {device.fd: device for device in self.devices}
+            while True:
+                readable, _, _ = select.select(list(devices) + [self.wake_read], [], [])
+                if self.wake_read in readable:
+                    break
+                for fd in readable:
+                    for event in devices[fd].read():
+                        if event.type != self.ecodes.EV_KEY:
+                            continue
+                        modifier = self.modifier_codes.get(event.code)
+                        if modifier is not None:
+                            # Count both keys of a modifier so releasing one doesn't drop the other
+                            held[event.code] = event.value != 0
+                            continue
+                        if event.value != 1:
+                            continue
+                        modifiers = frozenset(self.modifier_codes[code] for code, down in held.items() if down)
+                        binding = self.chords.get((modifiers, event.code))
+                        if binding is not None:
+                            # The kernel stamps events with the wall clock
+                            age = max(0.0, time.time() - event.timestamp())
+                            self.fire(binding, time.perf_counter() - age)
+        except Exception as e:
+            print(f"Error in hotkey listener: {e}")
+        finally:
+            for device in self.devices:
+                device.close()
+
+    def stop(self):
+        os.write(self.wake_write, b'\0')
+        self.wait(1000)
+
+class FakeHotkeyBackend(HotkeyBackend):
+    """In-process backend for tests and benchmarks; press() stands in for the user
+
+    Keys listed in taken fail to register, as if another program held them.
+    It has no thread: start() registers and presses are delivered at once.
+    """
+    name = 'fake'
+
+    def __init__(self, bindings, fallbacks=None, taken=()):
+        super().__init__(bindings, fallbacks)
+        self.taken = {HotkeyBinding.parse(key, 'taken').chord for key in taken}
+        self.chords = {}
+
+    def grab(self, binding):
+        if binding.chord in self.taken or binding.chord in self.chords:
+            return False
+        self.chords[binding.chord] = binding
+        return True
+
+    def start(self):
+        self.register()
+
+    def stop(self):
+        self.chords = {}
+
+    def press(self, keys, timestamp=None):
+        """Press a key chord such as 'Ctrl+F2'; returns the action it triggered, or None"""
+        binding = self.chords.get(HotkeyBinding.parse(keys, 'press').chord)
+        if binding is None:
+            return None
+        self.fire(binding, timestamp)
+        return binding.action
+
+HOTKEY_BACKENDS = {
+    'windows': WindowsHotkeyBackend,
+    'x11': X11HotkeyBackend,
+    'evdev': EvdevHotkeyBackend,
+    'fake': FakeHotkeyBackend,
+}
+
+def make_hotkey_backend(name=None, bindings=None):
+    """Return the named backend, or the first one that works on this platform
+
+    bindings is a list of HotkeyBindings; without it the default bindings
+    and their fallbacks are used. Raises RuntimeError if no backend works.
+    """
+    if bindings is None:
+        bindings, fallbacks = default_bindings()
+    else:
+        fallbacks = {}
+    if name is not None:
+        names = [name]
+    elif sys.platform == 'win32':
+        names = ['windows']
+    else:
+        names = ['x11', 'evdev']
+    errors = []
+    for backend_name in names:
+        try:
+            return HOTKEY_BACKENDS[backend_name](bindings, fallbacks)
+        except Exception as e:
+            errors.append(f"{backend_name}: {e}")
+    raise RuntimeError(f"no hotkey backend is available ({'; '.join(errors)})")
+
+def message_queue_thread_id(user32, kernel32, msg):
+    """Make sure the calling thread has a message queue and return its id
+
+    PostThreadMessage fails for a thread that has no queue yet, and a
+    thread only gets one when it first calls a user32 message function.
+    """
+    PM_NOREMOVE = 0x0000
+    user32.PeekMessageW(ctypes.byref(msg), None, WM_USER, WM_USER, PM_NOREMOVE)
+    return kernel32.GetCurrentThreadId()
+
+class MouseButtonListener(QThread):
+    """Reports global mouse button presses through a low-level mouse hook
+
+    The hook thread sleeps in GetMessage between clicks, so it costs
+    nothing while the mouse is idle.
+    """
+    button_pressed = pyqtSignal(str)
+
+    WH_MOUSE_LL = 14
+    BUTTON_MESSAGES = {0x0201: 'left', 0x0204: 'right', 0x0207: 'middle', 0x020B: 'x'}
+
+    def __init__(self, buttons=('left',)):
+        super().__init__()
+        self.buttons = set(buttons)
+        self.user32 = ctypes.windll.user32
+        self.kernel32 = ctypes.windll.kernel32
+        self.thread_id = None
+        self.stopping = False
+        self.hook = None
+
+    def run(self):
+        """Install the hook and pump messages until stop() posts WM_QUIT"""
+        try:
+            from ctypes import wintypes
+            user32 = self.user32
+            hook_proc_type = ctypes.WINFUNCTYPE(wintypes.LPARAM, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
+            user32.SetWindowsHookExW.argtypes = (ctypes.c_int, hook_proc_type, wintypes.HINSTANCE, wintypes.DWORD)
+            user32.SetWindowsHookExW.restype = wintypes.HHOOK
+            user32.CallNextHookEx.argtypes = (wintypes.HHOOK, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
+            user32.CallNextHookEx.restype = wintypes.LPARAM
+
+            def hook_proc(code, wparam, lparam):
+                # Windows drops hooks that are slow to return, so only a queued signal is sent from here
+                if code == 0 and self.BUTTON_MESSAGES.get(wparam) in self.buttons:
+                    self.button_pressed.emit(self.BUTTON_MESSAGES[wparam])
+                return user32.CallNextHookEx(self.hook, code, wparam, lparam)
+
+            # Keep the callback alive as long as the hook is installed
+            self.hook_proc = hook_proc_type(hook_proc)
+            msg = wintypes.MSG()
+            self.thread_id = message_queue_thread_id(user32, self.kernel32, msg)
+            if self.stopping:
+                return
+            self.hook = user32.SetWindowsHookExW(self.WH_MOUSE_LL, self.hook_proc,
+                                                 self.kernel32.GetModuleHandleW(None), 0)
+            if not self.hook:
+                print("Warning: Could not install the mouse hook")
+                return
+            while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        except Exception as e:
+            print(f"Error in mouse listener: {e}")
+        finally:
+            if self.hook:
+                self.user32.UnhookWindowsHookEx(self.hook)
+                self.hook = None
+
+    def stop(self):
+        """Remove the hook and end the listener thread"""
+        self.stopping = True
+        if self.thread_id is not None:
+            self.user32.PostThreadMessageW(self.thread_id, WM_QUIT, 0, 0)
+        self.wait(1000)
+
+class EvdevMouseButtonListener(QThread):
+    """Reports mouse button presses read from the mice under /dev/input, without grabbing them
+
+    A passive X11 button grab would take the clicks away from the window
+    under the pointer, so this also serves X11. Like EvdevHotkeyBackend it
+    needs read access to the devices.
+    """
+    button_pressed = pyqtSignal(str)
+
+    BUTTON_CODES = {'BTN_LEFT': 'left', 'BTN_RIGHT': 'right', 'BTN_MIDDLE': 'middle', 'BTN_SIDE': 'x'}
+
+    def __init__(self, buttons=('left',)):
+        super().__init__()
+        import evdev
+        self.ecodes = evdev.ecodes
+        self.buttons = {evdev.ecodes.ecodes[name]: button for name, button in self.BUTTON_CODES.items()
+                        if button in buttons}
+        self.devices = []
+        for path in evdev.list_devices():
+            device = evdev.InputDevice(path)
+            # Mice and touchpads, not keyboards
+            if evdev.ecodes.BTN_LEFT in device.capabilities().get(evdev.ecodes.EV_KEY, []):
+                self.devices.append(device)
+            else:
+                device.close()
+        if not self.devices:
+            raise OSError("no readable mouse under /dev/input (is this user in the 'input' group?)")
+        self.wake_read, self.wake_write = os.pipe()
+
+    def run(self):
+        try:
+            devices = {device.fd: device for device in self.devices}
+            while True:
+                readable, _, _ = select.select(list(devices) + [self.wake_read], [], [])
+                if self.wake_read in readable:
+                    break
+                for fd in readable:
+                    for event in devices[fd].read():
+                        if event.type == self.ecodes.EV_KEY and event.value == 1 and event.code in self.buttons:
+                            self.button_pressed.emit(self.buttons[event.code])
+        except Exception as e:
+            print(f"Error in mouse listener: {e}")
+        finally:
+            for device in self.devices:
+                device.close()
+
+    def stop(self):
+        os.write(self.wake_write, b'\0')
+        self.wait(1000)
+
+class FakeMouseButtonListener(QObject):
+    """In-process listener for tests and benchmarks; press() stands in for the user"""
+    button_pressed = pyqtSignal(str)
+
+    def __init__(self, buttons=('left',)):
+        super().__init__()
+        self.buttons = set(buttons)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def press(self, button='left'):
+        """Press a mouse button; returns True if the listener reported it"""
+        if button not in self.buttons:
+            return False
+        self.button_pressed.emit(button)
+        return True
+
+MOUSE_LISTENERS = {
+    'windows': MouseButtonListener,
+    'evdev': EvdevMouseButtonListener,
+    'fake': FakeMouseButtonListener,
+}
+
+def make_mouse_listener(name=None, buttons=('left',)):
+    """Return the named mouse button listener, or the one that works on this platform
+
+    Raises RuntimeError if none works.
+    """
+    if name is not None:
+        names = [name]
+    elif sys.platform == 'win32':
+        names = ['windows']
+    else:
+        names = ['evdev']
+    errors = []
+    for listener_name in names:
+        try:
+            return MOUSE_LISTENERS[listener_name](buttons)
+        except Exception as e:
+            errors.append(f"{listener_name}: {e}")
+    raise RuntimeError(f"no mouse listener is available ({'; '.join(errors)})")
@@ -0,0 +1,273 @@
+import time
+from array import array
+
+# Upper bucket edges of the paint duration histogram, in milliseconds
+HISTOGRAM_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.7, 33.3)
+
+class RingBuffer:
+    """Fixed-capacity buffer of floats that overwrites its oldest samples"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.values = array('d', bytes(8 * capacity))
+        self.index = 0
+        self.count = 0
+
+    def append(self, value):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def samples(self):
+        """Return the stored samples, oldest first"""
+        if self.count < self.capacity:
+            return self.values[:self.count].tolist()
+        return (self.values[self.index:] + self.values[:self.index]).tolist()
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class PaintMetrics:
+    """Counts overlay repaints and keeps recent paint timings in ring buffers
+
+    The widgets hold a reference that is None while instrumentation is off,
+    so the disabled cost is one attribute check per hook.
+    """
+
+    def __init__(self, capacity=1024):
+        self.started = time.perf_counter()
+        self.paint_count = 0
+        self.config_update_count = 0
+        self.settings_emit_count = 0
+        self.paint_durations = RingBuffer(capacity)
+        self.settings_to_paint = RingBuffer(capacity)
+        self.pending_settings_time = None
+        self.hotkey_count = 0
+        self.hotkey_to_paint = RingBuffer(capacity)
+        # (window, key press time) of a hotkey whose result has not been painted yet
+        self.pending_hotkey = None
+
+    def settings_emitted(self):
+        self.settings_emit_count += 1
+        # Measure from the oldest change that has not reached the screen yet
+        if self.pending_settings_time is None:
+            self.pending_settings_time = time.perf_counter()
+
+    def config_updated(self, changed=True):
+        self.config_update_count += 1
+        # A change that draws the same crosshair will never be painted
+        if not changed:
+            self.pending_settings_time = None
+
+    def hotkey_pressed(self, timestamp, window):
+        """Record a hotkey pressed at timestamp whose result shows up in window ('overlay' or 'menu')"""
+        self.hotkey_count += 1
+        self.pending_hotkey = (window, timestamp)
+
+    def window_painted(self, window):
+        """Record a finished paint of window, closing out a pending hotkey aimed at it"""
+        if self.pending_hotkey is not None and self.pending_hotkey[0] == window:
+            self.hotkey_to_paint.append(time.perf_counter() - self.pending_hotkey[1])
+            self.pending_hotkey = None
+
+    def paint_finished(self, start):
+        """Record an overlay paint that began at start (a time.perf_counter() value)"""
+        now = time.perf_counter()
+        self.paint_count += 1
+        self.paint_durations.append(now - start)
+        if self.pending_settings_time is not None:
+            self.settings_to_paint.append(now - self.pending_settings_time)
+            self.pending_settings_time = None
+        if self.pending_hotkey is not None:
+            self.window_painted('overlay')
+
+    def histogram(self):
+        """Return (upper edge in ms, count) pairs for the recorded paint durations"""
+        counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        for duration in self.paint_durations.samples():
+            duration_ms = duration * 1000
+            for i, edge in enumerate(HISTOGRAM_BUCKETS_MS):
+                if duration_ms <= edge:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return list(zip(HISTOGRAM_BUCKETS_MS + (float('inf'),), counts))
+
+    @staticmethod
+    def summary_line(label, samples):
+        values = sorted(samples)
+        if not values:
+            return f"{label}: no samples"
+        return (f"{label}: n={len(values)} "
+                f"p50={percentile(values, 0.5) * 1000:.3f}ms "
+                f"p90={percentile(values, 0.9) * 1000:.3f}ms "
+                f"p99={percentile(values, 0.99) * 1000:.3f}ms "
+                f"max={values[-1] * 1000:.3f}ms")
+
+    def report(self, extra=None):
+        """Return a plain text report; extra is an optional dict of further counters"""
+        uptime = time.perf_counter() - self.started
+        lines = [
+            "Crosshair paint metrics",
+            f"uptime: {uptime:.1f}s",
+            f"paints: {self.paint_count} ({self.paint_count / uptime if uptime else 0:.2f}/s)",
+            f"config updates: {self.config_update_count}",
+            f"settings emitted: {self.settings_emit_count}",
+            f"hotkeys pressed: {self.hotkey_count}",
+            self.summary_line("paint duration", self.paint_durations.samples()),
+            self.summary_line("settings to paint", self.settings_to_paint.samples()),
+            self.summary_line("hotkey to paint", self.hotkey_to_paint.samples()),
+            "paint duration histogram:",
+        ]
+        for edge, count in self.histogram():
+            label = f"<= {edge:g}ms" if edge != float('inf') else f"> {HISTOGRAM_BUCKETS_MS[-1]:g}ms"
+            lines.append(f"  {label:>10s} {count}")
+        for key, value in (extra or {}).items():
+            lines.append(f"{key}: {value}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, filename, extra=None):
+        with open(filename, 'w') as f:
+            f.write(self.report(extra))
+
+class StartupTrace:
+    """Timestamps the startup phases up to the first overlay paint"""
+
+    def __init__(self, start):
+        self.start = start
+        self.marks = []
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter()))
+
+    def report(self):
+        lines = ["Startup trace (ms since the crosshair module started loading):"]
+        previous = self.start
+        for label, timestamp in self.marks:
+            lines.append(f"  {(timestamp - self.start) * 1000:8.1f}  (+{(timestamp - previous) * 1000:7.1f})  {label}")
+            previous = timestamp
+        return '\n'.join(lines)
+
+# Modules the overlay only imports once the matching feature is used. Qt,
+# the config, palette and renderer modules and argparse (for the command
+# line) load on every start; crosshair_raster is a standalone library the
+# overlay never imports. bench_imports.py checks that no module listed here
+# is loaded by a plain start.
+DEFERRED_MODULES = ('tempfile', 'ctypes', 'crosshair_metrics', 'crosshair_hotkeys', 'crosshair_thumbnails',
+                    'crosshair_animation', 'crosshair_contrast', 'crosshair_control', 'crosshair_preset_model')
+
+# What every start runs before any feature is used: the import and the command line
+STARTUP_STATEMENTS = ('import crosshair_script', "crosshair_script.parse_args(['crosshair_script.py'])")
+
+def import_subsystem(module):
+    """Name the subsystem a top-level import belongs to"""
+    if module.startswith('crosshair_'):
+        return module
+    if module.split('.')[0] == 'PyQt5':
+        return 'PyQt5'
+    return 'other'
+
+def parse_importtime(output):
+    """Return (level, self us, cumulative us, module) rows from python -X importtime output"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        level = (len(name) - len(name.lstrip())) // 2
+        rows.append((level, int(fields[0]), int(fields[1]), name.strip()))
+    return rows
+
+def time_imports(module='crosshair_script', deferred=DEFERRED_MODULES, startup=STARTUP_STATEMENTS):
+    """Run startup, then import each deferred module, in a fresh interpreter under -X importtime
+
+    Returns (rows from parse_importtime, the deferred modules already loaded
+    by startup, stderr), or None for the rows if module was never imported.
+    """
+    import os
+    import subprocess
+    import sys
+    # Report which deferred modules startup loaded before importing them, since a second import isn't timed
+    loaded = f"print(','.join(name for name in {tuple(deferred)!r} if name in sys.modules))"
+    statements = ['import sys'] + list(startup) + [loaded] + [f'import {name}' for name in deferred]
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', '; '.join(statements)],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    rows = parse_importtime(result.stderr)
+    if not any(name == module for _, _, _, name in rows):
+        return None, [], result.stderr
+    early = [name for name in result.stdout.strip().split(',') if name]
+    return rows, early, result.stderr
+
+def import_time_report(module='crosshair_script', deferred=DEFERRED_MODULES, startup=STARTUP_STATEMENTS):
+    """Time the startup imports of module in a fresh interpreter and summarize the cost per subsystem"""
+    import sys
+    rows, early, stderr = time_imports(module, deferred, startup)
+    if rows is None:
+        return f"Could not time the import of {module} (-X importtime needs Python 3.7+)\n{stderr}"
+
+    # importtime lists children before their parent, so the level 1 rows
+    # seen since the last top-level row are the imports of that row. Top-level
+    # rows after module are the rest of startup, until the deferred imports.
+    interpreter = 0
+    subsystems = {}
+    other = []
+    total = 0
+    pending = []
+    deferred_costs = {}
+    seen_module = False
+
+    def add(subsystem, cost, name):
+        subsystems[subsystem] = subsystems.get(subsystem, 0) + cost
+        if subsystem == 'other':
+            other.append((cost, name))
+
+    for level, self_us, cumulative_us, name in rows:
+        if level == 1:
+            pending.append((cumulative_us, name))
+        elif level == 0:
+            if name in deferred and seen_module:
+                deferred_costs[name] = cumulative_us
+            elif name == module:
+                seen_module = True
+                total += cumulative_us
+                add(module, self_us, module)
+                for cost, child in pending:
+                    add(import_subsystem(child), cost, child)
+            elif seen_module:
+                total += cumulative_us
+                add(import_subsystem(name), cumulative_us, name)
+            else:
+                interpreter += cumulative_us
+            pending = []
+
+    lines = [
+        f"Import time of {module} and its command line (python -X importtime, ms)",
+    ]
+    if sys.dont_write_bytecode:
+        lines.append("  bytecode caching is off, so the times include compiling each module")
+    lines += [
+        f"  {'interpreter startup':24s} {interpreter / 1000:8.1f}",
+        f"  {module:24s} {total / 1000:8.1f}",
+    ]
+    for subsystem, cost in sorted(subsystems.items(), key=lambda item: -item[1]):
+        detail = ''
+        if subsystem == 'other':
+            detail = '  (' + ', '.join(f"{name} {cost / 1000:.1f}" for cost, name in sorted(other, reverse=True)[:5]) + ')'
+        lines.append(f"    {subsystem:22s} {cost / 1000:8.1f}{detail}")
+    lines.append("  deferred until used (cost on top of the above)")
+    for name in deferred:
+        if name in early:
+            lines.append(f"    {name:22s}  loaded at startup, not deferred")
+        else:
+            lines.append(f"    {name:22s} {deferred_costs.get(name, 0) / 1000:8.1f}")
+    return '\n'.join(lines) + '\n'
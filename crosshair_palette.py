@@ -0,0 +1,207 @@
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from operator import itemgetter
+
+from PyQt5.QtCore import QStringListModel
+from PyQt5.QtGui import QColor
+
+# Default color presets
+DEFAULT_COLORS = {
+    'Green': '#00FF00',
+    'Red': '#FF0000',
+    'Blue': '#0000FF',
+    'White': '#FFFFFF',
+    'Yellow': '#FFFF00',
+    'Cyan': '#00FFFF',
+    'Magenta': '#FF00FF',
+    'Orange': '#FFA500',
+    'Pink': '#FF69B4',
+    'Purple': '#800080'
+}
+
+HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+
+def normalize_hex(text):
+    """Return text as an upper case '#RRGGBB' string, or None if it isn't one"""
+    if not isinstance(text, str) or len(text) != 7 or text[0] != '#' or not HEX_DIGITS.issuperset(text[1:]):
+        return None
+    return text.upper()
+
+def rgb_to_hex(r, g, b):
+    return '#%02X%02X%02X' % (r, g, b)
+
+def hex_to_rgb(hex_color):
+    return int(hex_color[1:3], 16), int(hex_color[3:5], 16), int(hex_color[5:7], 16)
+
+@lru_cache(maxsize=1024)
+def qcolor(hex_color):
+    """Return the parsed QColor for a normalized hex string; the result is shared, don't modify it"""
+    return QColor(hex_color)
+
+class RGBTree:
+    """k-d tree over RGB points for nearest color queries
+
+    Nodes are (point, axis, left, right) tuples, where point is an
+    (r, g, b, value) tuple and the tree splits on r, g and b in turn.
+    """
+
+    def __init__(self, points):
+        self.root = self.build(list(points), 0)
+
+    @classmethod
+    def build(cls, points, axis):
+        if not points:
+            return None
+        points.sort(key=itemgetter(axis))
+        middle = len(points) // 2
+        next_axis = (axis + 1) % 3
+        return (points[middle], axis,
+                cls.build(points[:middle], next_axis), cls.build(points[middle + 1:], next_axis))
+
+    def nearest(self, rgb):
+        """Return (value, squared distance) of the point closest to rgb, or (None, None) if empty"""
+        best_value = None
+        best_distance = None
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            point, axis, left, right = node
+            distance = ((point[0] - rgb[0]) ** 2 + (point[1] - rgb[1]) ** 2
+                        + (point[2] - rgb[2]) ** 2)
+            if best_distance is None or distance < best_distance:
+                best_value = point[3]
+                best_distance = distance
+                if distance == 0:
+                    break
+            offset = rgb[axis] - point[axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            # The far side can only help if the splitting plane is closer than the best match
+            if offset * offset < best_distance:
+                stack.append(far)
+            stack.append(near)
+        return best_value, best_distance
+
+class ColorPalette:
+    """Named colors with a hex -> name index and a nearest named color lookup
+
+    Lookups by hex or name are dict hits, and the row of each name is kept
+    so a combo box can be set without searching it. The k-d tree for
+    nearest() is built on first use after the palette changes.
+    """
+
+    def __init__(self, colors=()):
+        self.colors = OrderedDict()
+        self.rows = {}
+        self.hex_index = {}
+        self.tree = None
+        self.model = None
+        self.update(colors.items() if isinstance(colors, dict) else colors)
+
+    def update(self, colors):
+        """Add or replace (name, hex) pairs; invalid hex values are skipped"""
+        for name, hex_color in colors:
+            hex_color = normalize_hex(hex_color)
+            if hex_color is None:
+                continue
+            previous = self.colors.get(name)
+            if name not in self.rows:
+                self.rows[name] = len(self.colors)
+            self.colors[name] = hex_color
+            if previous is not None and self.hex_index.get(previous) == name:
+                del self.hex_index[previous]
+                # Let another name for the old color take over, if there is one
+                for other, other_hex in self.colors.items():
+                    if other_hex == previous:
+                        self.hex_index[previous] = other
+                        break
+            # The first name given to a color is the one it is shown as
+            self.hex_index.setdefault(hex_color, name)
+        self.tree = None
+        if self.model is not None:
+            self.model.setStringList(["Custom"] + list(self.colors))
+
+    def __len__(self):
+        return len(self.colors)
+
+    def names(self):
+        return list(self.colors)
+
+    def hex_for_name(self, name):
+        return self.colors.get(name)
+
+    def name_for_hex(self, hex_color):
+        """Return the name of a normalized hex color, or None if it isn't in the palette"""
+        return self.hex_index.get(hex_color)
+
+    def row(self, name):
+        """Return the position of name in names(), or None"""
+        return self.rows.get(name)
+
+    def combo_model(self):
+        """Return a list model of "Custom" and then every name, shared by all color pickers
+
+        Row 0 is "Custom", so a name's combo row is row(name) + 1.
+        """
+        if self.model is None:
+            self.model = QStringListModel(["Custom"] + list(self.colors))
+        return self.model
+
+    def nearest(self, rgb):
+        """Return (name, hex) of the palette color closest to an (r, g, b) tuple"""
+        if self.tree is None:
+            self.tree = RGBTree(hex_to_rgb(hex_color) + (name,)
+                                for hex_color, name in self.hex_index.items())
+        name, _ = self.tree.nearest(rgb)
+        return (name, self.colors[name]) if name is not None else (None, None)
+
+def parse_gpl_channels(fields):
+    """Return the (r, g, b) of a GIMP palette line's first fields, or None unless each is 0 to 255"""
+    try:
+        rgb = tuple(int(value) for value in fields[:3])
+    except ValueError:
+        return None
+    return rgb if all(0 <= value <= 255 for value in rgb) else None
+
+def read_palette_file(filename):
+    """Return (name, hex) pairs from a JSON object of name -> hex or a GIMP .gpl palette
+
+    Like invalid hex values in a JSON palette, GIMP lines whose channels
+    aren't integers from 0 to 255 are skipped.
+    """
+    with open(filename, 'r') as f:
+        text = f.read()
+    if text.lstrip().startswith('GIMP Palette'):
+        colors = []
+        for line in text.splitlines()[1:]:
+            line = line.strip()
+            if not line or line.startswith('#') or ':' in line.split()[0]:
+                continue
+            fields = line.split(None, 3)
+            rgb = parse_gpl_channels(fields) if len(fields) >= 3 else None
+            if rgb is None:
+                continue
+            hex_color = rgb_to_hex(*rgb)
+            colors.append((fields[3] if len(fields) > 3 else hex_color, hex_color))
+        return colors
+    colors = json.loads(text, object_pairs_hook=OrderedDict)
+    if not isinstance(colors, dict):
+        raise ValueError("palette file must hold an object of name -> hex color")
+    return list(colors.items())
+
+_palette = None
+
+def get_palette():
+    """Return the process-wide palette, starting with the default colors"""
+    global _palette
+    if _palette is None:
+        _palette = ColorPalette(DEFAULT_COLORS)
+    return _palette
+
+def load_user_palette(filename):
+    """Add the colors in a palette file to the process-wide palette"""
+    colors = read_palette_file(filename)
+    get_palette().update(colors)
+    return len(colors)
@@ -0,0 +1,185 @@
+"""Models behind the settings menu's preset selector
+
+PresetListModel holds the preset names in library order and changes one
+row at a time, so a library of thousands of presets is never rebuilt and
+views keep their selection. PresetFilterModel narrows it to the names
+containing a search text.
+"""
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QSortFilterProxyModel, Qt
+
+# The row shown after the presets while the settings match none of them
+CUSTOM_PRESET = "Custom"
+# Removing more rows than this at once resets the model instead
+RESET_THRESHOLD = 64
+
+class PresetListModel(QAbstractListModel):
+    """Preset names, then "Custom" while it is shown
+
+    Row lookups by name are dict hits. Icons come from icon_provider(name)
+    and are only asked for the rows a view draws.
+    """
+
+    def __init__(self, names=(), icon_provider=None, parent=None):
+        super().__init__(parent)
+        self.icon_provider = icon_provider
+        self.custom = False
+        self.set_names(names)
+
+    def set_names(self, names):
+        self.names = list(names)
+        self.rows = {name: row for row, name in enumerate(self.names)}
+        # Lowercased once here rather than on every search
+        self.folded = [name.casefold() for name in self.names]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.names) + self.custom
+
+    def name(self, row):
+        if 0 <= row < len(self.names):
+            return self.names[row]
+        if self.custom and row == len(self.names):
+            return CUSTOM_PRESET
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        name = self.name(index.row())
+        if name is None:
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return name
+        if role == Qt.DecorationRole and self.icon_provider is not None and index.row() < len(self.names):
+            return self.icon_provider(name)
+        return None
+
+    def row(self, name):
+        """Return the row of name, or None"""
+        row = self.rows.get(name)
+        if row is None and name == CUSTOM_PRESET and self.custom:
+            return len(self.names)
+        return row
+
+    def insert(self, names):
+        """Add names that aren't in the list yet after the last preset; returns how many were added"""
+        names = [name for name in dict.fromkeys(names) if name not in self.rows]
+        if names:
+            first = len(self.names)
+            self.beginInsertRows(QModelIndex(), first, first + len(names) - 1)
+            for row, name in enumerate(names, first):
+                self.names.append(name)
+                self.rows[name] = row
+                self.folded.append(name.casefold())
+            self.endInsertRows()
+        return len(names)
+
+    def remove(self, names):
+        """Remove the rows of names; returns how many were removed"""
+        rows = sorted(self.rows[name] for name in set(names) if name in self.rows)
+        if len(rows) > RESET_THRESHOLD:
+            gone = set(names)
+            self.beginResetModel()
+            self.set_names(name for name in self.names if name not in gone)
+            self.endResetModel()
+            return len(rows)
+        # From the bottom up, so the rows still to remove don't move
+        for row in reversed(rows):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.rows[self.names[row]]
+            del self.names[row]
+            del self.folded[row]
+            self.endRemoveRows()
+        if rows:
+            for row in range(rows[0], len(self.names)):
+                self.rows[self.names[row]] = row
+        return len(rows)
+
+    def rename(self, old_name, new_name):
+        """Show new_name in the row of old_name; returns False if there is no such row"""
+        row = self.rows.pop(old_name, None)
+        if row is None:
+            return False
+        self.names[row] = new_name
+        self.rows[new_name] = row
+        self.folded[row] = new_name.casefold()
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+        return True
+
+    def changed(self, names):
+        """Redraw the rows of names, e.g. because their icons changed"""
+        for name in names:
+            row = self.rows.get(name)
+            if row is not None:
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+
+    def sync(self, names):
+        """Make the list hold exactly names; new names are added at the end"""
+        wanted = set(names)
+        self.remove([name for name in self.names if name not in wanted])
+        self.insert(names)
+
+    def set_custom(self, shown):
+        """Show or hide the "Custom" row after the presets"""
+        if shown == self.custom:
+            return
+        row = len(self.names)
+        if shown:
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.custom = True
+            self.endInsertRows()
+        else:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self.custom = False
+            self.endRemoveRows()
+
+class PresetFilterModel(QSortFilterProxyModel):
+    """The presets whose names contain the search text, ignoring case
+
+    The pinned preset, normally the current one, and the "Custom" row are
+    always shown, so searching never changes what a combo box has selected.
+    """
+
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.text = ''
+        self.pinned = None
+        self.setSourceModel(source)
+
+    def set_text(self, text):
+        text = text.strip().casefold()
+        if text != self.text:
+            self.text = text
+            self.invalidateFilter()
+
+    def set_pinned(self, name):
+        if name != self.pinned:
+            self.pinned = name
+            # Without a search every row is shown anyway
+            if self.text:
+                self.invalidateFilter()
+
+    def filterAcceptsRow(self, row, parent):
+        if not self.text:
+            return True
+        source = self.source
+        if row >= len(source.names):
+            return True
+        return self.text in source.folded[row] or source.names[row] == self.pinned
+
+    def first_match(self):
+        """Return the first of this model's rows whose name contains the search text, or -1"""
+        source = self.source
+        for row in range(self.rowCount()):
+            source_row = self.source_row(row)
+            if source_row < len(source.names) and self.text in source.folded[source_row]:
+                return row
+        return -1
+
+    def source_row(self, row):
+        """Return the source row of one of this model's rows"""
+        return self.mapToSource(self.index(row, 0)).row()
+
+    def proxy_row(self, source_row):
+        """Return this model's row for a source row, or -1 if it is filtered out"""
+        return self.mapFromSource(self.source.index(source_row)).row()
@@ -0,0 +1,258 @@
+import math
+from collections import OrderedDict, namedtuple
+
+from PyQt5.QtCore import Qt, QLineF, QPoint, QRect, QSize, QThread, pyqtSignal
+from PyQt5.QtGui import QPainter, QBrush, QColor, QImage, QPen
+
+from crosshair_config import CrosshairConfig
+
+def crosshair_extent(config):
+    """Return the furthest pixel distance from the center a CrosshairConfig can touch"""
+    outline = config.outline_thickness if config.outline_enabled else 0
+    if config.crosshair_style == 'dot':
+        dot_size = config.dot_size
+        reach = dot_size - dot_size // 2 + outline
+    else:
+        width = config.line_thickness + outline * 2
+        reach = max(config.crosshair_length + config.crosshair_gap, (width + 1) // 2)
+    # Leave room for antialiasing bleeding into the neighbouring pixels
+    return reach + 2
+
+# Display list operations, in drawing order and relative to the center pixel
+LinesOp = namedtuple('LinesOp', ['pen', 'lines'])
+EllipseOp = namedtuple('EllipseOp', ['brush', 'rect'])
+
+class DisplayList(namedtuple('DisplayList', ['ops', 'extent'])):
+    """Immutable, precomputed drawing commands for one crosshair config"""
+    __slots__ = ()
+
+    def paint(self, painter, center_x, center_y, pen_scale=1.0):
+        """Replay the commands with the crosshair centered on the given pixel
+
+        The pens are cosmetic, so painter transforms don't widen them;
+        pen_scale widens them for painting onto a scaled image.
+        """
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.HighQualityAntialiasing)
+        painter.translate(center_x, center_y)
+        for op in self.ops:
+            if isinstance(op, LinesOp):
+                pen = op.pen
+                if pen_scale != 1.0:
+                    pen = QPen(pen)
+                    pen.setWidthF(pen.widthF() * pen_scale)
+                painter.setPen(pen)
+                painter.drawLines(op.lines)
+            else:
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(op.brush)
+                painter.drawEllipse(op.rect)
+        painter.restore()
+
+def build_display_list(config):
+    """Turn a CrosshairConfig into the display list both widgets replay"""
+    length = config.crosshair_length
+    gap = config.crosshair_gap
+    outline_enabled = config.outline_enabled
+    outline_thickness = config.outline_thickness
+    dot_size = config.dot_size
+
+    ops = []
+    if config.crosshair_style == 'dot':
+        # Outline first so the main dot is drawn on top of it
+        radius = dot_size // 2
+        if outline_enabled:
+            ops.append(EllipseOp(QBrush(config.outline_qcolor),
+                                 QRect(-radius - outline_thickness, -radius - outline_thickness,
+                                       dot_size + 2*outline_thickness, dot_size + 2*outline_thickness)))
+        ops.append(EllipseOp(QBrush(config.qcolor), QRect(-radius, -radius, dot_size, dot_size)))
+    else:
+        # Lines run through pixel centers so odd widths stay crisp
+        lines = (
+            QLineF(0.5, -length - gap + 0.5, 0.5, -gap + 0.5),
+            QLineF(0.5, gap + 0.5, 0.5, length + gap + 0.5),
+            QLineF(-length - gap + 0.5, 0.5, -gap + 0.5, 0.5),
+            QLineF(gap + 0.5, 0.5, length + gap + 0.5, 0.5),
+        )
+        if outline_enabled:
+            ops.append(LinesOp(config.outline_pen, lines))
+        ops.append(LinesOp(config.line_pen, lines))
+
+    return DisplayList(tuple(ops), crosshair_extent(config))
+
+# A rasterized crosshair, the pixel inside it that lands on the screen center and
+# its size, both in logical pixels; the image holds device_pixel_ratio times as many
+CrosshairSprite = namedtuple('CrosshairSprite', ['image', 'center', 'display_list', 'size'])
+
+class CrosshairRenderCache:
+    """Rasterizes each crosshair config once per device pixel ratio and keeps the most recent sprites
+
+    Sprites are keyed by (config key, device pixel ratio), so overlays on
+    screens with the same scaling share one sprite. Pinned sprites, such as
+    the favourite presets warmed ahead of time, don't count towards
+    max_entries and are never evicted.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.sprites = OrderedDict()
+        self.pinned = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_sprite(self, config, key=None, device_pixel_ratio=1.0):
+        """Return the sprite for a CrosshairConfig, rasterizing it on a cache miss"""
+        if key is None:
+            key = (config.key, device_pixel_ratio)
+        sprite = self.pinned.get(key)
+        if sprite is not None:
+            self.hits += 1
+            return sprite
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+        self.misses += 1
+        sprite = self.rasterize(build_display_list(config), device_pixel_ratio)
+        self.sprites[key] = sprite
+        while len(self.sprites) > self.max_entries:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    def rasterize(self, display_list, device_pixel_ratio=1.0):
+        """Replay a display list into a premultiplied image just large enough to hold it
+
+        The image is device_pixel_ratio times the logical size, so the
+        crosshair keeps its size on a scaled screen and stays sharp.
+        """
+        extent = display_list.extent
+        size = extent * 2 + 1
+        device_size = int(math.ceil(size * device_pixel_ratio))
+        image = QImage(device_size, device_size, QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(device_pixel_ratio)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        display_list.paint(painter, extent, extent, device_pixel_ratio)
+        painter.end()
+        return CrosshairSprite(image, QPoint(extent, extent), display_list, QSize(size, size))
+
+    def pin(self, key, sprite):
+        """Keep sprite until unpinned, taking it out of the LRU entries"""
+        self.sprites.pop(key, None)
+        self.pinned[key] = sprite
+
+    def unpin_except(self, keys):
+        """Return pinned sprites whose keys aren't in keys to the LRU entries"""
+        for key in [key for key in self.pinned if key not in keys]:
+            self.sprites[key] = self.pinned.pop(key)
+        while len(self.sprites) > self.max_entries:
+            self.sprites.popitem(last=False)
+
+    def warm(self, configs, device_pixel_ratios=(1.0,)):
+        """Rasterize configs off the GUI thread and pin their sprites as they arrive
+
+        Sprites already cached are pinned right away. Returns the started
+        SpriteWarmer, or None if there was nothing to rasterize.
+        """
+        jobs = []
+        for config in configs:
+            for device_pixel_ratio in device_pixel_ratios:
+                key = (config.key, device_pixel_ratio)
+                sprite = self.pinned.get(key) or self.sprites.get(key)
+                if sprite is not None:
+                    self.pin(key, sprite)
+                elif all(key != job[0] for job in jobs):
+                    jobs.append((key, config, device_pixel_ratio))
+        if not jobs:
+            return None
+        warmer = SpriteWarmer(self, jobs)
+
+        def warmed(key, sprite):
+            # Sprites of a superseded warmer may still be queued
+            if not warmer.isInterruptionRequested():
+                self.pin(key, sprite)
+
+        warmer.warmed.connect(warmed)
+        warmer.start(QThread.LowPriority)
+        return warmer
+
+    def clear(self):
+        self.sprites.clear()
+        self.pinned.clear()
+
+class SpriteWarmer(QThread):
+    """Rasterizes (key, config, device pixel ratio) jobs on its own thread
+
+    Each image is private to this thread until warmed hands it over, so
+    QPainter can draw it here.
+    """
+    warmed = pyqtSignal(object, object)
+
+    def __init__(self, cache, jobs):
+        super().__init__()
+        self.cache = cache
+        self.jobs = jobs
+        self.done = 0
+
+    def run(self):
+        for key, config, device_pixel_ratio in self.jobs:
+            if self.isInterruptionRequested():
+                return
+            self.warmed.emit(key, self.cache.rasterize(build_display_list(config), device_pixel_ratio))
+            self.done += 1
+
+# Shared by every renderer so identical configs rasterize once
+render_cache = CrosshairRenderCache()
+
+class CrosshairRenderer:
+    """Draws one crosshair config, rebuilding its display list only when the config changes"""
+
+    def __init__(self, config, cache=None, device_pixel_ratio=1.0):
+        self.cache = cache if cache is not None else render_cache
+        self.config = None
+        self.device_pixel_ratio = device_pixel_ratio
+        self.key = None
+        self.sprite = None
+        self.set_config(config)
+
+    def set_config(self, config):
+        """Switch to config (a CrosshairConfig or its JSON shape); returns True if the drawing changed"""
+        self.config = config = CrosshairConfig.coerce(config)
+        return self.update_sprite()
+
+    def set_device_pixel_ratio(self, device_pixel_ratio):
+        """Draw for a screen with a different scale factor; returns True if the sprite changed"""
+        self.device_pixel_ratio = device_pixel_ratio
+        return self.update_sprite()
+
+    def update_sprite(self):
+        key = (self.config.key, self.device_pixel_ratio)
+        if key == self.key:
+            return False
+        self.key = key
+        self.sprite = self.cache.get_sprite(self.config, key, self.device_pixel_ratio)
+        return True
+
+    @property
+    def display_list(self):
+        return self.sprite.display_list
+
+    def bounding_rect(self, center_x, center_y):
+        """Return the rectangle the crosshair covers when centered on the given pixel"""
+        return QRect(QPoint(center_x, center_y) - self.sprite.center, self.sprite.size)
+
+    def paint(self, painter, center_x, center_y):
+        """Blit the cached sprite with the crosshair centered on the given pixel"""
+        painter.drawImage(QPoint(center_x, center_y) - self.sprite.center, self.sprite.image)
+
+    def render_image(self, width, height, background=None):
+        """Replay the display list into a new image, for exporting outside a widget"""
+        image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        image.fill(background if background is not None else QColor(Qt.transparent))
+        painter = QPainter(image)
+        self.display_list.paint(painter, width // 2, height // 2)
+        painter.end()
+        return image
@@ -1,144 +1,249 @@
+import time
+# Taken before the Qt imports so --startup-trace includes their cost
+STARTUP_TIME = time.perf_counter()
+
 import sys
-import ctypes
-import json
 import os
+from collections import deque
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
                            QLabel, QSlider, QPushButton, QCheckBox,
                            QGroupBox, QSpinBox, QLineEdit, QComboBox, QSystemTrayIcon, QMenu,
                            QInputDialog, QMessageBox)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QThread, QSharedMemory
-from PyQt5.QtCore import QLineF
-from PyQt5.QtGui import QPainter, QPen, QColor, QFont, QIcon
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QObject, QSharedMemory, QSize
+from PyQt5.QtGui import QPainter, QPen, QColor, QCursor, QFont, QIcon, QPixmap
 
-# Global hotkey support
-import threading
-import time
+from crosshair_config import (DEFAULT_CONFIG, DEFAULT_PRESETS, PRESETS_FILENAME, SETTINGS_FILENAME,
+                              ConfigService, CrosshairConfig, config_hash, get_config_service,
+                              decode_share_code, encode_share_code, preset_pack_records, read_preset_pack)
+from crosshair_palette import (get_palette, hex_to_rgb, load_user_palette, normalize_hex, qcolor,
+                               rgb_to_hex)
+from crosshair_renderer import CrosshairRenderer, render_cache
+from crosshair_storage import atomic_write_json_lines, get_persistence_worker, shutdown_persistence_worker
 
-# Default configuration
-DEFAULT_CONFIG = {
-    'color': {'r': 0, 'g': 255, 'b': 0, 'a': 255},  # Green
-    'outline_color': {'r': 0, 'g': 0, 'b': 0, 'a': 255},  # Black
-    'line_thickness': 2,
-    'crosshair_length': 8,
-    'crosshair_gap': 2,
-    'outline_enabled': True,
-    'outline_thickness': 1,
-    'crosshair_style': 'cross',  # 'cross' or 'dot'
-    'dot_size': 6
-}
+METRICS_FILENAME = 'crosshair_metrics.txt'
 
-# Default crosshair presets
-DEFAULT_PRESETS = {
-    'Default Green': {
-        'color': {'r': 0, 'g': 255, 'b': 0, 'a': 255},
-        'outline_color': {'r': 0, 'g': 0, 'b': 0, 'a': 255},
-        'line_thickness': 2,
-        'crosshair_length': 8,
-        'crosshair_gap': 2,
-        'outline_enabled': True,
-        'outline_thickness': 1,
-        'crosshair_style': 'cross',
-        'dot_size': 6
-    },
-    'Red Dot': {
-        'color': {'r': 255, 'g': 0, 'b': 0, 'a': 255},
-        'outline_color': {'r': 0, 'g': 0, 'b': 0, 'a': 255},
-        'line_thickness': 2,
-        'crosshair_length': 0,
-        'crosshair_gap': 0,
-        'outline_enabled': True,
-        'outline_thickness': 1,
-        'crosshair_style': 'dot',
-        'dot_size': 8
-    },
-    'Blue Cross': {
-        'color': {'r': 0, 'g': 0, 'b': 255, 'a': 255},
-        'outline_color': {'r': 255, 'g': 255, 'b': 255, 'a': 255},
-        'line_thickness': 3,
-        'crosshair_length': 12,
-        'crosshair_gap': 4,
-        'outline_enabled': True,
-        'outline_thickness': 2,
-        'crosshair_style': 'cross',
-        'dot_size': 6
-    },
-    'White Minimal': {
-        'color': {'r': 255, 'g': 255, 'b': 255, 'a': 255},
-        'outline_color': {'r': 0, 'g': 0, 'b': 0, 'a': 255},
-        'line_thickness': 1,
-        'crosshair_length': 6,
-        'crosshair_gap': 1,
-        'outline_enabled': False,
-        'outline_thickness': 1,
-        'crosshair_style': 'cross',
-        'dot_size': 6
-    }
+# What a global hotkey can do, for --hotkey KEYS=ACTION
+HOTKEY_ACTIONS = {
+    'menu': "show or hide the settings menu",
+    'crosshair': "show or hide the crosshair",
+    'next_preset': "switch to the next favourite preset",
+    'previous_preset': "switch to the previous favourite preset",
+    'preset_N': "switch to favourite preset N, counting from 1",
 }
 
-# Default color presets
-DEFAULT_COLORS = {
-    'Green': '#00FF00',
-    'Red': '#FF0000',
-    'Blue': '#0000FF',
-    'White': '#FFFFFF',
-    'Yellow': '#FFFF00',
-    'Cyan': '#00FFFF',
-    'Magenta': '#FF00FF',
-    'Orange': '#FFA500',
-    'Pink': '#FF69B4',
-    'Purple': '#800080'
-}
+def preset_slot(action):
+    """Return N for a 'preset_N' hotkey action, or None"""
+    number = action[len('preset_'):] if action.startswith('preset_') else ''
+    return int(number) if number.isdigit() and int(number) > 0 else None
+
+def hotkey_action_known(action):
+    return (action in HOTKEY_ACTIONS and action != 'preset_N') or preset_slot(action) is not None
+
+# Favourites when none are named: the first presets in the preset file
+DEFAULT_FAVORITES_LIMIT = 32
+# New presets journaled per write when importing a preset pack
+IMPORT_BATCH_SIZE = 500
+# Invalid preset pack records reported one by one before only being counted
+IMPORT_ERRORS_SHOWN = 10
 
 class CrosshairPresetManager:
     """Manages saving, loading, and managing multiple crosshair presets"""
     
-    def __init__(self, filename='crosshair_presets.json'):
-        self.filename = filename
+    def __init__(self, filename=PRESETS_FILENAME, worker=None, service=None):
+        if service is None:
+            service = ConfigService(presets_filename=filename, worker=worker)
+        self.service = service
+        self.filename = service.presets_filename
+        self.store = service.preset_store
         self.presets = self.load_presets()
+        self.rebuild_index()
+        service.presets_changed.connect(self.presets_reloaded)
+    
+    def rebuild_index(self):
+        """Rebuild the config hash -> preset names index from scratch"""
+        self.hash_index = {}
+        for name, config in self.presets.items():
+            self.hash_index.setdefault(config_hash(config), []).append(name)
+    
+    def _index_add(self, name, config, key=None):
+        self.hash_index.setdefault(key or config_hash(config), []).append(name)
+    
+    def _index_remove(self, name, config):
+        key = config_hash(config)
+        names = self.hash_index.get(key)
+        if names and name in names:
+            names.remove(name)
+            if not names:
+                del self.hash_index[key]
     
     def load_presets(self):
-        """Load presets from file, creating default presets if file doesn't exist"""
+        """Load presets from the config service, creating the file if it doesn't exist"""
         try:
-            if os.path.exists(self.filename):
-                with open(self.filename, 'r') as f:
-                    loaded_presets = json.load(f)
-                    # Merge with default presets to ensure all defaults are available
-                    merged_presets = DEFAULT_PRESETS.copy()
-                    merged_presets.update(loaded_presets)
-                    return merged_presets
-            else:
+            exists = self.store.exists()
+            presets = self.service.presets()
+            if not exists:
                 # Create file with default presets
-                self.save_presets(DEFAULT_PRESETS)
-                return DEFAULT_PRESETS.copy()
+                self.store.write_snapshot(presets)
+            elif self.store.needs_compaction():
+                self.store.write_snapshot(presets)
+            return presets
         except Exception as e:
             print(f"Error loading presets: {e}")
             return DEFAULT_PRESETS.copy()
     
+    def presets_reloaded(self, names, previous):
+        """Update the index for presets the config service re-read from disk"""
+        for name in names:
+            if name in previous:
+                self._index_remove(name, previous[name])
+            if name in self.presets:
+                self._index_add(name, self.presets[name])
+    
     def save_presets(self, presets=None):
-        """Save presets to file"""
+        """Rewrite the whole preset file, folding in any journaled edits"""
         if presets is None:
             presets = self.presets
         try:
-            with open(self.filename, 'w') as f:
-                json.dump(presets, f, indent=2)
-            self.presets = presets
+            self.store.write_snapshot(presets)
+            if presets is not self.presets:
+                # Replace the content in place, the config service shares this dict
+                self.presets.clear()
+                self.presets.update(presets)
+                self.rebuild_index()
+            return True
+        except Exception as e:
+            print(f"Error saving presets: {e}")
+            return False
+    
+    def journal(self, method, *args):
+        """Record a single-preset edit, compacting the journal when it gets long"""
+        try:
+            method(*args)
+            if self.store.needs_compaction():
+                self.store.write_snapshot(self.presets)
             return True
         except Exception as e:
             print(f"Error saving presets: {e}")
             return False
     
+    def export_presets(self, filename):
+        """Export every preset to filename in the crosshair_presets.json format"""
+        try:
+            self.store.export_json(filename, self.presets)
+            return True
+        except Exception as e:
+            print(f"Error exporting presets: {e}")
+            return False
+    
+    def import_presets(self, filename):
+        """Add or replace presets from a crosshair_presets.json formatted file"""
+        try:
+            imported = self.store.import_json(filename)
+        except Exception as e:
+            print(f"Error importing presets: {e}")
+            return False
+        for name, config in imported.items():
+            try:
+                config = CrosshairConfig.from_dict(config).to_dict()
+            except ValueError as e:
+                print(f"Skipping invalid preset '{name}': {e}")
+                continue
+            if name in self.presets:
+                self._index_remove(name, self.presets[name])
+            self.presets[name] = config
+            self._index_add(name, config)
+        return self.save_presets()
+    
+    def export_preset_pack(self, filename, names=None, codes=False):
+        """Write presets to filename as a JSON Lines preset pack, with share codes instead of
+        configs if codes is set; returns the number written, or None on failure"""
+        presets = self.presets if names is None else {name: self.presets[name] for name in names
+                                                      if name in self.presets}
+        try:
+            # Minus the header line
+            return atomic_write_json_lines(filename, preset_pack_records(presets, codes)) - 1
+        except Exception as e:
+            print(f"Error exporting presets: {e}")
+            return None
+    
+    def import_preset_pack(self, filename, batch_size=IMPORT_BATCH_SIZE):
+        """Add or replace presets from a JSON Lines preset pack, reading it one record at a time
+
+        Records that don't validate are skipped, and so are configs already
+        stored under any name. New presets are journaled batch_size at a
+        time. Returns a dict of counts, or None if the import failed part
+        way; the presets read before the failure are kept.
+        """
+        counts = {'read': 0, 'added': 0, 'replaced': 0, 'duplicates': 0, 'invalid': 0, 'batches': 0}
+        batch = []
+        error = None
+        try:
+            for line_number, name, config, error in read_preset_pack(filename):
+                counts['read'] += 1
+                if error is not None:
+                    counts['invalid'] += 1
+                    if counts['invalid'] <= IMPORT_ERRORS_SHOWN:
+                        print(f"Skipping line {line_number}{f' ({name})' if name else ''}: {error}")
+                    continue
+                key = config.key
+                if key in self.hash_index:
+                    counts['duplicates'] += 1
+                    continue
+                config = config.to_dict()
+                if name in self.presets:
+                    counts['replaced'] += 1
+                    self._index_remove(name, self.presets[name])
+                else:
+                    counts['added'] += 1
+                self.presets[name] = config
+                self._index_add(name, config, key)
+                batch.append((name, config))
+                if len(batch) >= batch_size:
+                    self.commit_batch(batch, counts)
+                    batch = []
+        except Exception as e:
+            error = e
+        try:
+            # Whatever was taken into memory is written, even when the import stopped part way
+            self.commit_batch(batch, counts)
+            if self.store.needs_compaction():
+                self.store.write_snapshot(self.presets)
+        except Exception as e:
+            error = error or e
+        if error is not None:
+            print(f"Error importing presets: {error}")
+            return None
+        return counts
+    
+    def commit_batch(self, batch, counts):
+        if batch:
+            # Compacting is left to the end of the import, rather than rewriting the snapshot per batch
+            self.store.put_many(batch)
+            counts['batches'] += 1
+    
     def get_preset_names(self):
         """Get list of preset names"""
         return list(self.presets.keys())
     
     def get_preset(self, name):
-        """Get a specific preset by name"""
-        return self.presets.get(name, DEFAULT_CONFIG.copy())
+        """Get a copy of a specific preset by name, sharing nothing with the stored one"""
+        return CrosshairConfig.from_dict(self.presets.get(name, DEFAULT_CONFIG)).to_dict()
+    
+    def has_preset(self, name):
+        return name in self.presets
+    
+    def find_preset(self, config):
+        """Return the name of the first preset identical to config, or None"""
+        names = self.hash_index.get(config_hash(config))
+        return names[0] if names else None
     
     def save_current_as_preset(self, name, config):
         """Save current configuration as a new preset"""
-        self.presets[name] = config.copy()
-        return self.save_presets()
+        if name in self.presets:
+            self._index_remove(name, self.presets[name])
+        self.presets[name] = CrosshairConfig.coerce(config).to_dict()
+        self._index_add(name, self.presets[name])
+        return self.journal(self.store.put, name, self.presets[name])
     
     def delete_preset(self, name):
         """Delete a preset (but not default ones)"""
@@ -146,8 +251,8 @@ class CrosshairPresetManager:
             print(f"Cannot delete default preset: {name}")
             return False
         if name in self.presets:
-            del self.presets[name]
-            return self.save_presets()
+            self._index_remove(name, self.presets.pop(name))
+            return self.journal(self.store.delete, name)
         return False
     
     def rename_preset(self, old_name, new_name):
@@ -156,167 +261,132 @@ class CrosshairPresetManager:
             print(f"Cannot rename default preset: {old_name}")
             return False
         if old_name in self.presets and new_name not in self.presets:
-            self.presets[new_name] = self.presets.pop(old_name)
-            return self.save_presets()
+            config = self.presets.pop(old_name)
+            self._index_remove(old_name, config)
+            self.presets[new_name] = config
+            self._index_add(new_name, config)
+            return self.journal(self.store.rename, old_name, new_name)
         return False
 
-class ImprovedHotKeyListener(QThread):
-    """Improved hotkey listener with better error handling"""
-    hotkey_pressed = pyqtSignal(str)
+class PresetCycler:
+    """Switches between favourite presets without going through the settings menu
+
+    Each favourite is converted to a CrosshairConfig once, until its preset
+    changes, and its sprites are rasterized in the background and pinned in
+    the render cache, so a switch is a config swap, a cache hit and one blit.
+    """
     
-    def __init__(self):
-        super().__init__()
-        self.running = True
-        self.registered_hotkeys = []
-        self.setup_hotkeys()
+    def __init__(self, preset_manager, favorites=None, cache=None):
+        self.preset_manager = preset_manager
+        # Preset names to cycle through, or None for the first presets in the file
+        self.favorite_names = favorites
+        self.cache = cache if cache is not None else render_cache
+        # name -> (the preset dict it was made from, CrosshairConfig)
+        self.configs = {}
+        self.warmer = None
+        self.switch_count = 0
+        self.switch_misses = 0
+        self.switch_times = deque(maxlen=256)
     
-    def setup_hotkeys(self):
-        """Setup Windows global hotkeys with multiple fallbacks"""
-        try:
-            self.user32 = ctypes.windll.user32
-            self.kernel32 = ctypes.windll.kernel32
-            
-            # Virtual key codes
-            hotkey_combinations = [
-                (1, 0, 0x71),  # F2
-                (2, 2, 0x71),  # Ctrl+F2  
-                (3, 0, 0x72),  # F3
-                (4, 6, ord('C')),  # Ctrl+Shift+C
-                (5, 0, 0x7A),  # F11
-            ]
-            
-            for hotkey_id, modifier, vk_code in hotkey_combinations:
-                try:
-                    if self.user32.RegisterHotKeyW(None, hotkey_id, modifier, vk_code):
-                        self.registered_hotkeys.append(hotkey_id)
-                        mod_text = {0: "", 2: "Ctrl+", 6: "Ctrl+Shift+"}
-                        key_text = {0x71: "F2", 0x72: "F3", ord('C'): "C", 0x7A: "F11"}
-                        print(f"Registered {mod_text.get(modifier, '')}{key_text.get(vk_code, 'Key')} as toggle hotkey")
-                        break
-                except:
-                    continue
-            
-            if not self.registered_hotkeys:
-                print("Warning: Could not register any global hotkeys")
-                
-        except Exception as e:
-            print(f"Error setting up hotkeys: {e}")
+    def favorites(self):
+        presets = self.preset_manager.presets
+        if self.favorite_names is None:
+            return list(presets)[:DEFAULT_FAVORITES_LIMIT]
+        return [name for name in self.favorite_names if name in presets]
     
-    def run(self):
-        """Listen for hotkey messages"""
-        try:
-            msg = ctypes.wintypes.MSG()
-            
-            while self.running:
-                result = self.user32.GetMessageW(ctypes.byref(msg), None, 0, 0)
-                
-                if result == 0 or result == -1:
-                    break
-                    
-                if msg.message == 0x0312:  # WM_HOTKEY
-                    self.hotkey_pressed.emit("toggle")
-                
-                self.user32.TranslateMessage(ctypes.byref(msg))
-                self.user32.DispatchMessageW(ctypes.byref(msg))
-                    
-        except Exception as e:
-            print(f"Error in hotkey listener: {e}")
+    def config(self, name):
+        """Return a preset as a CrosshairConfig, converting it again only when the preset was replaced"""
+        source = self.preset_manager.presets.get(name)
+        if source is None:
+            return None
+        entry = self.configs.get(name)
+        if entry is None or entry[0] is not source:
+            entry = self.configs[name] = (source, CrosshairConfig.from_dict(source))
+        return entry[1]
+    
+    def step(self, current, offset):
+        """Return the favourite offset places from current, wrapping around"""
+        names = self.favorites()
+        if not names:
+            return None
+        if current in names:
+            return names[(names.index(current) + offset) % len(names)]
+        return names[0] if offset > 0 else names[-1]
+    
+    def slot(self, number):
+        names = self.favorites()
+        return names[number - 1] if 0 < number <= len(names) else None
+    
+    def warm(self, device_pixel_ratios):
+        """Rasterize every favourite in the background and keep the sprites, unpinning former favourites"""
+        self.stop()
+        configs = [self.config(name) for name in self.favorites()]
+        self.cache.unpin_except({(config.key, ratio) for config in configs for ratio in device_pixel_ratios})
+        self.warmer = self.cache.warm(configs, device_pixel_ratios)
     
     def stop(self):
-        """Stop the hotkey listener and cleanup"""
-        self.running = False
-        try:
-            for hotkey_id in self.registered_hotkeys:
-                self.user32.UnregisterHotKey(None, hotkey_id)
-        except:
-            pass
-        # Post quit message to break out of GetMessage loop
-        try:
-            thread_id = self.kernel32.GetCurrentThreadId()
-            self.user32.PostThreadMessageW(thread_id, 0x0012, 0, 0)  # WM_QUIT
-        except:
-            pass
-        self.quit()
+        if self.warmer is not None:
+            self.warmer.requestInterruption()
+            self.warmer.wait()
+            self.warmer = None
+    
+    def switched(self, start, missed):
+        """Record a switch that began at start (a time.perf_counter() value)"""
+        self.switch_count += 1
+        self.switch_misses += missed
+        self.switch_times.append(time.perf_counter() - start)
+    
+    def stats(self):
+        times = sorted(self.switch_times)
+        stats = {
+            'favorites': len(self.favorites()),
+            'pinned sprites': len(self.cache.pinned),
+            'switches': self.switch_count,
+            'switches that rasterized': self.switch_misses,
+        }
+        if times:
+            stats['switch p50 ms'] = round(times[len(times) // 2] * 1000, 3)
+            stats['switch max ms'] = round(times[-1] * 1000, 3)
+        return stats
+
+# Built once instead of on every preview paint
+PREVIEW_BACKGROUND = QColor(43, 43, 43)
+PREVIEW_LABEL_PEN = QPen(QColor(200, 200, 200), 1)
 
 class CrosshairPreview(QWidget):
     def __init__(self):
         super().__init__()
-        self.config = DEFAULT_CONFIG.copy()
+        self.renderer = CrosshairRenderer(DEFAULT_CONFIG)
+        self.config = self.renderer.config
         
     def update_config(self, config):
-        self.config = config
-        self.update()
+        changed = self.renderer.set_config(config)
+        self.config = self.renderer.config
+        if changed:
+            self.update()
     
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setRenderHint(QPainter.HighQualityAntialiasing)
         painter.setRenderHint(QPainter.TextAntialiasing)
         
         # Fill background
-        painter.fillRect(self.rect(), QColor(43, 43, 43))
-        
-        w = self.width()
-        h = self.height()
-        center_x = w // 2
-        center_y = h // 2
-        
-        # Get current settings
-        main_color = QColor(self.config['color']['r'], self.config['color']['g'], 
-                           self.config['color']['b'], self.config['color']['a'])
-        outline_color = QColor(self.config['outline_color']['r'], self.config['outline_color']['g'], 
-                              self.config['outline_color']['b'], self.config['outline_color']['a'])
-        
-        thickness = self.config['line_thickness']
-        length = self.config['crosshair_length']
-        gap = self.config['crosshair_gap']
-        outline_enabled = self.config['outline_enabled']
-        outline_thickness = self.config['outline_thickness']
-        crosshair_style = self.config.get('crosshair_style', 'cross')
-        dot_size = self.config.get('dot_size', 6)
+        painter.fillRect(self.rect(), PREVIEW_BACKGROUND)
         
-        if crosshair_style == 'dot':
-            # Draw outline first if enabled
-            if outline_enabled:
-                painter.setPen(Qt.NoPen)
-                painter.setBrush(outline_color)
-                painter.drawEllipse(center_x - dot_size//2 - outline_thickness, center_y - dot_size//2 - outline_thickness, dot_size + 2*outline_thickness, dot_size + 2*outline_thickness)
-            # Draw main dot
-            painter.setPen(Qt.NoPen)
-            painter.setBrush(main_color)
-            painter.drawEllipse(center_x - dot_size//2, center_y - dot_size//2, dot_size, dot_size)
-        else:
-            # Draw outline first if enabled
-            if outline_enabled:
-                outline_pen = QPen(outline_color, thickness + outline_thickness * 2)
-                outline_pen.setCosmetic(True)
-                outline_pen.setCapStyle(Qt.FlatCap)
-                outline_pen.setJoinStyle(Qt.RoundJoin)
-                painter.setPen(outline_pen)
-                painter.drawLine(QLineF(center_x + 0.5, center_y - length - gap + 0.5, center_x + 0.5, center_y - gap + 0.5))
-                painter.drawLine(QLineF(center_x + 0.5, center_y + gap + 0.5, center_x + 0.5, center_y + length + gap + 0.5))
-                painter.drawLine(QLineF(center_x - length - gap + 0.5, center_y + 0.5, center_x - gap + 0.5, center_y + 0.5))
-                painter.drawLine(QLineF(center_x + gap + 0.5, center_y + 0.5, center_x + length + gap + 0.5, center_y + 0.5))
-            # Draw main crosshair
-            main_pen = QPen(main_color, thickness)
-            main_pen.setCosmetic(True)
-            main_pen.setCapStyle(Qt.FlatCap)
-            main_pen.setJoinStyle(Qt.RoundJoin)
-            painter.setPen(main_pen)
-            painter.drawLine(QLineF(center_x + 0.5, center_y - length - gap + 0.5, center_x + 0.5, center_y - gap + 0.5))
-            painter.drawLine(QLineF(center_x + 0.5, center_y + gap + 0.5, center_x + 0.5, center_y + length + gap + 0.5))
-            painter.drawLine(QLineF(center_x - length - gap + 0.5, center_y + 0.5, center_x - gap + 0.5, center_y + 0.5))
-            painter.drawLine(QLineF(center_x + gap + 0.5, center_y + 0.5, center_x + length + gap + 0.5, center_y + 0.5))
+        self.renderer.set_device_pixel_ratio(self.devicePixelRatioF())
+        self.renderer.paint(painter, self.width() // 2, self.height() // 2)
         # Add preview label
-        painter.setPen(QPen(QColor(200, 200, 200), 1))
+        painter.setPen(PREVIEW_LABEL_PEN)
         painter.drawText(10, 20, "Live Preview")
         painter.end()
 
 class HexColorWidget(QWidget):
     color_changed = pyqtSignal(dict)
     
-    def __init__(self, initial_color, label_text):
+    def __init__(self, initial_color, label_text, color_palette=None):
         super().__init__()
+        # Named color_palette because QWidget already has a palette() method
+        self.color_palette = color_palette if color_palette is not None else get_palette()
+        self.preview_hex = None
         self.setup_ui(label_text)
         self.set_color(initial_color)
         
@@ -328,9 +398,11 @@ class HexColorWidget(QWidget):
         preset_layout = QHBoxLayout()
         preset_layout.addWidget(QLabel("Presets:"))
         self.preset_combo = QComboBox()
-        self.preset_combo.addItem("Custom", "")
-        for name, hex_color in DEFAULT_COLORS.items():
-            self.preset_combo.addItem(name, hex_color)
+        # Every color widget shares one model, so a large palette is listed once
+        self.preset_combo.setModel(self.color_palette.combo_model())
+        # Don't measure every entry to size the combo
+        self.preset_combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        self.preset_combo.setMinimumContentsLength(12)
         self.preset_combo.currentTextChanged.connect(self.preset_changed)
         preset_layout.addWidget(self.preset_combo)
         preset_layout.addStretch()
@@ -350,12 +422,16 @@ class HexColorWidget(QWidget):
         self.color_preview.setEnabled(False)
         hex_layout.addWidget(self.color_preview)
         
+        # Names the closest palette color when the hex isn't one of them
+        self.nearest_label = QLabel()
+        hex_layout.addWidget(self.nearest_label)
+        
         layout.addLayout(hex_layout)
         self.setLayout(layout)
     
     def preset_changed(self, preset_name):
         if preset_name != "Custom":
-            hex_color = self.preset_combo.currentData()
+            hex_color = self.color_palette.hex_for_name(preset_name)
             if hex_color:
                 self.hex_input.setText(hex_color)
     
@@ -364,55 +440,129 @@ class HexColorWidget(QWidget):
             hex_text = '#' + hex_text
             self.hex_input.setText(hex_text)
             return
-            
-        try:
-            if len(hex_text) == 7 and hex_text.startswith('#'):
-                color = QColor(hex_text)
-                if color.isValid():
-                    self.update_preview(color)
-                    color_dict = {
-                        'r': color.red(),
-                        'g': color.green(),
-                        'b': color.blue(),
-                        'a': 255
-                    }
-                    self.color_changed.emit(color_dict)
-                    
-                    if hex_text.upper() not in DEFAULT_COLORS.values():
-                        self.preset_combo.setCurrentText("Custom")
-                    else:
-                        for name, preset_hex in DEFAULT_COLORS.items():
-                            if preset_hex.upper() == hex_text.upper():
-                                self.preset_combo.setCurrentText(name)
-                                break
-        except:
-            pass
-    
-    def update_preview(self, color):
+        
+        hex_color = normalize_hex(hex_text)
+        if hex_color is None:
+            return
+        color = qcolor(hex_color)
+        self.update_preview(hex_color)
+        color_dict = {
+            'r': color.red(),
+            'g': color.green(),
+            'b': color.blue(),
+            'a': 255
+        }
+        self.color_changed.emit(color_dict)
+        self.show_palette_name(hex_color)
+    
+    def show_palette_name(self, hex_color):
+        """Select the palette entry for hex_color, or "Custom" and the closest entry's name"""
+        name = self.color_palette.name_for_hex(hex_color)
+        if name is not None:
+            self.preset_combo.setCurrentIndex(self.color_palette.row(name) + 1)
+            self.nearest_label.setText("")
+        else:
+            self.preset_combo.setCurrentIndex(0)
+            nearest, _ = self.color_palette.nearest(hex_to_rgb(hex_color))
+            self.nearest_label.setText(f"Closest: {nearest}" if nearest else "")
+    
+    def update_preview(self, hex_color):
+        # Restyling is the expensive part of a keystroke, so skip it when nothing changed
+        if hex_color == self.preview_hex:
+            return
+        self.preview_hex = hex_color
         self.color_preview.setStyleSheet(
-            f"background-color: {color.name()}; border: 1px solid #666;"
+            f"background-color: {hex_color}; border: 1px solid #666;"
         )
     
     def set_color(self, color_dict):
-        color = QColor(color_dict['r'], color_dict['g'], color_dict['b'])
-        hex_color = color.name().upper()
+        hex_color = rgb_to_hex(color_dict['r'], color_dict['g'], color_dict['b'])
         self.hex_input.setText(hex_color)
-        self.update_preview(color)
-        
-        for name, preset_hex in DEFAULT_COLORS.items():
-            if preset_hex.upper() == hex_color:
-                self.preset_combo.setCurrentText(name)
-                return
-        self.preset_combo.setCurrentText("Custom")
+        self.update_preview(hex_color)
+        self.show_palette_name(hex_color)
+
+class SettingsDispatcher(QObject):
+    """Coalesces bursts of settings changes into at most one delivery per display frame"""
+    delivered = pyqtSignal(dict)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pending = None
+        self.pending_since = None
+        self.last_delivery = 0.0
+        self.received_count = 0
+        self.delivered_count = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.flush)
+    
+    def frame_interval(self):
+        """Return the display refresh interval in seconds"""
+        screen = QApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen else 0
+        return 1.0 / (refresh_rate if refresh_rate > 0 else 60.0)
+    
+    def submit(self, config):
+        """Queue config for delivery, replacing anything not yet delivered"""
+        now = time.perf_counter()
+        self.received_count += 1
+        self.pending = config
+        if self.pending_since is None:
+            self.pending_since = now
+        if not self.timer.isActive():
+            # The first change after a quiet frame goes out on the next event loop pass
+            wait = self.frame_interval() - (now - self.last_delivery)
+            self.timer.start(max(0, int(wait * 1000)))
+    
+    def flush(self):
+        """Deliver the latest pending config right away"""
+        self.timer.stop()
+        if self.pending is None:
+            return
+        config = self.pending
+        self.last_delivery = time.perf_counter()
+        self.last_latency = self.last_delivery - self.pending_since
+        self.max_latency = max(self.max_latency, self.last_latency)
+        self.pending = None
+        self.pending_since = None
+        self.delivered_count += 1
+        self.delivered.emit(config)
+    
+    def stats(self):
+        """Return counters of updates received versus delivered and the delivery latency"""
+        return {
+            'received': self.received_count,
+            'delivered': self.delivered_count,
+            'coalesced': self.received_count - self.delivered_count - (1 if self.pending is not None else 0),
+            'last_latency_ms': self.last_latency * 1000,
+            'max_latency_ms': self.max_latency * 1000,
+        }
 
 class CrosshairMenu(QWidget):
-    settings_changed = pyqtSignal(dict)
+    settings_changed = pyqtSignal(object)
     
-    def __init__(self, config):
+    def __init__(self, config, metrics=None, preset_manager=None):
         super().__init__()
-        self.config = config.copy()
-        self.preset_manager = CrosshairPresetManager()
+        # The menu edits a JSON-shaped dict; what it emits is a CrosshairConfig
+        self.config = CrosshairConfig.coerce(config).to_dict()
+        self.metrics = metrics
+        self.persistence = get_persistence_worker()
+        self.persistence.write_finished.connect(self.write_finished)
+        self.persistence.write_failed.connect(self.write_failed)
+        if preset_manager is None:
+            preset_manager = CrosshairPresetManager(service=get_config_service())
+        self.preset_manager = preset_manager
+        self.config_service = preset_manager.service
+        self.config_service.presets_changed.connect(self.presets_reloaded)
         self.current_preset_name = "Default Green"
+        # Preset thumbnails come from the on-disk atlas, one icon per distinct config
+        self.thumbnails = None
+        self.preset_icons = {}
+        self.dispatcher = SettingsDispatcher(self)
+        self.dispatcher.delivered.connect(self.deliver_settings)
         self.setup_ui()
         self.load_settings()
         
@@ -445,9 +595,16 @@ class CrosshairMenu(QWidget):
         preset_selector_layout = QHBoxLayout()
         preset_selector_layout.addWidget(QLabel("Preset:"))
         self.preset_combo = QComboBox()
-        self.update_preset_combo()
+        self.setup_preset_list()
         self.preset_combo.currentTextChanged.connect(self.preset_changed)
         preset_selector_layout.addWidget(self.preset_combo)
+        # Typing narrows the list, Enter switches to the first match
+        self.preset_search = QLineEdit()
+        self.preset_search.setPlaceholderText("Search presets")
+        self.preset_search.setClearButtonEnabled(True)
+        self.preset_search.textChanged.connect(self.preset_filter.set_text)
+        self.preset_search.returnPressed.connect(self.pick_first_preset_match)
+        preset_selector_layout.addWidget(self.preset_search)
         preset_layout.addLayout(preset_selector_layout)
         
         # Preset management buttons
@@ -461,6 +618,10 @@ class CrosshairMenu(QWidget):
         self.delete_preset_button.clicked.connect(self.delete_current_preset)
         preset_buttons_layout.addWidget(self.delete_preset_button)
         
+        self.rename_preset_button = QPushButton("Rename")
+        self.rename_preset_button.clicked.connect(self.rename_current_preset)
+        preset_buttons_layout.addWidget(self.rename_preset_button)
+        
         preset_layout.addLayout(preset_buttons_layout)
         preset_group.setLayout(preset_layout)
         layout.addWidget(preset_group)
@@ -595,10 +756,60 @@ class CrosshairMenu(QWidget):
         
         # Update preset combo to reflect current settings
         if hasattr(self, 'preset_combo'):
-            self.update_preset_combo()
-        
+            # Selecting the preset here must not switch presets again
+            self.preset_combo.blockSignals(True)
+            self.select_current_preset()
+            self.preset_combo.blockSignals(False)
+
         if hasattr(self, 'preview_widget'):
             self.preview_widget.update_config(self.config)
+
+    def apply_settings(self, config, keys):
+        """Show settings that changed outside the menu"""
+        self.config = config.to_dict()
+        self.show_settings(keys)
+    
+    def show_settings(self, keys):
+        """Update only the widgets for the given keys, without emitting the settings again"""
+        setters = {
+            'color': (self.main_color_widget, self.main_color_widget.set_color),
+            'outline_color': (self.outline_color_widget, self.outline_color_widget.set_color),
+            'line_thickness': (self.thickness_spinbox, self.thickness_spinbox.setValue),
+            'crosshair_length': (self.length_slider, self.length_slider.setValue),
+            'crosshair_gap': (self.gap_slider, self.gap_slider.setValue),
+            'outline_enabled': (self.outline_checkbox, self.outline_checkbox.setChecked),
+            'outline_thickness': (self.outline_thickness_spinbox, self.outline_thickness_spinbox.setValue),
+            'crosshair_style': (self.style_combo,
+                                lambda style: self.style_combo.setCurrentIndex(0 if style == 'cross' else 1)),
+            'dot_size': (self.dot_size_slider, self.dot_size_slider.setValue),
+        }
+        for key in keys:
+            if key not in setters:
+                continue
+            widget, setter = setters[key]
+            widget.blockSignals(True)
+            setter(self.config.get(key, DEFAULT_CONFIG[key]))
+            widget.blockSignals(False)
+        self.length_label.setText(str(self.config['crosshair_length']))
+        self.gap_label.setText(str(self.config['crosshair_gap']))
+        self.dot_size_label.setText(str(self.config.get('dot_size', 6)))
+        self.update_dot_size_visibility()
+        self.preview_widget.update_config(self.config)
+        self.update_preset_combo_for_current_settings()
+    
+    def presets_reloaded(self, names, previous):
+        """Update the rows of the presets that changed on disk"""
+        # Updating the list must not switch the crosshair to another preset
+        self.preset_combo.blockSignals(True)
+        presets = self.preset_manager.presets
+        self.preset_model.remove([name for name in names if name not in presets])
+        self.preset_model.insert([name for name in names if name in presets])
+        # Their configs, and so their icons, may have changed
+        self.preset_model.changed(names)
+        self.forget_stale_thumbnails()
+        self.select_current_preset()
+        self.preset_combo.blockSignals(False)
+        self.update_preset_combo_for_current_settings()
     
     def update_style(self, idx):
         style = self.style_combo.currentData()
@@ -649,67 +860,143 @@ class CrosshairMenu(QWidget):
         self.emit_settings()
     
     def emit_settings(self):
-        self.settings_changed.emit(self.config)
+        if self.metrics is not None:
+            self.metrics.settings_emitted()
+        # Slider drags fire many times per frame, so only the latest state is delivered
+        self.dispatcher.submit(self.config)
+    
+    def deliver_settings(self, config):
+        # Validated and frozen once per delivered frame, not once per slider tick
+        config = CrosshairConfig.from_dict(config)
+        self.settings_changed.emit(config)
         if hasattr(self, 'preview_widget'):
-            self.preview_widget.update_config(self.config)
+            self.preview_widget.update_config(config)
         
         # Update preset combo to show "Custom" if current settings don't match any preset
         self.update_preset_combo_for_current_settings()
     
     def update_preset_combo_for_current_settings(self):
         """Update preset combo to show which preset matches current settings, or 'Custom'"""
-        preset_names = self.preset_manager.get_preset_names()
-        current_preset = None
-        
-        for name in preset_names:
-            preset_config = self.preset_manager.get_preset(name)
-            if preset_config == self.config:
-                current_preset = name
-                break
+        current_preset = self.preset_manager.find_preset(self.config)
         
         if current_preset and current_preset != self.current_preset_name:
             self.current_preset_name = current_preset
-            self.preset_combo.setCurrentText(current_preset)
-        elif not current_preset and self.current_preset_name in preset_names:
+            self.select_preset(current_preset)
+            self.preset_model.set_custom(False)
+        elif not current_preset and self.preset_manager.has_preset(self.current_preset_name):
             # Settings don't match any preset, show "Custom"
             self.current_preset_name = "Custom"
-            if "Custom" not in [self.preset_combo.itemText(i) for i in range(self.preset_combo.count())]:
-                self.preset_combo.addItem("Custom")
-            self.preset_combo.setCurrentText("Custom")
+            self.preset_model.set_custom(True)
+            self.select_preset("Custom")
     
     def reset_to_default(self):
-        self.config = self.preset_manager.get_preset("Default Green").copy()
+        self.config = self.preset_manager.get_preset("Default Green")
         self.current_preset_name = "Default Green"
         self.load_settings()
         self.emit_settings()
     
     def save_settings(self):
-        try:
-            with open('crosshair_settings.json', 'w') as f:
-                json.dump(self.config, f, indent=2)
+        # Written on the persistence thread; repeated saves collapse into one write
+        self.config_service.save_settings(self.config)
+    
+    def write_finished(self, target):
+        if target == SETTINGS_FILENAME:
             print("Settings saved successfully")
+    
+    def write_failed(self, target, error):
+        if target == SETTINGS_FILENAME:
+            print(f"Error saving settings: {error}")
+        else:
+            print(f"Error saving presets: {error}")
+    
+    def setup_preset_list(self):
+        """Back the preset combo with a list model that changes one row at a time"""
+        # Only the menu needs these, keep them off the startup path
+        from crosshair_preset_model import PresetFilterModel, PresetListModel
+        self.preset_model = PresetListModel(self.preset_manager.get_preset_names(), self.preset_icon, self)
+        self.preset_filter = PresetFilterModel(self.preset_model, self)
+        self.preset_combo.setModel(self.preset_filter)
+        # Sized from a minimum length instead of measuring every name
+        self.preset_combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        self.preset_combo.setMinimumContentsLength(16)
+        self.preset_combo.view().setUniformItemSizes(True)
+        # A scrolling list rather than a popup menu, which measures every name and icon before it opens
+        self.preset_combo.setStyleSheet("combobox-popup: 0;")
+        self.preset_combo.setMaxVisibleItems(20)
+        try:
+            from crosshair_thumbnails import ThumbnailAtlas
+            self.thumbnails = ThumbnailAtlas()
+            size = self.thumbnails.tile_size
+            self.preset_combo.setIconSize(QSize(size, size))
+            self.thumbnails.prune(self.preset_manager.hash_index)
         except Exception as e:
-            print(f"Error saving settings: {e}")
-    
-    def update_preset_combo(self):
-        """Update the preset combo box with current presets"""
-        self.preset_combo.clear()
-        preset_names = self.preset_manager.get_preset_names()
-        for name in preset_names:
-            self.preset_combo.addItem(name)
-        
-        # Set current preset
-        if self.current_preset_name in preset_names:
-            self.preset_combo.setCurrentText(self.current_preset_name)
-        elif preset_names:
-            self.preset_combo.setCurrentText(preset_names[0])
+            print(f"Error loading preset thumbnails: {e}")
+            self.thumbnails = None
+        self.select_current_preset()
+    
+    def select_preset(self, name):
+        """Select a preset, or "Custom", in the combo by its row instead of searching for its name"""
+        # Searching never hides the selected preset
+        self.preset_filter.set_pinned(name)
+        row = self.preset_model.row(name)
+        if row is not None:
+            self.preset_combo.setCurrentIndex(self.preset_filter.proxy_row(row))
+    
+    def select_current_preset(self):
+        """Select the current preset, or the first one if it is gone"""
+        name = self.current_preset_name
+        if self.preset_model.row(name) is None and self.preset_model.names:
+            name = self.preset_model.names[0]
+        self.select_preset(name)
+    
+    def pick_first_preset_match(self):
+        row = self.preset_filter.first_match()
+        if row >= 0:
+            self.preset_combo.setCurrentIndex(row)
+    
+    def preset_icon(self, name):
+        """Return the thumbnail of a preset, drawn the first time a preset with its config is shown"""
+        config = self.preset_manager.presets.get(name)
+        if self.thumbnails is None or config is None:
+            return None
+        key = config_hash(config)
+        icon = self.preset_icons.get(key)
+        if icon is None:
+            try:
+                image = self.thumbnails.tile(key, config)
+            except Exception as e:
+                print(f"Error drawing preset thumbnail: {e}")
+                self.thumbnails = None
+                return None
+            # Copied, the tile is a view of the atlas file which moves when it grows
+            icon = self.preset_icons[key] = QIcon(QPixmap.fromImage(image.copy()))
+            if self.thumbnails.unsaved == 1:
+                # One index write for all the tiles drawn while the list is painted
+                QTimer.singleShot(0, self.save_thumbnails)
+        return icon
+    
+    def save_thumbnails(self):
+        if self.thumbnails is not None:
+            try:
+                self.thumbnails.save()
+            except Exception as e:
+                print(f"Error saving preset thumbnails: {e}")
+    
+    def forget_stale_thumbnails(self):
+        """Drop the icons and atlas tiles of configs no preset has any more"""
+        keys = self.preset_manager.hash_index
+        self.preset_icons = {key: icon for key, icon in self.preset_icons.items() if key in keys}
+        if self.thumbnails is not None:
+            try:
+                self.thumbnails.prune(keys)
+            except Exception as e:
+                print(f"Error saving preset thumbnails: {e}")
     
     def preset_changed(self, preset_name):
         """Handle preset selection change"""
         if preset_name and preset_name != self.current_preset_name:
             self.current_preset_name = preset_name
-            new_config = self.preset_manager.get_preset(preset_name)
-            self.config = new_config.copy()
+            self.config = self.preset_manager.get_preset(preset_name)
             self.load_settings()
             self.emit_settings()
     
@@ -717,47 +1004,84 @@ class CrosshairMenu(QWidget):
         """Save current configuration as a new preset"""
         name, ok = QInputDialog.getText(self, "Save Preset", 
                                        "Enter preset name:", 
-                                       text=f"Custom Preset {len(self.preset_manager.get_preset_names()) + 1}")
+                                       text=f"Custom Preset {len(self.preset_manager.presets) + 1}")
         if ok and name:
-            if name in self.preset_manager.get_preset_names():
+            if self.preset_manager.has_preset(name):
                 QMessageBox.warning(self, "Error", "A preset with this name already exists!")
                 return
             
             if self.preset_manager.save_current_as_preset(name, self.config):
-                self.update_preset_combo()
                 self.current_preset_name = name
-                self.preset_combo.setCurrentText(name)
+                # Inserting moves the "Custom" row, which the combo would report as picking it
+                self.preset_combo.blockSignals(True)
+                self.preset_model.insert([name])
+                self.select_preset(name)
+                self.preset_model.set_custom(False)
+                self.preset_combo.blockSignals(False)
                 print(f"Preset '{name}' saved successfully")
             else:
                 print("Failed to save preset")
     
     def delete_current_preset(self):
         """Delete the currently selected preset"""
-        if not self.current_preset_name:
+        name = self.current_preset_name
+        if not name:
             return
             
         # Don't allow deletion of default presets
-        if self.current_preset_name in DEFAULT_PRESETS:
+        if name in DEFAULT_PRESETS:
             QMessageBox.warning(self, "Cannot Delete", 
-                              f"Cannot delete default preset '{self.current_preset_name}'")
+                              f"Cannot delete default preset '{name}'")
             return
         
         reply = QMessageBox.question(self, "Delete Preset", 
-                                   f"Are you sure you want to delete '{self.current_preset_name}'?",
+                                   f"Are you sure you want to delete '{name}'?",
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            if self.preset_manager.delete_preset(self.current_preset_name):
-                self.update_preset_combo()
+            if self.preset_manager.delete_preset(name):
+                # Removing the selected row must not switch presets; that is done below
+                self.preset_combo.blockSignals(True)
+                self.preset_model.remove([name])
+                self.preset_combo.blockSignals(False)
+                self.forget_stale_thumbnails()
                 # Switch to first available preset
-                preset_names = self.preset_manager.get_preset_names()
-                if preset_names:
-                    self.current_preset_name = preset_names[0]
-                    self.preset_changed(self.current_preset_name)
-                print(f"Preset '{self.current_preset_name}' deleted successfully")
+                if self.preset_model.names:
+                    self.preset_changed(self.preset_model.names[0])
+                print(f"Preset '{name}' deleted successfully")
             else:
                 print("Failed to delete preset")
     
+    def rename_current_preset(self):
+        """Rename the currently selected preset, keeping its place in the list"""
+        old_name = self.current_preset_name
+        if not self.preset_manager.has_preset(old_name):
+            return
+        if old_name in DEFAULT_PRESETS:
+            QMessageBox.warning(self, "Cannot Rename", 
+                              f"Cannot rename default preset '{old_name}'")
+            return
+        
+        name, ok = QInputDialog.getText(self, "Rename Preset", "Enter new name:", text=old_name)
+        if ok and name and name != old_name:
+            if self.preset_manager.has_preset(name):
+                QMessageBox.warning(self, "Error", "A preset with this name already exists!")
+                return
+            
+            if self.preset_manager.rename_preset(old_name, name):
+                # Set first, so the combo showing the new name doesn't load it again
+                self.current_preset_name = name
+                self.preset_model.rename(old_name, name)
+                self.preset_filter.set_pinned(name)
+                print(f"Preset '{old_name}' renamed to '{name}'")
+            else:
+                print("Failed to rename preset")
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.metrics is not None:
+            self.metrics.window_painted('menu')
+    
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
             self.hide()
@@ -766,31 +1090,56 @@ class CrosshairMenu(QWidget):
     def closeEvent(self, event):
         QApplication.quit()
 
-class CrosshairOverlay(QWidget):
-    def __init__(self):
+class ScreenOverlay(QWidget):
+    """A click-through window that draws the crosshair at the center of one screen
+    
+    Sprites come from the shared render cache at the screen's device pixel
+    ratio, so the crosshair keeps its size and stays sharp on scaled screens
+    and screens with the same scaling share one sprite.
+    """
+    
+    def __init__(self, config=None, screen=None, bounded=True, preset=None, animator=None):
         super().__init__()
-        self.config = self.load_config()
-        self.menu_visible = False
-        self.setup_window()
-        self.setup_menu()
-        self.setup_system_tray()
-        self.setup_global_hotkeys()
-        # Fallback timer for testing
-        self.test_timer = QTimer()
-        self.test_timer.timeout.connect(self.test_menu_toggle)
+        self.target_screen = None
+        # Bounded overlays only cover the crosshair instead of the whole screen
+        self.bounded = bounded
+        # The preset this screen shows, or None to follow the main settings
+        self.preset = preset
+        # Animations are off unless a CrosshairAnimator is handed in
+        self.animator = animator
+        if animator is not None:
+            animator.changed.connect(self.animation_frame)
+        self.config = None
+        self.renderer = None
+        screen = screen or QApplication.primaryScreen()
+        if config is not None:
+            self.config = CrosshairConfig.coerce(config)
+            self.renderer = CrosshairRenderer(self.config, device_pixel_ratio=screen.devicePixelRatio())
+        self.set_screen(screen)
     
-    def load_config(self):
-        try:
-            # First try to load from the old settings file
-            if os.path.exists('crosshair_settings.json'):
-                with open('crosshair_settings.json', 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading settings: {e}")
-        
-        # If no settings file exists, use the default preset
-        preset_manager = CrosshairPresetManager()
-        return preset_manager.get_preset("Default Green")
+    def set_screen(self, screen):
+        """Move the crosshair to another screen"""
+        if self.target_screen is not None:
+            for signal in self.screen_signals(self.target_screen):
+                signal.disconnect(self.screen_changed)
+        self.target_screen = screen
+        for signal in self.screen_signals(screen):
+            signal.connect(self.screen_changed)
+        if self.renderer is not None:
+            self.screen_changed()
+    
+    @staticmethod
+    def screen_signals(screen):
+        return (screen.geometryChanged, screen.logicalDotsPerInchChanged, screen.physicalDotsPerInchChanged)
+    
+    def screen_changed(self, *args):
+        """Follow the screen's geometry and scale factor"""
+        self.renderer.set_device_pixel_ratio(self.target_screen.devicePixelRatio())
+        if self.bounded:
+            self.fit_to_crosshair()
+        else:
+            self.setGeometry(self.target_screen.geometry())
+        self.update()
     
     def setup_window(self):
         self.setWindowFlags(
@@ -799,14 +1148,181 @@ class CrosshairOverlay(QWidget):
             Qt.Tool
         )
         self.setAttribute(Qt.WA_TranslucentBackground)
-        self.showFullScreen()
+        if self.bounded:
+            self.fit_to_crosshair()
+            self.show()
+        else:
+            self.setGeometry(self.target_screen.geometry())
+            self.showFullScreen()
         self.setFocusPolicy(Qt.NoFocus)  # Changed from StrongFocus to NoFocus
         
         self.make_click_through()
     
-    def setup_menu(self):
-        self.menu = CrosshairMenu(self.config)
-        self.menu.settings_changed.connect(self.update_config)
+    def make_click_through(self):
+        try:
+            import ctypes
+            hwnd = self.winId().__int__()
+            
+            GWL_EXSTYLE = -20
+            WS_EX_LAYERED = 0x00080000
+            WS_EX_TRANSPARENT = 0x00000020
+            
+            style = ctypes.windll.user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
+            new_style = style | WS_EX_LAYERED | WS_EX_TRANSPARENT
+            ctypes.windll.user32.SetWindowLongW(hwnd, GWL_EXSTYLE, new_style)
+            
+        except Exception as e:
+            print(f"Warning: Could not set click-through mode: {e}")
+    
+    def disable_click_through(self):
+        try:
+            import ctypes
+            hwnd = self.winId().__int__()
+            
+            GWL_EXSTYLE = -20
+            WS_EX_LAYERED = 0x00080000
+            WS_EX_TRANSPARENT = 0x00000020
+            
+            style = ctypes.windll.user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
+            new_style = (style | WS_EX_LAYERED) & ~WS_EX_TRANSPARENT
+            ctypes.windll.user32.SetWindowLongW(hwnd, GWL_EXSTYLE, new_style)
+            
+        except Exception as e:
+            print(f"Warning: Could not disable click-through mode: {e}")
+    
+    def crosshair_rect(self):
+        """Return the screen rectangle the crosshair sprite covers"""
+        # Keep the crosshair on the same pixel a full-screen overlay would use
+        screen_geometry = self.target_screen.geometry()
+        center_x = screen_geometry.x() + screen_geometry.width() // 2
+        center_y = screen_geometry.y() + screen_geometry.height() // 2
+        return self.renderer.bounding_rect(center_x, center_y)
+    
+    def fit_to_crosshair(self):
+        """Shrink the window to the crosshair sprite, centered on the screen"""
+        self.setGeometry(self.crosshair_rect())
+    
+    def display_config(self):
+        return self.animated(self.config)
+    
+    def animated(self, config):
+        """Return config as the running animations draw it this frame"""
+        if self.animator is not None:
+            return self.animator.adapt(config)
+        return config
+    
+    def update_config(self, new_config):
+        self.config = CrosshairConfig.coerce(new_config)
+        self.apply_config()
+    
+    def apply_config(self):
+        """Draw the current display config; returns True if the sprite changed"""
+        changed = self.renderer.set_config(self.display_config())
+        if changed:
+            self.sprite_changed()
+        return changed
+    
+    def sprite_changed(self):
+        if self.bounded and self.renderer.sprite.size != self.size():
+            self.fit_to_crosshair()
+        self.update()
+    
+    def sprite_rect(self):
+        """Return the part of the window the sprite covers"""
+        return self.renderer.bounding_rect(self.width() // 2, self.height() // 2)
+    
+    def animation_frame(self):
+        """Draw the next animation frame, repainting only the part of the window it changed"""
+        previous = self.sprite_rect()
+        self.renderer.set_config(self.display_config())
+        sprite_size = self.renderer.sprite.size
+        if self.bounded and (sprite_size.width() > self.width() or
+                             (self.animator.shape_at_rest and sprite_size != self.size())):
+            # Grow the window once when the crosshair blooms, and shrink it back once it is at rest
+            self.fit_to_crosshair()
+            self.update()
+        else:
+            self.update(previous.united(self.sprite_rect()))
+    
+    def paint_crosshair(self, painter):
+        if self.animator is not None:
+            painter.setOpacity(self.animator.opacity)
+        self.renderer.paint(painter, self.width() // 2, self.height() // 2)
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        self.paint_crosshair(painter)
+        painter.end()
+
+class CrosshairOverlay(ScreenOverlay):
+    def __init__(self, bounded=True, metrics=None, startup_trace=None, contrast=None, screen=None,
+                 animator=None, hotkeys=None, favorites=None, mouse_listener=None):
+        super().__init__(screen=screen, bounded=bounded, animator=animator)
+        # Instrumentation is off unless a PaintMetrics is handed in
+        self.metrics = metrics
+        self.startup_trace = startup_trace
+        # Adaptive contrast is off unless a ContrastController is handed in
+        self.contrast = contrast
+        # Other processes can drive this overlay once setup_control_server is given a ControlServer
+        self.control = None
+        # Settings and presets are read once, through the process-wide config service
+        self.config_service = get_config_service()
+        self.preset_manager = CrosshairPresetManager(service=self.config_service)
+        self.config = CrosshairConfig.from_dict(self.load_config())
+        self.renderer = CrosshairRenderer(self.display_config(),
+                                          device_pixel_ratio=self.target_screen.devicePixelRatio())
+        self.trace("config loaded")
+        # Preset hotkeys switch between favourites whose sprites are rasterized ahead of time
+        self.preset_cycler = PresetCycler(self.preset_manager, favorites)
+        self.current_preset = self.preset_manager.find_preset(self.config)
+        # Set when a preset hotkey changed the settings while the menu was hidden
+        self.menu_out_of_date = False
+        # Windows for the other screens the crosshair is shown on
+        self.screen_overlays = []
+        self.menu_visible = False
+        # The settings menu is built the first time it is opened
+        self.menu = None
+        self.setup_window()
+        self.trace("overlay window shown")
+        if contrast is not None:
+            contrast.changed.connect(self.apply_config)
+            contrast.set_region(self.crosshair_rect(), self.target_screen)
+            contrast.start()
+        if animator is not None:
+            self.setup_animation(mouse_listener)
+        self.setup_system_tray()
+        self.trace("system tray ready")
+        self.setup_global_hotkeys(hotkeys)
+        self.trace("hotkeys registered")
+        # Pick up configs pushed to disk by other programs without a restart
+        self.config_service.settings_changed.connect(self.settings_reloaded)
+        self.config_service.presets_changed.connect(self.presets_reloaded)
+        self.config_service.watch()
+        QApplication.instance().screenRemoved.connect(self.screen_removed)
+        # Warm the favourites once the event loop runs, after the first paint
+        QTimer.singleShot(0, self.warm_presets)
+        # Fallback timer for testing
+        self.test_timer = QTimer()
+        self.test_timer.timeout.connect(self.test_menu_toggle)
+    
+    def trace(self, label):
+        if self.startup_trace is not None:
+            self.startup_trace.mark(label)
+    
+    def load_config(self):
+        settings = self.config_service.settings()
+        if settings is not None:
+            return dict(settings)
+        
+        # If no settings file exists, use the default preset
+        return self.preset_manager.get_preset("Default Green")
+    
+    def ensure_menu(self):
+        """Build the settings menu on first use and return it"""
+        if self.menu is None:
+            self.menu = CrosshairMenu(self.config, self.metrics, self.preset_manager)
+            self.menu.settings_changed.connect(self.update_config)
+        return self.menu
     
     def setup_system_tray(self):
         """Setup system tray icon for easy access"""
@@ -823,6 +1339,12 @@ class CrosshairOverlay(QWidget):
             show_settings_action = tray_menu.addAction("Show Settings")
             show_settings_action.triggered.connect(self.show_menu)
             
+            if self.metrics is not None:
+                show_metrics_action = tray_menu.addAction("Show Paint Metrics")
+                show_metrics_action.triggered.connect(self.show_metrics)
+                export_metrics_action = tray_menu.addAction("Export Paint Metrics")
+                export_metrics_action.triggered.connect(self.export_metrics)
+            
             tray_menu.addSeparator()
             
             exit_action = tray_menu.addAction("Exit")
@@ -840,66 +1362,269 @@ class CrosshairOverlay(QWidget):
         if reason == QSystemTrayIcon.DoubleClick:
             self.show_menu()
     
-    def setup_global_hotkeys(self):
+    def setup_global_hotkeys(self, hotkeys=None):
+        """Listen for global hotkeys through hotkeys, a HotkeyBackend, or the platform's default backend"""
         try:
-            self.hotkey_listener = ImprovedHotKeyListener()
-            self.hotkey_listener.hotkey_pressed.connect(self.handle_hotkey)
+            if hotkeys is None:
+                from crosshair_hotkeys import make_hotkey_backend
+                hotkeys = make_hotkey_backend()
+            self.hotkey_listener = hotkeys
+            self.hotkey_listener.activated.connect(self.handle_hotkey)
             self.hotkey_listener.start()
         except Exception as e:
             print(f"Failed to setup global hotkeys: {e}")
             print("You can still use the system tray to access settings")
     
-    def handle_hotkey(self, action):
-        if action == "toggle":
+    def setup_control_server(self, control):
+        """Run commands from other processes through control, a ControlServer; returns False if it can't listen"""
+        self.control = control
+        control.handlers.update(self.control_handlers())
+        # Quit once the reply to the quit command has been written
+        control.quit_requested.connect(lambda: QTimer.singleShot(0, QApplication.quit))
+        return control.listen()
+    
+    def setup_animation(self, mouse_listener=None):
+        """Pace animations to this screen and bloom the gap on clicks reported by mouse_listener
+
+        Without a listener the platform's default one is used.
+        """
+        self.animator.scheduler.screen = self.target_screen
+        if self.animator.bloom is not None:
+            try:
+                if mouse_listener is None:
+                    from crosshair_hotkeys import make_mouse_listener
+                    mouse_listener = make_mouse_listener()
+                self.mouse_listener = mouse_listener
+                self.mouse_listener.button_pressed.connect(self.animator.press)
+                self.mouse_listener.start()
+            except Exception as e:
+                print(f"Failed to watch mouse buttons, gap bloom is off: {e}")
+        self.animator.start()
+    
+    def handle_hotkey(self, action, timestamp=None):
+        """Run a hotkey's action; timestamp is when the key was pressed, for the hotkey to paint latency"""
+        if action == "menu":
+            window = 'menu'
+            showing = self.menu is None or not self.menu.isVisible()
+        elif action == "crosshair":
+            window = 'overlay'
+            showing = not self.isVisible()
+        elif action in ("next_preset", "previous_preset"):
+            name = self.preset_cycler.step(self.current_preset, 1 if action == "next_preset" else -1)
+            if name is not None:
+                self.switch_preset(name, timestamp)
+            return
+        elif preset_slot(action) is not None:
+            name = self.preset_cycler.slot(preset_slot(action))
+            if name is not None:
+                self.switch_preset(name, timestamp)
+            return
+        else:
+            print(f"Unknown hotkey action '{action}'")
+            return
+        # Hiding paints nothing, so only a hotkey that shows a window is timed
+        if self.metrics is not None and timestamp is not None and showing:
+            self.metrics.hotkey_pressed(timestamp, window)
+        if action == "menu":
+            self.toggle_menu()
+        else:
+            self.toggle_crosshair()
+    
+    def switch_preset(self, name, timestamp=None):
+        """Draw a preset right away, without going through the settings menu"""
+        start = time.perf_counter()
+        config = self.preset_cycler.config(name)
+        if config is None:
+            return
+        misses = render_cache.misses
+        changed = self.show_config(config, name)
+        self.preset_cycler.switched(start, render_cache.misses != misses)
+        if changed and self.metrics is not None and timestamp is not None and self.isVisible():
+            self.metrics.hotkey_pressed(timestamp, 'overlay')
+        return changed
+    
+    def show_config(self, config, preset=None):
+        """Draw settings changed outside the menu and show them in it; returns True if the sprite changed"""
+        previous = self.config
+        self.config = config
+        self.current_preset = preset
+        changed = self.apply_config()
+        if self.menu is not None:
+            if self.menu.isVisible():
+                self.sync_menu(previous)
+            else:
+                self.menu_out_of_date = True
+        return changed
+    
+    def sync_menu(self, previous=None):
+        """Show settings the menu didn't make in its widgets, without it emitting them again"""
+        keys = [key for key in CrosshairConfig.FIELDS
+                if previous is None or getattr(previous, key) != getattr(self.config, key)]
+        self.menu_out_of_date = False
+        if keys:
+            self.menu.apply_settings(self.config, keys)
+    
+    def warm_presets(self):
+        """Rasterize the favourite presets for every screen that follows the main settings"""
+        overlays = [self] + [overlay for overlay in self.screen_overlays if overlay.preset is None]
+        self.preset_cycler.warm(sorted({overlay.renderer.device_pixel_ratio for overlay in overlays}))
+    
+    def toggle_crosshair(self, visible=None):
+        """Hide the crosshair on every screen, or show it again"""
+        if visible is None:
+            visible = not self.isVisible()
+        for overlay in [self] + self.screen_overlays:
+            overlay.setVisible(visible)
+    
+    def control_handlers(self):
+        """Commands the control server runs on this overlay, see crosshair_control"""
+        return {
+            'toggle': self.control_toggle,
+            'menu': self.control_menu,
+            'get': self.control_get,
+            'set': self.control_set,
+            'preset': self.control_preset,
+            'metrics': self.control_metrics,
+        }
+    
+    def control_toggle(self, command):
+        self.toggle_crosshair(command.get('visible'))
+        return {'visible': self.isVisible()}
+    
+    def control_menu(self, command):
+        visible = command.get('visible')
+        if visible is None:
             self.toggle_menu()
+        elif visible:
+            self.show_menu()
+        elif self.menu is not None and self.menu.isVisible():
+            self.hide_menu()
+        return {'visible': self.menu is not None and self.menu.isVisible()}
+    
+    def control_get(self, command):
+        return {'config': self.config.to_dict(), 'preset': self.current_preset}
+    
+    def control_set(self, command):
+        values = command['values'] if 'values' in command else {command['key']: command['value']}
+        if not isinstance(values, dict):
+            raise ValueError("values must be an object")
+        unknown = [key for key in values if key not in CrosshairConfig.FIELDS]
+        if unknown:
+            raise ValueError(f"unknown setting {', '.join(unknown)}")
+        # Raises ValueError for invalid values, leaving the crosshair as it was
+        config = self.config.replace(**values)
+        preset = self.preset_manager.find_preset(config)
+        return {'changed': self.show_config(config, preset), 'preset': preset}
+    
+    def control_preset(self, command):
+        name = command['name']
+        if self.preset_cycler.config(name) is None:
+            raise ValueError(f"unknown preset {name!r}")
+        return {'changed': self.switch_preset(name)}
+    
+    def control_metrics(self, command):
+        extra = self.metrics_extra()
+        if self.metrics is None:
+            return {'report': None, 'extra': extra}
+        return {'report': self.metrics.report(extra), 'extra': extra}
     
     def test_menu_toggle(self):
         """Test function to verify menu can be shown"""
         self.show_menu()
         self.test_timer.stop()
     
-    def make_click_through(self):
-        try:
-            hwnd = self.winId().__int__()
-            
-            GWL_EXSTYLE = -20
-            WS_EX_LAYERED = 0x00080000
-            WS_EX_TRANSPARENT = 0x00000020
-            
-            style = ctypes.windll.user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
-            new_style = style | WS_EX_LAYERED | WS_EX_TRANSPARENT
-            ctypes.windll.user32.SetWindowLongW(hwnd, GWL_EXSTYLE, new_style)
-            
-        except Exception as e:
-            print(f"Warning: Could not set click-through mode: {e}")
-    
-    def disable_click_through(self):
-        try:
-            hwnd = self.winId().__int__()
-            
-            GWL_EXSTYLE = -20
-            WS_EX_LAYERED = 0x00080000
-            WS_EX_TRANSPARENT = 0x00000020
-            
-            style = ctypes.windll.user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
-            new_style = (style | WS_EX_LAYERED) & ~WS_EX_TRANSPARENT
-            ctypes.windll.user32.SetWindowLongW(hwnd, GWL_EXSTYLE, new_style)
-            
-        except Exception as e:
-            print(f"Warning: Could not disable click-through mode: {e}")
+    def display_config(self):
+        """Return the config to draw: the user's, adapted to the background in adaptive contrast mode"""
+        config = self.config
+        if self.contrast is not None:
+            config = self.contrast.adapt(config)
+        return self.animated(config)
     
     def update_config(self, new_config):
-        self.config = new_config
-        self.update()
+        super().update_config(new_config)
+        self.current_preset = self.preset_manager.find_preset(self.config)
+    
+    def apply_config(self):
+        changed = super().apply_config()
+        if self.metrics is not None:
+            self.metrics.config_updated(changed)
+        for overlay in self.screen_overlays:
+            if overlay.preset is None:
+                overlay.update_config(self.config)
+        return changed
+    
+    def sprite_changed(self):
+        if self.contrast is not None:
+            self.contrast.set_region(self.crosshair_rect(), self.target_screen)
+        super().sprite_changed()
+    
+    def screen_changed(self, *args):
+        super().screen_changed(*args)
+        if self.contrast is not None:
+            self.contrast.set_region(self.crosshair_rect(), self.target_screen)
+        if self.animator is not None:
+            self.animator.scheduler.screen = self.target_screen
+        if hasattr(self, 'preset_cycler'):
+            self.warm_presets()
+    
+    def add_screen(self, screen, preset=None):
+        """Show the crosshair on another screen too, following the main settings or drawing its own preset"""
+        if preset is not None and not self.preset_manager.has_preset(preset):
+            print(f"Unknown preset '{preset}' for screen {screen.name()}, using the current settings")
+            preset = None
+        config = self.preset_manager.get_preset(preset) if preset is not None else self.config
+        overlay = ScreenOverlay(config, screen, self.bounded, preset, self.animator)
+        overlay.setup_window()
+        self.screen_overlays.append(overlay)
+        if preset is None and overlay.renderer.device_pixel_ratio != self.renderer.device_pixel_ratio:
+            self.warm_presets()
+        return overlay
+    
+    def presets_reloaded(self, names, previous):
+        """Redraw screens whose preset changed on disk, and warm the favourites again"""
+        for overlay in self.screen_overlays:
+            if overlay.preset in names and self.preset_manager.has_preset(overlay.preset):
+                overlay.update_config(self.preset_manager.get_preset(overlay.preset))
+        self.warm_presets()
+    
+    def screen_removed(self, screen):
+        for overlay in list(self.screen_overlays):
+            if overlay.target_screen is screen:
+                self.screen_overlays.remove(overlay)
+                overlay.close()
+        if self.target_screen is screen:
+            self.set_screen(QApplication.primaryScreen())
+    
+    def settings_reloaded(self, keys, previous):
+        """Apply the keys of the settings file that another program changed"""
+        settings = self.config_service.settings()
+        if settings is None:
+            return
+        config = self.config.to_dict()
+        for key in keys:
+            if key in settings:
+                config[key] = settings[key]
+            else:
+                config.pop(key, None)
+        config = CrosshairConfig.from_dict(config)
+        print(f"Settings reloaded from disk: {', '.join(keys)}")
+        self.update_config(config)
+        if self.menu is not None:
+            self.menu.apply_settings(config, keys)
     
     def show_menu(self):
         """Force show the menu"""
         print("Showing settings menu...")
         
-        # Center the menu on screen
-        screen_geometry = QApplication.primaryScreen().geometry()
-        menu_x = (screen_geometry.width() - self.menu.width()) // 2
-        menu_y = (screen_geometry.height() - self.menu.height()) // 2
+        self.ensure_menu()
+        if self.menu_out_of_date:
+            self.sync_menu()
+        
+        # Center the menu on the screen the mouse is on
+        screen = QApplication.screenAt(QCursor.pos()) or self.target_screen
+        screen_geometry = screen.availableGeometry()
+        menu_x = screen_geometry.x() + (screen_geometry.width() - self.menu.width()) // 2
+        menu_y = screen_geometry.y() + (screen_geometry.height() - self.menu.height()) // 2
         self.menu.move(menu_x, menu_y)
         
         self.menu.show()
@@ -911,73 +1636,59 @@ class CrosshairOverlay(QWidget):
         
     def hide_menu(self):
         """Hide the menu"""
-        self.menu.hide()
+        if self.menu is not None:
+            self.menu.hide()
         self.menu_visible = False
+        # Presets saved in the menu become favourites
+        self.warm_presets()
         # Ensure click-through is restored
         self.make_click_through()
 
     
     def toggle_menu(self):
-        if self.menu.isVisible():
+        if self.menu is not None and self.menu.isVisible():
             self.hide_menu()
         else:
             self.show_menu()
     
     def paintEvent(self, event):
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+        # The sprite is rasterized once per config, so a repaint is one blit
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setRenderHint(QPainter.HighQualityAntialiasing)
-        painter.setRenderHint(QPainter.TextAntialiasing)
-        
-        w = self.width()
-        h = self.height()
-        center_x = w // 2
-        center_y = h // 2
-        
-        main_color = QColor(self.config['color']['r'], self.config['color']['g'], 
-                           self.config['color']['b'], self.config['color']['a'])
-        outline_color = QColor(self.config['outline_color']['r'], self.config['outline_color']['g'], 
-                              self.config['outline_color']['b'], self.config['outline_color']['a'])
-        
-        thickness = self.config['line_thickness']
-        length = self.config['crosshair_length']
-        gap = self.config['crosshair_gap']
-        outline_enabled = self.config['outline_enabled']
-        outline_thickness = self.config['outline_thickness']
-        crosshair_style = self.config.get('crosshair_style', 'cross')
-        dot_size = self.config.get('dot_size', 6)
-        
-        if crosshair_style == 'dot':
-            # Draw outline first if enabled
-            if outline_enabled:
-                painter.setPen(Qt.NoPen)
-                painter.setBrush(outline_color)
-                painter.drawEllipse(center_x - dot_size//2 - outline_thickness, center_y - dot_size//2 - outline_thickness, dot_size + 2*outline_thickness, dot_size + 2*outline_thickness)
-            # Draw main dot
-            painter.setPen(Qt.NoPen)
-            painter.setBrush(main_color)
-            painter.drawEllipse(center_x - dot_size//2, center_y - dot_size//2, dot_size, dot_size)
-        else:
-            if outline_enabled:
-                outline_pen = QPen(outline_color, thickness + outline_thickness * 2)
-                outline_pen.setCosmetic(True)
-                outline_pen.setCapStyle(Qt.FlatCap)
-                outline_pen.setJoinStyle(Qt.RoundJoin)
-                painter.setPen(outline_pen)
-                painter.drawLine(QLineF(center_x + 0.5, center_y - length - gap + 0.5, center_x + 0.5, center_y - gap + 0.5))
-                painter.drawLine(QLineF(center_x + 0.5, center_y + gap + 0.5, center_x + 0.5, center_y + length + gap + 0.5))
-                painter.drawLine(QLineF(center_x - length - gap + 0.5, center_y + 0.5, center_x - gap + 0.5, center_y + 0.5))
-                painter.drawLine(QLineF(center_x + gap + 0.5, center_y + 0.5, center_x + length + gap + 0.5, center_y + 0.5))
-            main_pen = QPen(main_color, thickness)
-            main_pen.setCosmetic(True)
-            main_pen.setCapStyle(Qt.FlatCap)
-            main_pen.setJoinStyle(Qt.RoundJoin)
-            painter.setPen(main_pen)
-            painter.drawLine(QLineF(center_x + 0.5, center_y - length - gap + 0.5, center_x + 0.5, center_y - gap + 0.5))
-            painter.drawLine(QLineF(center_x + 0.5, center_y + gap + 0.5, center_x + 0.5, center_y + length + gap + 0.5))
-            painter.drawLine(QLineF(center_x - length - gap + 0.5, center_y + 0.5, center_x - gap + 0.5, center_y + 0.5))
-            painter.drawLine(QLineF(center_x + gap + 0.5, center_y + 0.5, center_x + length + gap + 0.5, center_y + 0.5))
+        self.paint_crosshair(painter)
         painter.end()
+        if metrics is not None:
+            metrics.paint_finished(start)
+        if self.startup_trace is not None:
+            self.startup_trace.mark("first overlay paint")
+            print(self.startup_trace.report())
+            self.startup_trace = None
+    
+    def metrics_extra(self):
+        """Counters from other subsystems that belong in the metrics report"""
+        extra = {'render cache': f"{render_cache.hits} hits, {render_cache.misses} misses"}
+        if self.menu is not None:
+            extra['settings dispatcher'] = self.menu.dispatcher.stats()
+        if self.contrast is not None:
+            extra['adaptive contrast'] = self.contrast.stats()
+        if self.animator is not None:
+            extra['animation'] = self.animator.stats()
+        extra['preset switching'] = self.preset_cycler.stats()
+        if self.control is not None:
+            extra['control server'] = self.control.stats()
+        return extra
+    
+    def show_metrics(self):
+        QMessageBox.information(None, "Paint Metrics", self.metrics.report(self.metrics_extra()))
+    
+    def export_metrics(self):
+        try:
+            self.metrics.export(METRICS_FILENAME, self.metrics_extra())
+            print(f"Metrics written to {os.path.abspath(METRICS_FILENAME)}")
+        except Exception as e:
+            print(f"Error exporting metrics: {e}")
     
     def keyPressEvent(self, event):
         # Manual hotkeys as fallback
@@ -997,16 +1708,29 @@ class CrosshairOverlay(QWidget):
     def closeEvent(self, event):
         if hasattr(self, 'hotkey_listener'):
             self.hotkey_listener.stop()
+        if hasattr(self, 'mouse_listener'):
+            self.mouse_listener.stop()
+        if self.contrast is not None:
+            self.contrast.stop()
+        if self.animator is not None:
+            self.animator.stop()
+        self.preset_cycler.stop()
+        if self.control is not None:
+            self.control.close()
+        for overlay in self.screen_overlays:
+            overlay.close()
         event.accept()
 
 def is_admin():
     try:
+        import ctypes
         return ctypes.windll.shell32.IsUserAnAdmin() != 0
     except:
         return False
 
 def run_as_admin():
     try:
+        import ctypes
         script = sys.argv[0]
         params = " ".join(sys.argv[1:])
         ctypes.windll.shell32.ShellExecuteW(
@@ -1017,11 +1741,197 @@ def run_as_admin():
         return False
     return True
 
+def parse_args(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Crosshair overlay")
+    parser.add_argument('--fullscreen-overlay', action='store_true',
+                        help="cover the whole screen instead of only the crosshair")
+    parser.add_argument('--instrument', action='store_true',
+                        help="record paint metrics, viewable from the tray menu")
+    parser.add_argument('--fast-start', action='store_true',
+                        help="only show the overlay at startup; don't open the settings menu")
+    parser.add_argument('--startup-trace', action='store_true',
+                        help="print how long each startup phase took, up to the first overlay paint")
+    parser.add_argument('--screen', action='append', metavar='SCREEN[=PRESET]',
+                        help="show the crosshair on SCREEN: 'primary', 'all', a screen number or a screen "
+                             "name; add =PRESET to draw that preset there instead of the current settings. "
+                             "Repeat for more screens; the first one gets the settings menu")
+    parser.add_argument('--palette', metavar='FILE',
+                        help="add the named colors in FILE (JSON or GIMP .gpl) to the color presets")
+    parser.add_argument('--adaptive-contrast', choices=('swap', 'contrast'),
+                        help="recolor the crosshair when the background hides it: swap the main and "
+                             "outline colors, or switch to black or white")
+    parser.add_argument('--contrast-rate', type=float, default=10.0, metavar='HZ',
+                        help="background samples per second in adaptive contrast mode (default 10)")
+    parser.add_argument('--contrast-budget-ms', type=float, default=0.5, metavar='MS',
+                        help="CPU time one background sample may take (default 0.5)")
+    parser.add_argument('--contrast-source', choices=('screen', 'synthetic'), default='screen',
+                        help="where background samples come from; 'synthetic' cycles through test backgrounds")
+    parser.add_argument('--hotkey', action='append', metavar='KEYS=ACTION',
+                        help="bind a global hotkey such as Ctrl+Shift+H=crosshair, replacing the default "
+                             "F2=menu; repeat for more bindings. Actions: " +
+                             '; '.join(f"{name}: {text}" for name, text in HOTKEY_ACTIONS.items()))
+    parser.add_argument('--favorite', action='append', metavar='PRESET',
+                        help="a preset the preset hotkeys switch between, kept rasterized for instant "
+                             f"switching; repeat for more (default: the first {DEFAULT_FAVORITES_LIMIT} presets)")
+    parser.add_argument('--hotkey-backend', choices=('windows', 'x11', 'evdev'),
+                        help="how global hotkeys are read (default: windows on Windows, otherwise x11, "
+                             "then evdev)")
+    parser.add_argument('--gap-bloom', type=int, default=0, metavar='PX',
+                        help="widen the crosshair gap by PX pixels on each left click, easing back to rest")
+    parser.add_argument('--bloom-ms', type=float, default=250.0, metavar='MS',
+                        help="how long the gap takes to settle after a click (default 250)")
+    parser.add_argument('--pulse', type=float, default=0.0, metavar='HZ',
+                        help="pulse the crosshair's opacity HZ times per second")
+    parser.add_argument('--pulse-opacity', type=float, default=0.35, metavar='MIN',
+                        help="lowest opacity of the pulse, from 0 to 1 (default 0.35)")
+    parser.add_argument('--send', action='append', metavar='COMMAND',
+                        help="send COMMAND to the running overlay instead of starting one, e.g. toggle, "
+                             "'menu on', 'preset Red Dot', 'set crosshair_gap=4' or a JSON command; "
+                             "repeat to send several as one batch")
+    parser.add_argument('--no-control', action='store_true',
+                        help="don't let --send or other programs control this overlay")
+    parser.add_argument('--control-name', metavar='NAME',
+                        help="the local socket or pipe the control server listens on and --send "
+                             "connects to (default CrosshairOverlayControl)")
+    parser.add_argument('--import-presets', action='append', metavar='FILE',
+                        help="add the presets in a JSON Lines preset pack, skipping configs you already "
+                             "have, and exit; repeat for more packs")
+    parser.add_argument('--export-presets', metavar='FILE',
+                        help="write every preset to a JSON Lines preset pack and exit")
+    parser.add_argument('--share-codes', action='store_true',
+                        help="with --export-presets, write share codes instead of full configs")
+    parser.add_argument('--share-code', action='append', metavar='PRESET',
+                        help="print the share code of PRESET and exit; repeat for more presets")
+    parser.add_argument('--add-preset', action='append', metavar='NAME=CODE',
+                        help="save the config of a share code as preset NAME and exit; repeat for more")
+    parser.add_argument('--import-report', action='store_true',
+                        help="print the import time of each subsystem and exit")
+    # Leave anything we don't recognise for Qt
+    args, _ = parser.parse_known_args(argv[1:])
+    return args
+
+def make_hotkeys(specs, backend=None):
+    """Build the hotkey backend for --hotkey values, skipping invalid ones; returns None on failure"""
+    try:
+        from crosshair_hotkeys import HotkeyBinding, make_hotkey_backend
+        bindings = []
+        for spec in specs or []:
+            try:
+                binding = HotkeyBinding.parse(spec)
+            except ValueError as e:
+                print(f"Ignoring hotkey '{spec}': {e}")
+                continue
+            if not hotkey_action_known(binding.action):
+                print(f"Ignoring hotkey '{spec}': unknown action '{binding.action}' "
+                      f"(actions are {', '.join(HOTKEY_ACTIONS)})")
+                continue
+            bindings.append(binding)
+        return make_hotkey_backend(backend, bindings or None)
+    except Exception as e:
+        print(f"Failed to setup global hotkeys: {e}")
+        return None
+
+def resolve_screens(specs):
+    """Turn --screen values into (QScreen, preset name or None) pairs, without repeating a screen"""
+    screens = QApplication.screens()
+    chosen = []
+    for spec in specs or ['primary']:
+        name, _, preset = spec.partition('=')
+        name = name.strip()
+        if name == 'all':
+            matches = screens
+        elif name == 'primary':
+            matches = [QApplication.primaryScreen()]
+        elif name.isdigit() and int(name) < len(screens):
+            matches = [screens[int(name)]]
+        else:
+            matches = [screen for screen in screens if screen.name() == name]
+        if not matches:
+            names = ', '.join(f"{i}: {screen.name()}" for i, screen in enumerate(screens))
+            print(f"No screen matches '{name}' (screens are {names})")
+        for screen in matches:
+            if all(screen is not other for other, _ in chosen):
+                chosen.append((screen, preset.strip() or None))
+    return chosen or [(QApplication.primaryScreen(), None)]
+
+def manage_presets(args):
+    """Run the preset pack and share code options; returns an exit status"""
+    manager = CrosshairPresetManager()
+    status = 0
+    for filename in args.import_presets or []:
+        counts = manager.import_preset_pack(filename)
+        if counts is None:
+            status = 1
+            continue
+        print(f"{filename}: {counts['added']} added, {counts['replaced']} replaced, "
+              f"{counts['duplicates']} duplicates and {counts['invalid']} invalid records skipped")
+    for spec in args.add_preset or []:
+        name, sep, code = spec.partition('=')
+        try:
+            if not sep or not name.strip():
+                raise ValueError("expected NAME=CODE")
+            config = decode_share_code(code)
+        except ValueError as e:
+            print(f"Invalid --add-preset '{spec}': {e}")
+            status = 1
+            continue
+        if manager.save_current_as_preset(name.strip(), config):
+            print(f"Preset '{name.strip()}' saved")
+        else:
+            status = 1
+    for name in args.share_code or []:
+        if manager.has_preset(name):
+            print(f"{name}: {encode_share_code(manager.presets[name])}")
+        else:
+            print(f"Unknown preset '{name}'")
+            status = 1
+    if args.export_presets:
+        count = manager.export_preset_pack(args.export_presets, codes=args.share_codes)
+        if count is None:
+            status = 1
+        else:
+            print(f"{count} presets written to {args.export_presets}")
+    return status
+
+def start_control_server(overlay, name=None):
+    try:
+        from crosshair_control import CONTROL_SERVER_NAME, ControlServer
+        overlay.setup_control_server(ControlServer(name=name or CONTROL_SERVER_NAME, parent=overlay))
+    except Exception as e:
+        print(f"Failed to start the control server: {e}")
+
 def main():
+    args = parse_args(sys.argv)
+    # The metrics module is only loaded when some instrumentation is asked for
+    if args.import_report:
+        from crosshair_metrics import import_time_report
+        print(import_time_report(), end='')
+        sys.exit(0)
+    startup_trace = None
+    if args.startup_trace:
+        from crosshair_metrics import StartupTrace
+        startup_trace = StartupTrace(STARTUP_TIME)
+        startup_trace.mark("modules imported")
+    
+    if args.send:
+        from crosshair_control import CONTROL_SERVER_NAME, send_commands
+        sys.exit(send_commands(args.send, args.control_name or CONTROL_SERVER_NAME))
+    # A running overlay picks up the changed preset file by itself
+    if args.import_presets or args.export_presets or args.share_code or args.add_preset:
+        sys.exit(manage_presets(args))
+    
     # Single instance enforcement
     shared_memory = QSharedMemory("CrosshairOverlayUniqueKey")
     if not shared_memory.create(1):
-        print("Another instance is already running.")
+        # A second launch brings up the running overlay's settings instead of starting another
+        if not args.no_control:
+            from crosshair_control import CONTROL_SERVER_NAME, show_running_menu
+            if show_running_menu(args.control_name or CONTROL_SERVER_NAME):
+                print("Another instance is already running; opened its settings menu.")
+                print("Control it with --send, e.g. --send toggle or --send 'preset Red Dot'")
+                sys.exit(0)
+        print("Another instance is already running, but it doesn't answer on its control channel.")
         sys.exit(0)
     # Try to get admin privileges but don't exit if it fails
     #if not is_admin():
@@ -1033,16 +1943,66 @@ def main():
     #    except:
     #        print("Failed to get admin privileges. Continuing without admin rights.")
     
+    # Draw at each screen's real resolution instead of letting the OS stretch the overlay
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
+    if hasattr(QApplication, 'setHighDpiScaleFactorRoundingPolicy'):
+        QApplication.setHighDpiScaleFactorRoundingPolicy(Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)  # Keep running when overlay is hidden
+    # Let queued settings and preset writes reach the disk before exiting
+    app.aboutToQuit.connect(shutdown_persistence_worker)
+    if startup_trace is not None:
+        startup_trace.mark("QApplication created")
     
     # Check if system tray is available
     if not QSystemTrayIcon.isSystemTrayAvailable():
         print("System Tray is not available on this system.")
         app.setQuitOnLastWindowClosed(True)
     
-    overlay = CrosshairOverlay()
+    if args.palette:
+        try:
+            print(f"Loaded {load_user_palette(args.palette)} colors from {args.palette}")
+        except Exception as e:
+            print(f"Error loading palette: {e}")
+    
+    metrics = None
+    if args.instrument:
+        from crosshair_metrics import PaintMetrics
+        metrics = PaintMetrics()
+    contrast = None
+    if args.adaptive_contrast:
+        from crosshair_contrast import ContrastController, make_screen_source
+        contrast = ContrastController(args.adaptive_contrast, make_screen_source(args.contrast_source),
+                                      args.contrast_rate, args.contrast_budget_ms)
+    
+    animator = None
+    if args.gap_bloom > 0 or args.pulse > 0:
+        from crosshair_animation import CrosshairAnimator
+        animator = CrosshairAnimator(bloom_pixels=args.gap_bloom, bloom_duration=args.bloom_ms / 1000,
+                                     pulse_rate_hz=args.pulse,
+                                     pulse_min_opacity=min(max(args.pulse_opacity, 0.0), 1.0))
+    
+    hotkeys = None
+    if args.hotkey or args.hotkey_backend:
+        hotkeys = make_hotkeys(args.hotkey, args.hotkey_backend)
+    
+    screens = resolve_screens(args.screen)
+    main_screen, main_preset = screens[0]
+    overlay = CrosshairOverlay(bounded=not args.fullscreen_overlay, metrics=metrics,
+                               startup_trace=startup_trace, contrast=contrast, screen=main_screen,
+                               animator=animator, hotkeys=hotkeys, favorites=args.favorite)
+    if main_preset is not None:
+        if overlay.preset_manager.has_preset(main_preset):
+            overlay.update_config(overlay.preset_manager.get_preset(main_preset))
+        else:
+            print(f"Unknown preset '{main_preset}'")
+    for screen, preset in screens[1:]:
+        overlay.add_screen(screen, preset)
     overlay.show()
+    if not args.no_control:
+        # Listen once the crosshair is up; the network module isn't needed before then
+        QTimer.singleShot(0, lambda: start_control_server(overlay, args.control_name))
     
     # Handle Ctrl+C gracefully
     import signal
@@ -1056,11 +2016,14 @@ def main():
     print("- F12 to test menu visibility")
     print("- Right-click system tray icon for options")
     print("- ESC to close settings or exit")
+    if not args.no_control:
+        print("- Run again with --send COMMAND to control this overlay")
     print("=" * 50)
     print("If global hotkeys don't work, use the system tray icon!")
     
     # Test the menu after a short delay
-    QTimer.singleShot(2000, overlay.test_menu_toggle)
+    if not args.fast_start:
+        QTimer.singleShot(2000, overlay.test_menu_toggle)
     
     sys.exit(app.exec_())
 if __name__ == '__main__':
@@ -0,0 +1,374 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from functools import partial
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+def atomic_write(filename, write):
+    """Call write(f) on a temporary file and rename it over filename; returns what write returned"""
+    # Only needed once something is saved, so keep it off the startup path
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(filename) + '.', suffix='.tmp',
+                                     dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            result = write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, filename)
+        return result
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+def atomic_write_json(filename, data, indent=2):
+    """Write data as JSON to a temporary file and rename it over filename"""
+    atomic_write(filename, partial(json.dump, data, indent=indent))
+
+def write_json_lines(f, records):
+    count = 0
+    for record in records:
+        f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        count += 1
+    return count
+
+def atomic_write_json_lines(filename, records):
+    """Write each record of an iterable as one line of JSON, replacing filename atomically; returns the count
+
+    Records are serialized one at a time, so a generator is never held in memory.
+    """
+    return atomic_write(filename, partial(write_json_lines, records=records))
+
+def read_json_lines(filename):
+    """Yield (line number, record) for each non-blank line of a JSON Lines file, one line at a time
+
+    The record is None for a line that isn't valid JSON.
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, None
+
+def append_line(filename, line, mode='a'):
+    """Durably append one line of text to filename, or replace its contents with mode='w'"""
+    with open(filename, mode) as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+def fsync_directory(filename):
+    """Make a rename into filename's directory durable; a no-op where directories can't be opened"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def file_digest(filename):
+    """Return the SHA-1 of a file's bytes, or None if it doesn't exist"""
+    try:
+        with open(filename, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+class PersistenceWorker(QThread):
+    """Runs file writes in order on a background thread so the GUI never waits on disk
+
+    Writes submitted with merge=True replace a write to the same target that
+    is still the last one queued, so a burst of saves of one file costs a
+    single write. A write queued after it may depend on it having happened
+    first, so a write that is no longer last is queued again instead.
+    """
+    write_finished = pyqtSignal(str)
+    write_failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.condition = threading.Condition()
+        self.queue = deque()
+        self.mergeable = {}
+        self.busy = False
+        self.running = True
+
+    def submit(self, target, job, merge=True):
+        """Queue job (a callable) to write target; returns False if it replaced a queued write"""
+        with self.condition:
+            entry = self.mergeable.get(target) if merge else None
+            if entry is not None and self.queue[-1] is entry:
+                entry[1] = job
+                return False
+            entry = [target, job]
+            self.queue.append(entry)
+            if merge:
+                self.mergeable[target] = entry
+            self.condition.notify()
+            return True
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.queue and self.running:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                entry = self.queue.popleft()
+                if self.mergeable.get(entry[0]) is entry:
+                    del self.mergeable[entry[0]]
+                self.busy = True
+            target, job = entry
+            try:
+                job()
+                self.write_finished.emit(target)
+            except Exception as e:
+                self.write_failed.emit(target, str(e))
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every queued write has been performed"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.queue and not self.busy, timeout)
+
+    def stop(self):
+        """Finish the queued writes and end the thread"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.wait()
+
+_persistence_worker = None
+
+def get_persistence_worker():
+    """Return the process-wide persistence worker, starting it on first use"""
+    global _persistence_worker
+    if _persistence_worker is None:
+        _persistence_worker = PersistenceWorker()
+        _persistence_worker.start()
+        # Queued writes must not be lost if the process exits without quitting Qt
+        atexit.register(shutdown_persistence_worker)
+    return _persistence_worker
+
+def shutdown_persistence_worker():
+    """Flush and stop the process-wide persistence worker, if it was started"""
+    global _persistence_worker
+    if _persistence_worker is not None:
+        _persistence_worker.stop()
+        _persistence_worker = None
+
+class JournaledPresetStore:
+    """Stores presets as a JSON snapshot plus an append-only journal of single-preset edits
+
+    The snapshot keeps the original crosshair_presets.json format, so it can be
+    read by older versions and copied around as an export. Every save, delete
+    or rename appends one line to the journal; once the journal grows past
+    compact_threshold records it is folded back into a fresh snapshot.
+
+    The journal starts with a base record holding the SHA-1 of the snapshot
+    it applies to. Replaying records onto a snapshot that already contains
+    them is not safe (delete C then rename A -> C would delete the new C),
+    so a journal whose base doesn't match the snapshot is ignored. That is
+    the case after a crash between writing a snapshot and emptying the
+    journal, and also after the snapshot was edited by hand. A journal
+    created by an edit, or left by a version without base records, gets its
+    base record before any record is added to it.
+
+    With a worker the writes are queued on it in submission order; without
+    one they happen synchronously.
+    """
+
+    def __init__(self, filename, compact_threshold=200, worker=None):
+        self.filename = filename
+        self.journal_filename = filename + '.journal'
+        self.compact_threshold = compact_threshold
+        self.worker = worker
+        self.journal_records = 0
+        # Whether the journal on disk starts with a base record; None until checked
+        self.based = None
+
+    def exists(self):
+        return os.path.exists(self.filename) or os.path.exists(self.journal_filename)
+
+    def load(self):
+        """Return the presets in the snapshot with the journal replayed on top"""
+        presets = OrderedDict()
+        digest = None
+        if os.path.exists(self.filename):
+            with open(self.filename, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha1(data).hexdigest()
+            presets.update(json.loads(data.decode('utf-8'), object_pairs_hook=OrderedDict))
+        self.journal_records = self.replay_journal(presets, digest)
+        self.ensure_base(digest)
+        return presets
+
+    def replay_journal(self, presets, digest=None):
+        """Apply every complete journal record to presets and drop a torn tail
+
+        digest is the SHA-1 of the snapshot presets were read from; a
+        journal based on another snapshot is emptied instead of replayed.
+        """
+        if not os.path.exists(self.journal_filename):
+            return 0
+        records = 0
+        good_length = 0
+        stale = False
+        with open(self.journal_filename, 'rb') as f:
+            for line in f:
+                # A line without its newline was cut short by a crash mid-append
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                    if record['op'] == 'base':
+                        if good_length == 0 and record['snapshot'] != digest:
+                            stale = True
+                            break
+                    else:
+                        self.apply_record(presets, record)
+                        records += 1
+                except (ValueError, KeyError, TypeError):
+                    break
+                good_length += len(line)
+            size = f.seek(0, os.SEEK_END)
+        if stale:
+            # Its edits are either in the snapshot already or were overwritten by hand
+            print("Ignoring a preset journal written before the current preset file")
+            self.reset_journal(digest)
+            return 0
+        if size != good_length:
+            print(f"Discarding {size - good_length} bytes of incomplete preset journal")
+            with open(self.journal_filename, 'r+b') as f:
+                f.truncate(good_length)
+        return records
+
+    @staticmethod
+    def apply_record(presets, record):
+        """Apply one journal record to presets"""
+        op = record['op']
+        if op == 'put':
+            presets[record['name']] = record['config']
+        elif op == 'delete':
+            presets.pop(record['name'], None)
+        elif op == 'rename':
+            if record['old'] in presets and record['new'] not in presets:
+                presets[record['new']] = presets.pop(record['old'])
+        else:
+            raise KeyError(op)
+
+    def ensure_base(self, digest=None):
+        """Make sure the journal starts with a base record, giving one to a journal without
+
+        digest is the SHA-1 of the current snapshot, read from disk if not given.
+        A journal without a base applies to the current snapshot, so it keeps
+        its records behind the new base.
+        """
+        if self.based:
+            return
+        try:
+            with open(self.journal_filename, 'rb') as f:
+                journal = f.read()
+        except FileNotFoundError:
+            journal = None
+        if journal and journal.startswith(b'{"op":"base"'):
+            self.based = True
+            return
+        if journal is None:
+            # Created by the first append, which then writes the base
+            self.based = False
+            return
+        if digest is None:
+            digest = file_digest(self.filename)
+        atomic_write(self.journal_filename,
+                     lambda f: f.write(self.base_record(digest) + journal.decode('utf-8')))
+        fsync_directory(self.journal_filename)
+        self.based = True
+
+    def append(self, *records):
+        """Durably append records to the journal, with one write and one sync"""
+        line = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        if self.worker is not None:
+            self.worker.submit(self.journal_filename, partial(self._append_line, line), merge=False)
+        else:
+            self._append_line(line)
+        self.journal_records += len(records)
+
+    def _append_line(self, line):
+        self.ensure_base()
+        if not self.based:
+            # A new journal names the snapshot it applies to before its first record
+            line = self.base_record(file_digest(self.filename)) + line
+            self.based = True
+        append_line(self.journal_filename, line)
+
+    def put(self, name, config):
+        self.append({'op': 'put', 'name': name, 'config': config})
+
+    def put_many(self, items):
+        """Journal (name, config) pairs as one batch"""
+        if items:
+            self.append(*({'op': 'put', 'name': name, 'config': config} for name, config in items))
+
+    def delete(self, name):
+        self.append({'op': 'delete', 'name': name})
+
+    def rename(self, old_name, new_name):
+        self.append({'op': 'rename', 'old': old_name, 'new': new_name})
+
+    def needs_compaction(self):
+        return self.journal_records >= self.compact_threshold
+
+    def write_snapshot(self, presets):
+        """Atomically replace the snapshot with presets and empty the journal"""
+        if self.worker is not None:
+            # A shallow copy is enough: stored configs are replaced, never mutated
+            self.worker.submit(self.filename, partial(self._write_snapshot, dict(presets)))
+        else:
+            self._write_snapshot(presets)
+        self.journal_records = 0
+
+    def _write_snapshot(self, presets):
+        atomic_write_json(self.filename, presets)
+        # The rename must be on disk before the journal is reset, or a crash
+        # could leave the old snapshot with a journal based on the new one
+        fsync_directory(self.filename)
+        # Until this replaces it, the old journal names the old snapshot as
+        # its base, so a crash in between doesn't replay it over the new one
+        self.reset_journal(file_digest(self.filename))
+
+    @staticmethod
+    def base_record(digest):
+        return json.dumps({'op': 'base', 'snapshot': digest}, separators=(',', ':')) + '\n'
+
+    def reset_journal(self, digest):
+        """Empty the journal, basing it on the snapshot with the given SHA-1"""
+        append_line(self.journal_filename, self.base_record(digest), mode='w')
+        self.based = True
+
+    def export_json(self, filename, presets):
+        """Write presets to filename in the plain crosshair_presets.json format"""
+        atomic_write_json(filename, presets)
+
+    @staticmethod
+    def import_json(filename):
+        """Read presets from a file in the plain crosshair_presets.json format"""
+        with open(filename, 'r') as f:
+            return json.load(f, object_pairs_hook=OrderedDict)
@@ -0,0 +1,226 @@
+"""Memory-mapped atlas of preset thumbnails
+
+The atlas file is a small header followed by fixed-size ARGB32
+premultiplied tiles. A JSON index next to it maps config hashes to tile
+slots, so a preset is only drawn again when its config changes, and
+presets with the same config share a tile. Tiles are read and written in
+place through QImages that wrap the mapped file.
+
+refresh() draws every missing tile at once; tile() draws one when it is
+first shown, so a large preset library costs only the rows on screen.
+"""
+import json
+import mmap
+import os
+import struct
+
+from PyQt5.QtGui import QColor, QImage, QPainter
+
+try:
+    from PyQt5 import sip
+except ImportError:
+    import sip
+
+from crosshair_config import CrosshairConfig
+from crosshair_renderer import build_display_list
+from crosshair_storage import atomic_write_json
+
+THUMBNAILS_FILENAME = 'crosshair_thumbnails.atlas'
+THUMBNAIL_SIZE = 32
+THUMBNAIL_BACKGROUND = QColor(43, 43, 43)
+
+ATLAS_MAGIC = b'CXTA'
+ATLAS_VERSION = 1
+# Magic, version, tile size and capacity, padded so tiles start 64-byte aligned
+HEADER_FORMAT = '<4sIII'
+HEADER_SIZE = 64
+INITIAL_CAPACITY = 64
+
+def draw_thumbnail(image, config):
+    """Draw config centered in a square image, shrunk to fit if it is larger"""
+    image.fill(THUMBNAIL_BACKGROUND)
+    display_list = build_display_list(CrosshairConfig.coerce(config))
+    size = image.width()
+    scale = min(1.0, (size - 2) / (display_list.extent * 2 + 1))
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    center = size // 2
+    if scale < 1.0:
+        painter.scale(scale, scale)
+        display_list.paint(painter, center / scale, center / scale, scale)
+    else:
+        display_list.paint(painter, center, center)
+    painter.end()
+
+class ThumbnailAtlas:
+    """Fixed-size crosshair thumbnails in one memory-mapped file, keyed by config hash"""
+
+    def __init__(self, filename=THUMBNAILS_FILENAME, tile_size=THUMBNAIL_SIZE):
+        self.filename = filename
+        self.index_filename = filename + '.json'
+        self.tile_size = tile_size
+        self.tile_bytes = tile_size * tile_size * 4
+        self.slots = {}
+        self.capacity = 0
+        self.file = None
+        self.map = None
+        self.rendered = 0
+        # Free slots for tile(), worked out again when the slots change
+        self.free = None
+        # Tiles drawn by tile() that the index file doesn't list yet
+        self.unsaved = 0
+        self.open()
+
+    def open(self):
+        """Map the atlas file, starting an empty one if it is missing or doesn't match its index"""
+        try:
+            with open(self.index_filename, 'r') as f:
+                index = json.load(f)
+            if index.get('version') != ATLAS_VERSION or index.get('tile_size') != self.tile_size:
+                raise ValueError("atlas index is for another format")
+            self.file = open(self.filename, 'r+b')
+            magic, version, tile_size, capacity = struct.unpack(
+                HEADER_FORMAT, self.file.read(struct.calcsize(HEADER_FORMAT)))
+            if (magic, version, tile_size) != (ATLAS_MAGIC, ATLAS_VERSION, self.tile_size):
+                raise ValueError("atlas file is for another format")
+            if os.fstat(self.file.fileno()).st_size < HEADER_SIZE + capacity * self.tile_bytes:
+                raise ValueError("atlas file is truncated")
+            slots = {key: int(slot) for key, slot in index['tiles'].items()}
+            if any(not 0 <= slot < capacity for slot in slots.values()):
+                raise ValueError("atlas index points past the end of the file")
+            self.capacity = capacity
+            self.slots = slots
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, struct.error) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Rebuilding thumbnail atlas: {e}")
+            if self.file is not None:
+                self.file.close()
+            self.file = open(self.filename, 'w+b')
+            self.slots = {}
+            self.free = None
+            self.capacity = 0
+            self.grow(INITIAL_CAPACITY)
+            self.save_index()
+
+    def close(self):
+        # QImages handed out keep the old mapping alive until they are gone
+        self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def grow(self, capacity):
+        """Make room for capacity tiles; QImages from before stay valid but stop seeing new tiles"""
+        self.map = None
+        self.file.truncate(HEADER_SIZE + capacity * self.tile_bytes)
+        self.file.seek(0)
+        self.file.write(struct.pack(HEADER_FORMAT, ATLAS_MAGIC, ATLAS_VERSION, self.tile_size, capacity))
+        self.file.flush()
+        self.capacity = capacity
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def save_index(self):
+        # Compact, which json writes in C; the index has a line per preset otherwise
+        atomic_write_json(self.index_filename, {
+            'version': ATLAS_VERSION,
+            'tile_size': self.tile_size,
+            'tiles': self.slots,
+        }, indent=None)
+        self.unsaved = 0
+
+    def save(self):
+        """Write tiles drawn by tile() to disk and list them in the index"""
+        if self.unsaved:
+            self.map.flush()
+            self.save_index()
+
+    def refresh(self, configs):
+        """Make sure every config in a {config hash: config} dict has a tile
+
+        Tiles of hashes that are no longer wanted are reused. Returns the
+        number of tiles drawn.
+        """
+        missing = [key for key in configs if key not in self.slots]
+        if not missing:
+            return 0
+        stale = [key for key in self.slots if key not in configs]
+        if stale:
+            for key in stale:
+                del self.slots[key]
+            # Forget the stale tiles on disk before drawing over them
+            self.save_index()
+        used = set(self.slots.values())
+        free = [slot for slot in range(self.capacity) if slot not in used]
+        if len(free) < len(missing):
+            capacity = self.capacity
+            while capacity - len(used) < len(missing):
+                capacity *= 2
+            self.grow(capacity)
+            free = [slot for slot in range(self.capacity) if slot not in used]
+        for key, slot in zip(missing, free):
+            self.draw_tile(slot, configs[key])
+            self.slots[key] = slot
+        self.map.flush()
+        self.save_index()
+        self.free = None
+        self.rendered += len(missing)
+        return len(missing)
+
+    def prune(self, keys):
+        """Free the tiles of config hashes not in keys; returns how many were freed"""
+        stale = [key for key in self.slots if key not in keys]
+        if stale:
+            for key in stale:
+                del self.slots[key]
+            self.free = None
+            # This also lists the tiles tile() drew since the last save
+            self.map.flush()
+            self.save_index()
+        return len(stale)
+
+    def tile(self, key, config):
+        """Return the thumbnail for a config hash, drawing it into a free slot if it has none
+
+        The new tile is only listed in the index by save(), so drawing
+        many in a row costs one index write.
+        """
+        slot = self.slots.get(key)
+        if slot is None:
+            if not self.free:
+                used = set(self.slots.values())
+                if len(used) >= self.capacity:
+                    self.grow(self.capacity * 2)
+                # Reversed, so pop() hands out the lowest slot first
+                self.free = [slot for slot in range(self.capacity - 1, -1, -1) if slot not in used]
+            slot = self.free.pop()
+            self.draw_tile(slot, config)
+            self.slots[key] = slot
+            self.rendered += 1
+            self.unsaved += 1
+        return self.tile_image(slot)
+
+    def tile_image(self, slot):
+        """Return a QImage that reads and writes the tile in the mapped file, without copying it"""
+        offset = HEADER_SIZE + slot * self.tile_bytes
+        view = memoryview(self.map)[offset:offset + self.tile_bytes]
+        # From a buffer PyQt picks the read-only constructor, and painting would
+        # detach into a private copy; a bare address gets the writable one
+        address = int(sip.voidptr(view))
+        image = QImage(sip.voidptr(address), self.tile_size, self.tile_size, self.tile_size * 4,
+                       QImage.Format_ARGB32_Premultiplied)
+        # The image doesn't own its pixels, so it holds on to the mapping
+        image.atlas_view = view
+        return image
+
+    def image(self, key):
+        """Return the thumbnail for a config hash, or None if it has no tile"""
+        slot = self.slots.get(key)
+        return self.tile_image(slot) if slot is not None else None
+
+    def draw_tile(self, slot, config):
+        draw_thumbnail(self.tile_image(slot), config)
+
+    def stats(self):
+        return {'tiles': len(self.slots), 'capacity': self.capacity, 'rendered': self.rendered,
+                'unsaved': self.unsaved}